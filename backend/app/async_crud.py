@@ -0,0 +1,11 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# -- Streaming --
+# The routes are plain def and run in Starlette's threadpool, only the exports read through an
+# AsyncSession: the rows of a crud query come from a server side cursor, `partition` rows at a time,
+# and the request's session stays open until the streamed response has been sent.
+
+async def stream_rows(db: AsyncSession, statement, partition: int = 1000):
+    result = await db.stream(statement.execution_options(yield_per=partition))
+    async for rows in result.partitions():
+        yield rows
@@ -1,6 +1,74 @@
+import base64
+import hashlib
+import json
+from sqlalchemy import Date, Integer, and_, case, cast, delete, func, insert, literal, or_, select, tuple_, type_coerce, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from . import models, schemas
-from datetime import date
+from . import ledger, models, report_cache, rollups, schemas, vectorized, versions
+from datetime import date, datetime, timedelta
+from typing import List
+
+# -- Listings (keyset pagination) --
+
+LIST_STATUSES = ("active", "archived", "all")
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+# Returns one page ordered by id or by (name, id), the total of matching rows and the cursor of the next page
+def list_page(db: Session, model, limit: int = None, after: str = None, order_by: str = "id",
+              name_prefix: str = None, status: str = "all", skip: int = 0):
+    filters = []
+    if status == "active":
+        filters.append(model.active == True)
+    elif status == "archived":
+        filters.append(model.active == False)
+    if name_prefix:
+        # A range instead of LIKE so SQLite can use the name index
+        filters += [model.name >= name_prefix, model.name < name_prefix + "\U0010ffff"]
+
+    total = db.scalar(select(func.count()).select_from(model).where(*filters))
+
+    sort_keys = (model.name, model.id) if order_by == "name" else (model.id,)
+    key_types = (str, int) if order_by == "name" else (int,)
+    query = select(model).where(*filters).order_by(*sort_keys)
+    if after:
+        values = decode_cursor(after)
+        # A cursor of another ordering (["a"] for id) would compare as "after every row" and look like the last page
+        if not isinstance(values, list) or len(values) != len(sort_keys) or not all(
+            isinstance(value, key_type) and not isinstance(value, bool) for value, key_type in zip(values, key_types)
+        ):
+            raise ValueError("Invalid cursor")
+        query = query.where(tuple_(*sort_keys) > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+    if limit:
+        query = query.limit(limit)
+
+    items = db.scalars(query).all()
+
+    next_cursor = None
+    if limit and len(items) == limit:
+        last = items[-1]
+        next_cursor = encode_cursor([last.name, last.id] if order_by == "name" else [last.id])
+
+    return {"items": items, "total": total, "next_cursor": next_cursor}
+
+# First and last day of the rows matching `condition`, None when there are none (for report_cache.invalidate)
+def date_span(db: Session, model, condition):
+    first, last = db.execute(select(func.min(model.date), func.max(model.date)).where(condition)).one()
+    return (first, last) if first is not None else None
+
+# Days of the employee's costs, attendance and adjustments alike
+def employee_span(db: Session, employee_id: int):
+    return date_span(db, models.DailyCostLedger, models.DailyCostLedger.employee_id == employee_id)
 
 # -- Employee --
 
@@ -8,16 +76,22 @@ from datetime import date
 def get_employees(db : Session):
     return db.query(models.Employee).all()
 
+def list_employees(db: Session, **options):
+    return list_page(db, models.Employee, **options)
+
 # Create new employee
 def create_employee(db: Session, employee: schemas.EmployeeCreate):
     db_employee = models.Employee(
         name = employee.name ,
         daily_wage = employee.daily_wage ,
         overtime_rate = employee.overtime_rate ,
-        bank_daily_amount = employee.bank_daily_amount
+        bank_daily_amount = employee.bank_daily_amount,
+        active = employee.active if employee.active is not None else True
     )
     db.add(db_employee)
+    versions.bump(db, "employees")
     db.commit()
+    report_cache.invalidate(db, "employees") # No rows yet, the cached reports only move to the new version
     db.refresh(db_employee)
     return db_employee
 
@@ -31,8 +105,15 @@ def update_employee(db: Session, employee_id: int, employee_data: schemas.Employ
     db_employee.daily_wage = employee_data.daily_wage
     db_employee.overtime_rate = employee_data.overtime_rate
     db_employee.bank_daily_amount = employee_data.bank_daily_amount
+    if employee_data.active is not None: db_employee.active = employee_data.active
+    db.flush()
+    ledger.refresh_employee(db, employee_id) # Costs follow the new wage / overtime rate
+    rollups.refresh_employee(db, employee_id)
+    versions.bump(db, "employees")
+    span = employee_span(db, employee_id)
 
     db.commit()
+    report_cache.invalidate(db, "employees", span=span)
     db.refresh(db_employee)
     return db_employee
 
@@ -40,8 +121,14 @@ def update_employee(db: Session, employee_id: int, employee_data: schemas.Employ
 def delete_employee(db: Session, employee_id: int):
     db_employee = db.query(models.Employee).filter(models.Employee.id == employee_id).first()
     if db_employee:
+        span = employee_span(db, employee_id)
+        ledger.delete_employee(db, employee_id)
+        rollups.refresh_employee(db, employee_id) # Before the delete, while attendance still names the employee
+        db.query(models.Adjustment).filter(models.Adjustment.employee_id == employee_id).delete()
         db.delete(db_employee)
+        versions.bump(db, "employees")
         db.commit()
+        report_cache.invalidate(db, "employees", span=span)
         return db_employee
 
 # -- Boats --
@@ -49,12 +136,18 @@ def delete_employee(db: Session, employee_id: int):
 def get_boats(db: Session):
     return db.query(models.Boat).all()
 
+def list_boats(db: Session, **options):
+    return list_page(db, models.Boat, **options)
+
 # Create new boat
 def create_boat(db: Session, boat: schemas.BoatCreate):
     db_boat = models.Boat(
-        name = boat.name )
+        name = boat.name,
+        active = boat.active if boat.active is not None else True )
     db.add(db_boat)
+    versions.bump(db, "boats")
     db.commit()
+    report_cache.invalidate(db, "boats", boat_id=db_boat.id) # A lookup of this id may have cached "not found"
     db.refresh(db_boat)
     return db_boat
 
@@ -64,7 +157,11 @@ def update_boat(db: Session, boat_id: int, boat_data: schemas.BoatCreate):
     if not db_boat:
         return None
     db_boat.name = boat_data.name
+    if boat_data.active is not None: db_boat.active = boat_data.active
+    versions.bump(db, "boats")
+    span = date_span(db, models.DailyCostLedger, models.DailyCostLedger.boat_id == boat_id)
     db.commit()
+    report_cache.invalidate(db, "boats", span=span, boat_id=boat_id)
     db.refresh(db_boat)
     return db_boat
 
@@ -72,99 +169,119 @@ def update_boat(db: Session, boat_id: int, boat_data: schemas.BoatCreate):
 def delete_boat(db: Session, boat_id: int):
     db_boat = db.query(models.Boat).filter(models.Boat.id == boat_id).first()
     if db_boat:
+        span = date_span(db, models.DailyCostLedger, models.DailyCostLedger.boat_id == boat_id)
         db.delete(db_boat)
+        versions.bump(db, "boats")
         db.commit()
+        report_cache.invalidate(db, "boats", span=span, boat_id=boat_id)
     return db_boat
 
 # Analysis Boat
+# Reports read the daily cost ledger (see ledger.py) instead of recomputing every attendance row.
+# The queries are built apart so the streaming exports can run them through a server side cursor.
+# The stream_* variants feed the PDFs: not cached, their rows are read PDF_PARTITION at a time
+# while the PDF is laid out, and the totals are summed as the rows go by.
+
+PDF_PARTITION = 500
+
+# One row per employee and day on the boat with a cost, the adjustments of the day summed into its daily cost.
+# Ordered by date and employee name.
+def boat_analysis_query(boat_id: int, start_date: date, end_date: date):
+    led = models.DailyCostLedger
+    is_overtime = led.kind == "overtime"
+    daily_cost = func.sum(case((is_overtime, 0.0), else_=led.amount))
+    overtime_cost = func.sum(case((is_overtime, led.amount), else_=0.0))
+
+    return (
+        select(led.date, models.Employee.name, daily_cost.label("daily_cost"), overtime_cost.label("overtime_cost"))
+        .join(models.Employee, models.Employee.id == led.employee_id)
+        .where(led.boat_id == boat_id, led.date >= start_date, led.date <= end_date)
+        .group_by(led.date, led.employee_id, models.Employee.name)
+        .having((daily_cost + overtime_cost > 0) | (func.count(led.adjustment_id) > 0)) # Deductions are shown too
+        .order_by(led.date, models.Employee.name, led.employee_id)
+    )
+
+def analysis_item(rec):
+    return {
+        "date": rec.date,
+        "employee_name": rec.name,
+        "daily_cost": rec.daily_cost, 
+        "overtime_cost": rec.overtime_cost,
+        "total_cost": rec.daily_cost + rec.overtime_cost
+    }
+
+@report_cache.cached(("employees", "boats", "attendance"), start="start_date", end="end_date", boat="boat_id")
 def get_boat_analysis(db: Session, boat_id: int, start_date: date, end_date: date):
-    
+    if vectorized.ENABLED:
+        return vectorized.get_boat_analysis(db, boat_id, start_date, end_date)
+
     boat = db.query(models.Boat).filter(models.Boat.id == boat_id).first()
     if not boat:
         return None
-    
-    records = db.query(models.Attendance).join(models.Employee).filter(
-        (models.Attendance.boat_id == boat_id) | (models.Attendance.overtime_boat_id == boat_id),
-        models.Attendance.date >= start_date,
-        models.Attendance.date <= end_date,
-    ).all ()
+
+    records = db.execute(boat_analysis_query(boat_id, start_date, end_date))
 
     analysis_data = []
     total_sum = 0.0
 
     for rec in records:
-        wage = 0.0
-        ot_cost = 0.0
-        extra = 0.0
-
-        if rec.boat_id == boat_id:
-            if rec.present or rec.is_half_day:
-                multiplier = 0.5 if rec.is_half_day else 1.0
-                wage = rec.employee.daily_wage * multiplier
-            extra = rec.extra_amount
-
-        if rec.overtime_boat_id == boat_id:
-            ot_cost = rec.overtime_hours * rec.employee.overtime_rate
-
-        daily_total = wage + ot_cost + extra
-
-        if daily_total > 0: 
-            total_sum += daily_total
-            analysis_data.append({
-                "date": rec.date,
-                "employee_name": rec.employee.name,
-                "daily_cost": wage + extra, 
-                "overtime_cost": ot_cost,
-                "total_cost": daily_total
-            })
+        item = analysis_item(rec)
+        total_sum += item["total_cost"]
+        analysis_data.append(item)
 
     return {"boat_name": boat.name, 
             "total_cost": total_sum, 
             "analysis_data": analysis_data}
 
+def stream_boat_analysis(db: Session, boat_id: int, start_date: date, end_date: date):
+    boat = db.query(models.Boat).filter(models.Boat.id == boat_id).first()
+    if not boat:
+        return None
+
+    report = {"boat_name": boat.name, "total_cost": 0.0}
+
+    def analysis_data():
+        records = db.execute(boat_analysis_query(boat_id, start_date, end_date).execution_options(yield_per=PDF_PARTITION))
+        for rec in records:
+            item = analysis_item(rec)
+            report["total_cost"] += item["total_cost"]
+            yield item
+
+    report["analysis_data"] = analysis_data()
+    return report
+
 # -- Short Analysis Boat (Per Employee) --
+def short_boat_analysis_query(boat_id: int, start_date: date, end_date: date):
+    led = models.DailyCostLedger
+    return (
+        select(
+            models.Employee.name,
+            func.sum(case((led.kind == "wage", led.days), else_=0.0)).label("days"),
+            func.sum(case((led.kind == "overtime", led.hours), else_=0.0)).label("ot_hours"),
+            func.sum(led.amount).label("cost"),
+        )
+        .join(models.Employee, models.Employee.id == led.employee_id)
+        .where(led.boat_id == boat_id, led.date >= start_date, led.date <= end_date)
+        .group_by(led.employee_id)
+        .order_by(models.Employee.name)
+    )
+
+# Employees with only deductions on the boat count in the total but get no line
+def short_analysis_shown(rec):
+    return rec.cost > 0 or rec.days > 0 or rec.ot_hours > 0
+
+def short_analysis_item(rec):
+    return {"name": rec.name, "days": rec.days, "ot_hours": rec.ot_hours, "cost": rec.cost}
+
+@report_cache.cached(("employees", "boats", "attendance"), start="start_date", end="end_date", boat="boat_id")
 def get_short_boat_analysis_data(db: Session, boat_id: int, start_date: date, end_date: date):
     boat = db.query(models.Boat).filter(models.Boat.id == boat_id).first()
     if not boat: return None
 
-    records = db.query(models.Attendance).join(models.Employee).filter(
-        (models.Attendance.boat_id == boat_id) | (models.Attendance.overtime_boat_id == boat_id),
-        models.Attendance.date >= start_date,
-        models.Attendance.date <= end_date,
-    ).all()
+    records = db.execute(short_boat_analysis_query(boat_id, start_date, end_date)).all()
 
-    emp_totals = {}
-    grand_total = 0.0
-
-    for rec in records:
-        emp_id = rec.employee.id
-        if emp_id not in emp_totals:
-            emp_totals[emp_id] = {
-                "name": rec.employee.name,
-                "days": 0.0,
-                "ot_hours": 0.0,
-                "cost": 0.0
-            }
-
-        daily_cost = 0.0
-        
-        if rec.boat_id == boat_id:
-            multiplier = 0.5 if rec.is_half_day else 1.0 if rec.present else 0.0
-            emp_totals[emp_id]["days"] += multiplier
-            wage = (rec.employee.daily_wage * multiplier) if rec.employee.daily_wage else 0.0
-            extra = rec.extra_amount or 0.0
-            daily_cost += (wage + extra)
-
-        if rec.overtime_boat_id == boat_id:
-            emp_totals[emp_id]["ot_hours"] += rec.overtime_hours
-            ot_cost = rec.overtime_hours * (rec.employee.overtime_rate or 0.0)
-            daily_cost += ot_cost
-
-        emp_totals[emp_id]["cost"] += daily_cost
-        grand_total += daily_cost
-
-    valid_employees = [e for e in emp_totals.values() if e["cost"] > 0 or e["days"] > 0 or e["ot_hours"] > 0]
-    valid_employees.sort(key=lambda x: x["name"]) 
+    grand_total = sum(rec.cost for rec in records)
+    valid_employees = [short_analysis_item(rec) for rec in records if short_analysis_shown(rec)]
 
     return {
         "boat_name": boat.name,
@@ -174,51 +291,196 @@ def get_short_boat_analysis_data(db: Session, boat_id: int, start_date: date, en
         "employees": valid_employees
     }
 
+def stream_short_boat_analysis(db: Session, boat_id: int, start_date: date, end_date: date):
+    boat = db.query(models.Boat).filter(models.Boat.id == boat_id).first()
+    if not boat:
+        return None
+
+    report = {"boat_name": boat.name, "start_date": start_date, "end_date": end_date, "total_cost": 0.0}
+
+    def employees():
+        records = db.execute(short_boat_analysis_query(boat_id, start_date, end_date).execution_options(yield_per=PDF_PARTITION))
+        for rec in records:
+            report["total_cost"] += rec.cost
+            if short_analysis_shown(rec):
+                yield short_analysis_item(rec)
+
+    report["employees"] = employees()
+    return report
+
+# -- Boat analysis pack --
+# Every boat of a range from one scan of the ledger, which already puts wage on the working boat,
+# overtime on the overtime boat and extras on the boat of their adjustment. Boats without a cost are left out.
+
+@report_cache.cached(("employees", "boats", "attendance"))
+def get_boat_analysis_pack(db: Session, start: date, end: date):
+    if vectorized.ENABLED:
+        return vectorized.get_boat_analysis_pack(db, start, end)
+
+    led = models.DailyCostLedger
+    is_overtime = led.kind == "overtime"
+    daily_cost = func.sum(case((is_overtime, 0.0), else_=led.amount))
+    overtime_cost = func.sum(case((is_overtime, led.amount), else_=0.0))
+    records = db.execute(
+        select(led.boat_id, led.date, models.Employee.name,
+               daily_cost.label("daily_cost"), overtime_cost.label("overtime_cost"))
+        .join(models.Employee, models.Employee.id == led.employee_id)
+        .where(led.date >= start, led.date <= end, led.boat_id.is_not(None))
+        .group_by(led.boat_id, led.date, led.employee_id, models.Employee.name)
+        .having((daily_cost + overtime_cost > 0) | (func.count(led.adjustment_id) > 0)) # Deductions are shown too
+        .order_by(led.boat_id, led.date, models.Employee.name, led.employee_id)
+    )
+
+    by_boat = {}
+    for rec in records:
+        by_boat.setdefault(rec.boat_id, []).append(analysis_item(rec))
+    return [
+        {"boat_id": boat.id, "boat_name": boat.name,
+         "total_cost": sum(item["total_cost"] for item in by_boat[boat.id]), "analysis_data": by_boat[boat.id]}
+        for boat in db.query(models.Boat).order_by(models.Boat.name) if boat.id in by_boat
+    ]
+
+@report_cache.cached(("employees", "boats", "attendance"))
+def get_short_boat_analysis_pack(db: Session, start: date, end: date):
+    led = models.DailyCostLedger
+    records = db.execute(
+        select(
+            led.boat_id,
+            models.Employee.name,
+            func.sum(case((led.kind == "wage", led.days), else_=0.0)).label("days"),
+            func.sum(case((led.kind == "overtime", led.hours), else_=0.0)).label("ot_hours"),
+            func.sum(led.amount).label("cost"),
+        )
+        .join(models.Employee, models.Employee.id == led.employee_id)
+        .where(led.date >= start, led.date <= end, led.boat_id.is_not(None))
+        .group_by(led.boat_id, led.employee_id)
+        .order_by(led.boat_id, models.Employee.name)
+    )
+
+    by_boat = {}
+    for rec in records:
+        by_boat.setdefault(rec.boat_id, []).append(rec)
+    reports = []
+    for boat in db.query(models.Boat).order_by(models.Boat.name):
+        employees = [
+            {"name": rec.name, "days": rec.days, "ot_hours": rec.ot_hours, "cost": rec.cost}
+            for rec in by_boat.get(boat.id, ()) if rec.cost > 0 or rec.days > 0 or rec.ot_hours > 0
+        ]
+        if employees:
+            reports.append({
+                "boat_id": boat.id, "boat_name": boat.name, "start_date": start, "end_date": end,
+                "total_cost": sum(rec.cost for rec in by_boat[boat.id]), "employees": employees,
+            })
+    return reports
+
 # -- Expenses Report --
-def get_expenses_report(db: Session, start:date, end:date, boat_id: int=None, emp_id: int=None):
-    query = db.query(models.Attendance).filter(
-        models.Attendance.date >= start ,
-        models.Attendance.date <= end,
+# Per employee and day, one line for the wage on the working boat (with the adjustments of the day on that boat)
+# and one for overtime on the overtime boat. Adjustments on another boat get a line of their boat.
+
+def expenses_query(start: date, end: date, boat_id: int = None, emp_id: int = None):
+    led = models.DailyCostLedger
+    is_overtime = (led.kind == "overtime").label("is_overtime")
+
+    query = select(
+        led.date, models.Employee.name.label("employee_name"), models.Boat.name.label("boat_name"),
+        is_overtime, func.sum(led.amount).label("amount"),
+    ).join(models.Employee, models.Employee.id == led.employee_id).outerjoin(
+        models.Boat, models.Boat.id == led.boat_id
+    ).where(
+        led.date >= start,
+        led.date <= end,
     )
 
     if boat_id:
-        query = query.filter(models.Attendance.boat_id == boat_id)
+        # The working boat of the day must match too, also for overtime lines (adjustments have only their boat)
+        query = query.outerjoin(models.Attendance, models.Attendance.id == led.attendance_id).where(
+            (models.Attendance.boat_id == boat_id) | led.attendance_id.is_(None), led.boat_id == boat_id
+        )
     
     if emp_id:
-        query = query.filter(models.Attendance.employee_id == emp_id)
+        query = query.where(led.employee_id == emp_id)
+
+    return query.group_by(led.date, led.employee_id, led.boat_id, is_overtime).having(
+        (func.max(led.amount > 0) == 1) | (func.count(led.adjustment_id) > 0) # Deductions are shown too
+    ).order_by(led.date, led.employee_id, is_overtime, led.boat_id)
+
+def expense_item(rec):
+    if rec.is_overtime:
+        return {
+            "date": rec.date, "employee_name": rec.employee_name,
+            "boat_name": (rec.boat_name + " (Υπερ)") if rec.boat_name else "-", 
+            "daily_cost": 0.0, "overtime_cost": rec.amount, "total_cost": rec.amount
+        }
+    return {
+        "date": rec.date, "employee_name": rec.employee_name,
+        "boat_name": rec.boat_name if rec.boat_name else "-", 
+        "daily_cost": rec.amount, "overtime_cost": 0.0, "total_cost": rec.amount
+    }
+
+@report_cache.cached(("employees", "boats", "attendance"), boat="boat_id")
+def get_expenses_report(db: Session, start:date, end:date, boat_id: int=None, emp_id: int=None):
+    if vectorized.ENABLED:
+        return vectorized.get_expenses_report(db, start, end, boat_id, emp_id)
 
-    records = query.all()
-    
     report_data = []
     total_sum = 0.0
 
-    for rec in records:
-        multiplier = 0.5 if rec.is_half_day else 1.0 if rec.present else 0.0
-        wage = (rec.employee.daily_wage * multiplier) if rec.employee.daily_wage else 0.0
-        ot_cost = rec.overtime_hours * (rec.employee.overtime_rate if rec.employee.overtime_rate else 0.0)
-        extra = rec.extra_amount
-
-        if (wage > 0 or extra > 0) and (not boat_id or rec.boat_id == boat_id):
-            total_sum += (wage + extra)
-            report_data.append({
-                "date": rec.date, "employee_name": rec.employee.name,
-                "boat_name": rec.boat.name if rec.boat else "-", 
-                "daily_cost": wage + extra, "overtime_cost": 0.0, "total_cost": wage + extra
-            })
-            
-        if ot_cost > 0 and (not boat_id or rec.overtime_boat_id == boat_id):
-            total_sum += ot_cost
-            report_data.append({
-                "date": rec.date, "employee_name": rec.employee.name,
-                "boat_name": (rec.overtime_boat.name + " (Υπερ)") if rec.overtime_boat else "-", 
-                "daily_cost": 0.0, "overtime_cost": ot_cost, "total_cost": ot_cost
-            })
+    for rec in db.execute(expenses_query(start, end, boat_id, emp_id)):
+        total_sum += rec.amount
+        report_data.append(expense_item(rec))
 
-    report_data.sort(key=lambda x: x["date"]) 
     return {"total_sum": total_sum, "results": report_data}
 
 # -- Attendance --
 
+# The attendance columns with the deprecated extra_amount / extra_reason of the API: the sum and the
+# reasons of the employee's adjustments of the day (one index lookup per row)
+def attendance_rows_query():
+    att = models.Attendance.__table__.c
+    adj = models.Adjustment.__table__.c
+    same_day = and_(adj.employee_id == att.employee_id, adj.date == att.date)
+    return select(
+        *att,
+        select(func.coalesce(func.sum(adj.amount), 0.0)).where(same_day).scalar_subquery().label("extra_amount"),
+        select(func.group_concat(func.nullif(adj.reason, ""), ", ")).where(same_day).scalar_subquery().label("extra_reason"),
+    )
+
+def get_attendance_rows(db: Session, attendance_ids):
+    return db.execute(attendance_rows_query().where(models.Attendance.id.in_(attendance_ids))).all()
+
+# -- Deprecated extras of the attendance API --
+# Before the adjustments table an extra was extra_amount / extra_reason on the attendance row of the day.
+# The older clients still send them: the amount replaces the employee's adjustments of that day by one
+# adjustment on the row's boat, 0 deletes them. Rows that do not send extra_amount leave them as they are.
+
+ATTENDANCE_EXTRAS = {"extra_amount", "extra_reason"}
+
+# {(employee_id, day): (amount, reason, boat_id)} of the records that sent an extra, boats is {(employee_id, day): boat_id}
+def day_extras(records, boats):
+    extras = {}
+    for record in records:
+        sent = record.model_dump(include=ATTENDANCE_EXTRAS) # model_dump, the attributes warn as deprecated
+        if sent["extra_amount"] is not None and record.employee_id is not None:
+            key = (record.employee_id, record.date)
+            extras[key] = (sent["extra_amount"], sent["extra_reason"] or "", boats[key])
+    return extras
+
+# In the caller's transaction, after check_open and before its commit
+def save_day_extras(db: Session, extras):
+    if not extras:
+        return
+    adj = models.Adjustment.__table__
+    removed = db.execute(
+        delete(adj).where(tuple_(adj.c.employee_id, adj.c.date).in_(list(extras))).returning(adj.c.id)
+    ).scalars().all()
+    rows = [
+        {"employee_id": employee_id, "date": day, "amount": amount, "reason": reason, "boat_id": boat_id}
+        for (employee_id, day), (amount, reason, boat_id) in extras.items() if amount
+    ]
+    added = db.execute(insert(adj).returning(adj.c.id), rows).scalars().all() if rows else []
+    ledger.refresh_adjustments(db, removed + added)
+    rollups.refresh_months(db, list(extras))
+
 # -- Attendance (Update or Create) --
 def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
     existing_record = db.query(models.Attendance).filter(
@@ -232,11 +494,16 @@ def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
         if attendance.present is not None: existing_record.present = attendance.present
         if attendance.is_half_day is not None: existing_record.is_half_day = attendance.is_half_day
         if attendance.overtime_hours is not None: existing_record.overtime_hours = attendance.overtime_hours
-        if attendance.extra_amount is not None: existing_record.extra_amount = attendance.extra_amount
-        if attendance.extra_reason is not None: existing_record.extra_reason = attendance.extra_reason
+        db.flush()
+        check_open(db, [attendance.date])
+        save_day_extras(db, day_extras([attendance], {(attendance.employee_id, attendance.date): existing_record.boat_id}))
+        attendance_id = existing_record.id # Expired by the commit
+        ledger.refresh_attendance(db, [attendance_id])
+        rollups.refresh_attendance(db, [attendance_id])
+        versions.bump(db, "attendance")
         db.commit()
-        db.refresh(existing_record)
-        return existing_record
+        report_cache.invalidate(db, "attendance", dates=[attendance.date])
+        return get_attendance_rows(db, [attendance_id])[0]
     else:
         db_attendance = models.Attendance(
             date = attendance.date, employee_id = attendance.employee_id,
@@ -245,93 +512,558 @@ def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
             present = attendance.present if attendance.present is not None else False, 
             is_half_day = attendance.is_half_day if attendance.is_half_day is not None else False,
             overtime_hours = attendance.overtime_hours if attendance.overtime_hours is not None else 0.0,
-            extra_amount = attendance.extra_amount if attendance.extra_amount is not None else 0.0,
-            extra_reason = attendance.extra_reason if attendance.extra_reason is not None else "",
         )
         db.add(db_attendance)
+        db.flush()
+        check_open(db, [attendance.date])
+        save_day_extras(db, day_extras([attendance], {(attendance.employee_id, attendance.date): db_attendance.boat_id}))
+        attendance_id = db_attendance.id # Expired by the commit
+        ledger.refresh_attendance(db, [attendance_id])
+        rollups.refresh_attendance(db, [attendance_id])
+        versions.bump(db, "attendance")
         db.commit()
-        db.refresh(db_attendance)
-        return db_attendance
-        
+        report_cache.invalidate(db, "attendance", dates=[attendance.date])
+        return get_attendance_rows(db, [attendance_id])[0]
+
+# Values used when a new row is created and the field was not sent
+ATTENDANCE_DEFAULTS = {
+    "boat_id": None,
+    "overtime_boat_id": None,
+    "present": False,
+    "is_half_day": False,
+    "overtime_hours": 0.0,
+}
+
+# -- Attendance bulk (Update or Create, one transaction) --
+class DuplicateAttendanceError(ValueError):
+    """The same (employee_id, date) twice in one bulk save."""
+
+def bulk_upsert_attendance(db: Session, records: List[schemas.AttendanceCreate]):
+    if not records:
+        return [] # Nothing to write, versions and caches stay as they are
+    # The groups below are written one after the other, so two rows of the same (employee, date)
+    # would not be applied in request order and could not each get their own result
+    keys = [(record.employee_id, record.date) for record in records]
+    if len(set(keys)) != len(keys):
+        raise DuplicateAttendanceError("Duplicate (employee_id, date) in bulk attendance")
+
+    # Rows are grouped by the fields they actually send, so None keeps meaning "leave unchanged"
+    groups = {}
+    for record in records:
+        sent = {field: value for field, value in record.model_dump(exclude=ATTENDANCE_EXTRAS).items() if value is not None}
+        fields = tuple(field for field in ATTENDANCE_DEFAULTS if field in sent)
+        groups.setdefault(fields, []).append({**ATTENDANCE_DEFAULTS, **sent})
+
+    saved = {}
+    for fields, rows in groups.items():
+        table = models.Attendance.__table__
+        stmt = sqlite_insert(table)
+        # A no-op update still lets RETURNING give back rows that had nothing to change
+        changes = {field: stmt.excluded[field] for field in fields} or {"employee_id": stmt.excluded.employee_id}
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.employee_id, table.c.date], set_=changes
+        ).returning(*table.c)
+        for rec in db.execute(stmt, rows):
+            saved[(rec.employee_id, rec.date)] = rec
+
+    check_open(db, [record.date for record in records])
+    save_day_extras(db, day_extras(records, {key: rec.boat_id for key, rec in saved.items()}))
+    saved_ids = [rec.id for rec in saved.values()]
+    ledger.refresh_attendance(db, saved_ids)
+    rollups.refresh_attendance(db, saved_ids)
+    versions.bump(db, "attendance")
+    db.commit()
+    report_cache.invalidate(db, "attendance", dates={record.date for record in records})
+    rows = {(rec.employee_id, rec.date): rec for rec in get_attendance_rows(db, saved_ids)}
+    return [rows[(record.employee_id, record.date)] for record in records]
 
 # -- Fetch attendance for a specific date --
+# Plain rows of the columns and the day's extras, the day screen only reads them so there is no need for ORM objects
 def get_attendance_by_date(db: Session, target_date: date):
-    return db.query(models.Attendance).filter(
-        models.Attendance.date == target_date,
-        models.Attendance.employee_id.isnot(None) 
+    return db.execute(
+        attendance_rows_query().where(
+            models.Attendance.date == target_date,
+            models.Attendance.employee_id.isnot(None)
+        )
     ).all()
 
+# -- Attendance matrix (employee x date grid of a range) --
+# One range query on ix_attendance_date, returned as columns instead of one object per row.
+# The cells are row major: cell i is employee_ids[i // days] on start + (i % days) days.
+# status is a small code (see MATRIX_STATUS), boat / overtime_boat are indexes into `boats`,
+# whose first entry is None (no boat), so a month of hundreds of employees stays a few arrays of small ints.
+
+MATRIX_NO_ROW, MATRIX_ABSENT, MATRIX_PRESENT, MATRIX_HALF_DAY = 0, 1, 2, 3
+
+def matrix_status(present, is_half_day):
+    if not present:
+        return MATRIX_ABSENT
+    return MATRIX_HALF_DAY if is_half_day else MATRIX_PRESENT
+
+def attendance_matrix_query(start: date, end: date):
+    # Core columns (no ORM loading), the day offset and the status code come from SQLite
+    att = models.Attendance.__table__.c
+    return select(
+        att.employee_id,
+        cast(func.julianday(att.date) - func.julianday(start.isoformat()), Integer),
+        att.boat_id, att.overtime_boat_id,
+        case((att.present.is_not(True), MATRIX_ABSENT), (att.is_half_day.is_(True), MATRIX_HALF_DAY), else_=MATRIX_PRESENT),
+        func.coalesce(att.overtime_hours, 0.0),
+    ).where(att.date >= start, att.date <= end, att.employee_id.isnot(None))
+
+def get_attendance_matrix(db: Session, start: date, end: date):
+    rows = db.execute(attendance_matrix_query(start, end)).tuples().all()
+
+    days = max((end - start).days + 1, 0)
+    employee_ids = sorted({row[0] for row in rows})
+    position = {employee_id: i * days for i, employee_id in enumerate(employee_ids)}
+    boats = [None] + sorted(({row[2] for row in rows} | {row[3] for row in rows}) - {None})
+    boat_code = {boat: code for code, boat in enumerate(boats)}
+
+    cells = len(employee_ids) * days
+    status, boat, overtime_boat, overtime_hours = [MATRIX_NO_ROW] * cells, [0] * cells, [0] * cells, [0.0] * cells
+    for employee_id, day, boat_id, overtime_boat_id, code, hours in rows:
+        i = position[employee_id] + day
+        status[i] = code
+        boat[i] = boat_code[boat_id]
+        overtime_boat[i] = boat_code[overtime_boat_id]
+        overtime_hours[i] = hours
+
+    return {
+        "start": start, "end": end, "days": days,
+        "employee_ids": employee_ids, "boats": boats,
+        "status": status, "boat": boat, "overtime_boat": overtime_boat, "overtime_hours": overtime_hours,
+    }
+
+# -- Adjustments (payroll extras) --
+# Bonus, fuel and other extras of an employee, one row each. The ledger gets one 'extra' row per
+# adjustment, so the reports read them like the rest of the costs. They count as attendance data
+# for the versions and the report cache, like the attendance rows that carried them before.
+
+def list_adjustments(db: Session, start: date, end: date, employee_id: int = None):
+    query = db.query(models.Adjustment).filter(models.Adjustment.date >= start, models.Adjustment.date <= end)
+    if employee_id:
+        query = query.filter(models.Adjustment.employee_id == employee_id)
+    return query.order_by(models.Adjustment.date, models.Adjustment.id).all()
+
+# Ledger and rollups of a changed adjustment, then commit. employee_days are the (employee, day) it was and is on.
+def _save_adjustment(db: Session, adjustment_id: int, employee_days):
+    ledger.refresh_adjustments(db, [adjustment_id])
+    rollups.refresh_months(db, employee_days)
+    versions.bump(db, "attendance")
+    db.commit()
+    report_cache.invalidate(db, "attendance", dates={day for _, day in employee_days})
+
+def create_adjustment(db: Session, adjustment: schemas.AdjustmentCreate):
+    db_adjustment = models.Adjustment(**adjustment.model_dump())
+    db.add(db_adjustment)
+    db.flush()
+    check_open(db, [db_adjustment.date])
+    _save_adjustment(db, db_adjustment.id, [(db_adjustment.employee_id, db_adjustment.date)])
+    db.refresh(db_adjustment)
+    return db_adjustment
+
+def update_adjustment(db: Session, adjustment_id: int, adjustment_data: schemas.AdjustmentCreate):
+    db_adjustment = db.query(models.Adjustment).filter(models.Adjustment.id == adjustment_id).first()
+    if not db_adjustment:
+        return None
+    before = (db_adjustment.employee_id, db_adjustment.date)
+    for field, value in adjustment_data.model_dump().items():
+        setattr(db_adjustment, field, value)
+    db.flush()
+    check_open(db, [before[1], db_adjustment.date])
+    _save_adjustment(db, adjustment_id, [before, (db_adjustment.employee_id, db_adjustment.date)])
+    db.refresh(db_adjustment)
+    return db_adjustment
+
+def delete_adjustment(db: Session, adjustment_id: int):
+    db_adjustment = db.query(models.Adjustment).filter(models.Adjustment.id == adjustment_id).first()
+    if db_adjustment:
+        db.delete(db_adjustment)
+        db.flush()
+        check_open(db, [db_adjustment.date])
+        _save_adjustment(db, adjustment_id, [(db_adjustment.employee_id, db_adjustment.date)])
+    return db_adjustment
 
 # -- Payroll calculation --
+
+# Splits a grand total into bank and cash, cash rounded down to the nearest 50€
+def split_bank_cash(grand_total: float, days_worked: float, bank_daily_amount: float):
+    target_bank = bank_daily_amount * days_worked
+    target_cash = grand_total - target_bank
+
+    if target_cash < 0 :
+        target_cash = 0
+        target_bank = grand_total
+
+    remainder = target_cash % 50
+
+    if target_bank == 0 or target_bank < remainder:
+        final_cash = target_cash
+        final_bank = target_bank
+    else:
+        final_cash = target_cash - remainder
+        final_bank = grand_total - final_cash
+
+    return final_bank, final_cash
+
+# One payroll line from a grouped ledger row (id, name, bank_daily_amount and the sums)
+def payment_item(row):
+    grand_total = row.total_wage + row.total_overtime + row.total_extra
+    final_bank, final_cash = split_bank_cash(grand_total, row.days_worked, row.bank_daily_amount)
+
+    return {
+        "employee_id": row.id,
+        "employee_name": row.name,
+        "days_worked": row.days_worked,
+        "total_wage": row.total_wage,
+        "total_overtime_hours": row.total_overtime_hours,
+        "total_overtime": row.total_overtime,
+        "total_extra": row.total_extra,
+        "extra_reasons": row.extra_reasons or "",
+        "grand_total": grand_total,
+        "bank_pay": final_bank,
+        "cash_pay": final_cash
+    }
+
+# Grouped query over the cost ledger, one row per employee.
+# With periods, one row per (period, employee) and the period index in the "period" column,
+# the ledger of the whole span is scanned once and every row counted in the period holding its date.
+def payroll_query(start: date, end: date, periods=None):
+    led = models.DailyCostLedger
+    emp = models.Employee
+
+    in_range = (led.date >= start, led.date <= end)
+    is_wage = led.kind == "wage"
+    is_extra = (led.kind == "extra") & (led.amount > 0)
+    paid_overtime = (led.kind == "overtime") & (led.worked == True)
+
+    keys = ()
+    if periods:
+        # Joined as a small table of periods, SQLite walks the date index once per period
+        bounds = union_all(*(
+            select(literal(index).label("period"), literal(first, Date).label("first"), literal(last, Date).label("last"))
+            for index, (first, last) in enumerate(periods)
+        )).cte("periods")
+        in_range = (led.date >= bounds.c.first, led.date <= bounds.c.last)
+        keys = (bounds.c.period,)
+
+    # Distinct reasons per employee (and period), joined with ", " like the report expects.
+    # Read from the adjustments table, a range of its date index, instead of the whole ledger.
+    # Adjustments are few, their period is looked up per row.
+    adj = models.Adjustment
+    reason_periods = ()
+    if periods:
+        reason_periods = (select(bounds.c.period).where(
+            adj.date >= bounds.c.first, adj.date <= bounds.c.last
+        ).scalar_subquery().label("period"),)
+    distinct_reasons = select(*reason_periods, adj.employee_id, adj.reason).where(
+        adj.date >= start, adj.date <= end, adj.amount > 0, adj.reason != ""
+    ).distinct().subquery()
+    reason_keys = [distinct_reasons.c[key.name] for key in keys]
+    reasons = select(
+        *reason_keys,
+        distinct_reasons.c.employee_id,
+        func.group_concat(distinct_reasons.c.reason, ", ").label("extra_reasons"),
+    ).group_by(*reason_keys, distinct_reasons.c.employee_id).subquery()
+
+    joined = reasons.c.employee_id == emp.id
+    for key in keys:
+        joined &= reasons.c[key.name] == key
+
+    if periods:
+        source, where = bounds.join(led, and_(*in_range)).join(emp, led.employee_id == emp.id), ()
+    else:
+        source, where = emp.__table__.join(led, led.employee_id == emp.id), in_range
+
+    days_worked = func.sum(case((is_wage, led.days), else_=0.0))
+    total_extra = func.sum(case((is_extra, led.amount), else_=0.0))
+
+    # Employees with only unpaid overtime in the range get no line
+    return select(
+        *keys, emp.id, emp.name, emp.bank_daily_amount,
+        days_worked.label("days_worked"),
+        func.sum(case((is_wage, led.amount), else_=0.0)).label("total_wage"),
+        func.sum(case((paid_overtime, led.hours), else_=0.0)).label("total_overtime_hours"),
+        func.sum(case((paid_overtime, led.amount), else_=0.0)).label("total_overtime"),
+        total_extra.label("total_extra"),
+        reasons.c.extra_reasons,
+    ).select_from(source).outerjoin(
+        reasons, joined
+    ).where(*where).group_by(*keys, emp.id).having(
+        (days_worked != 0) | (total_extra != 0)
+    ).order_by(*keys, emp.id)
+
+@report_cache.cached(("employees", "attendance"))
 def calculate_payroll(db: Session, start: date, end: date):
-    employees = get_employees(db)
-    results = []
-
-    for emp in employees:
-        records = db.query(models.Attendance).filter(
-            models.Attendance.employee_id == emp.id,
-            models.Attendance.date >= start,
-            models.Attendance.date <= end
-        ).all()
-
-        days_worked = 0.0
-        sum_wage = 0.0
-        sum_overtime = 0.0
-        sum_overtime_hours = 0.0
-        sum_extra = 0.0
-        reasons_list = []
+    if vectorized.ENABLED:
+        return vectorized.calculate_payroll(db, start, end)
 
-        for rec in records:
-            if rec.present or rec.is_half_day:
-                multiplier = 0.5 if rec.is_half_day else 1.0
-                days_worked += multiplier
-                sum_wage += (emp.daily_wage * multiplier)
-                sum_overtime += (rec.overtime_hours * emp.overtime_rate)
-                sum_overtime_hours += rec.overtime_hours
-            if rec.extra_amount > 0:
-                sum_extra += rec.extra_amount
-                if rec.extra_reason:
-                    reasons_list.append(rec.extra_reason)
-
-        final_reasons = ", ".join(list(set(reasons_list)))
-
-        grand_total = sum_wage + sum_overtime + sum_extra
-        
-        if days_worked == 0 and sum_extra == 0:
-            continue
-
-        target_bank = emp.bank_daily_amount * days_worked
-        target_cash = grand_total - target_bank
-
-        if target_cash < 0 :
-            target_cash = 0
-            target_bank = grand_total
-
-        remainder = target_cash % 50
-
-        if target_bank == 0 or target_bank < remainder:
-            final_cash = target_cash
-            final_bank = target_bank
-        else:
-            final_cash = target_cash - remainder
-            final_bank = grand_total - final_cash
-
-        results.append({
-            "employee_id": emp.id,
-            "employee_name": emp.name,
-            "days_worked": days_worked,
-            "total_wage": sum_wage,
-            "total_overtime_hours": sum_overtime_hours,
-            "total_overtime": sum_overtime,
-            "total_extra": sum_extra,      
-            "extra_reasons": final_reasons,
-            "grand_total": grand_total,
-            "bank_pay": final_bank,
-            "cash_pay": final_cash
-        })
+    totals = payroll_query(start, end)
+    results = [payment_item(row) for row in db.execute(totals)]
 
     return{
     "start_date": start,
     "end_date": end,
     "payments": results
     }
+
+def stream_payroll(db: Session, start: date, end: date):
+    rows = db.execute(payroll_query(start, end).execution_options(yield_per=PDF_PARTITION))
+    return {"start_date": start, "end_date": end, "payments": (payment_item(row) for row in rows)}
+
+# -- Payroll batch (several periods in one pass) --
+
+MAX_BATCH_PERIODS = 366
+PERIOD_DAYS = {"week": 7, "fortnight": 14}
+
+# Consecutive periods covering start..end: weeks / fortnights counted from start,
+# months split on the calendar month. The last period stops at end.
+def split_periods(start: date, end: date, period: str):
+    if start > end:
+        raise ValueError("start after end")
+    periods = []
+    first = start
+    while first <= end:
+        if len(periods) == MAX_BATCH_PERIODS:
+            raise ValueError(f"more than {MAX_BATCH_PERIODS} periods")
+        if period == "month":
+            following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        else:
+            following = first + timedelta(days=PERIOD_DAYS[period])
+        periods.append((first, min(following - timedelta(days=1), end)))
+        first = following
+    return periods
+
+# Periods sorted by start, each one valid and none overlapping another (a row belongs to one period)
+def check_periods(periods):
+    periods = sorted(periods)
+    if not periods or len(periods) > MAX_BATCH_PERIODS:
+        raise ValueError(f"between 1 and {MAX_BATCH_PERIODS} periods")
+    for index, (first, last) in enumerate(periods):
+        if first > last:
+            raise ValueError("start after end")
+        if index and first <= periods[index - 1][1]:
+            raise ValueError("overlapping periods")
+    return periods
+
+def payroll_totals(payments):
+    return {
+        "employees": len(payments),
+        "total_extra": sum(p["total_extra"] for p in payments),
+        "grand_total": sum(p["grand_total"] for p in payments),
+        "bank_pay": sum(p["bank_pay"] for p in payments),
+        "cash_pay": sum(p["cash_pay"] for p in payments),
+    }
+
+# One query over the span of all periods, the 50€ split is applied per period like calculate_payroll.
+# A period closed exactly as asked gets its stored payments, like /payroll/ (see get_snapshot).
+def calculate_payroll_batch(db: Session, periods):
+    periods = check_periods(periods)
+    if vectorized.ENABLED:
+        payments = vectorized.calculate_payroll_batch(db, periods)
+    else:
+        payments = [[] for _ in periods]
+        for row in db.execute(payroll_query(periods[0][0], periods[-1][1], periods)):
+            payments[row.period].append(payment_item(row))
+    closed = closed_payments(db, periods)
+    payments = [closed.get(period, lines) for period, lines in zip(periods, payments)]
+
+    reports = [
+        {"start_date": first, "end_date": last, "payments": lines, "totals": payroll_totals(lines)}
+        for (first, last), lines in zip(periods, payments)
+    ]
+    return {
+        "start_date": periods[0][0],
+        "end_date": periods[-1][1],
+        "periods": reports,
+        "totals": payroll_totals([line for lines in payments for line in lines]),
+    }
+
+# -- Payroll period close --
+# Closing a period stores its payroll (see models.ClosedPeriod), /payroll/ and /payroll/pdf of exactly
+# that period then return the stored bytes. Attendance and adjustment writes call check_open after
+# their first statement, when the transaction already holds the write lock of the base, so a close
+# committed at the same moment is always seen.
+
+PAYROLL_TABLES = ("employees", "attendance") # What calculate_payroll reads
+
+class PeriodClosedError(ValueError):
+    def __init__(self, start: date, end: date):
+        super().__init__(f"payroll period {start} - {end} is closed")
+        self.start, self.end = start, end
+
+class PeriodChangedError(ValueError):
+    """The employees or the attendance changed while the period was being closed."""
+
+# Rolls the write back and raises PeriodClosedError when one of the days is inside a closed period
+def check_open(db: Session, days):
+    if not days:
+        return # Nothing written, and or_() of no condition is deprecated
+    cp = models.ClosedPeriod
+    closed = db.execute(
+        select(cp.start_date, cp.end_date).where(
+            or_(*(and_(cp.end_date >= day, cp.start_date <= day) for day in set(days)))
+        ).limit(1)
+    ).first()
+    if closed:
+        db.rollback()
+        raise PeriodClosedError(closed.start_date, closed.end_date)
+
+def payroll_versions(db: Session):
+    return versions.read(db, *PAYROLL_TABLES)
+
+# (content_hash, content) of a closed period, part is "report" or "pdf". None when start..end is not closed.
+def get_snapshot(db: Session, start: date, end: date, part: str):
+    cp = models.ClosedPeriod
+    return db.execute(
+        select(cp.content_hash, getattr(cp, part).label("content")).where(cp.start_date == start, cp.end_date == end)
+    ).first()
+
+# {(start, end): payments} of the stored reports of the periods that are closed exactly as given
+def closed_payments(db: Session, periods):
+    cp = models.ClosedPeriod
+    rows = db.execute(
+        select(cp.start_date, cp.end_date, cp.report).where(tuple_(cp.start_date, cp.end_date).in_(periods))
+    ).all()
+    return {(row.start_date, row.end_date): json.loads(row.report)["payments"] for row in rows}
+
+_CLOSED_FIELDS = tuple(schemas.ClosedPeriod.model_fields)
+
+def list_closed_periods(db: Session):
+    cp = models.ClosedPeriod
+    return db.execute(select(*(getattr(cp, field) for field in _CLOSED_FIELDS)).order_by(cp.start_date)).all()
+
+# report is calculate_payroll(start, end), body its JSON and pdf its PDF, computed while the
+# data was at seen_versions (payroll_versions). Raises PeriodChangedError when it has moved on.
+def close_payroll_period(db: Session, start: date, end: date, report, body: bytes, pdf: bytes, seen_versions):
+    cp = models.ClosedPeriod
+    period = cp(
+        start_date=start, end_date=end, closed_at=datetime.now(),
+        employees=len(report["payments"]), grand_total=sum(p["grand_total"] for p in report["payments"]),
+        content_hash=hashlib.sha256(body).hexdigest(), report=body, pdf=pdf,
+    )
+    db.add(period)
+    try:
+        db.flush() # Takes the write lock, the checks below see every committed write
+    except IntegrityError: # The same period is already closed
+        db.rollback()
+        raise PeriodClosedError(start, end)
+
+    overlapping = db.execute(
+        select(cp.start_date, cp.end_date).where(cp.id != period.id, cp.end_date >= start, cp.start_date <= end).limit(1)
+    ).first()
+    if overlapping:
+        db.rollback()
+        raise PeriodClosedError(overlapping.start_date, overlapping.end_date)
+    if payroll_versions(db) != seen_versions:
+        db.rollback()
+        raise PeriodChangedError()
+
+    closed = {field: getattr(period, field) for field in _CLOSED_FIELDS}
+    db.commit()
+    return closed
+
+# Reopens the period, its snapshot is deleted and the payroll is computed from the data again
+def reopen_payroll_period(db: Session, period_id: int):
+    cp = models.ClosedPeriod
+    closed = db.execute(select(*(getattr(cp, field) for field in _CLOSED_FIELDS)).where(cp.id == period_id)).first()
+    if closed:
+        db.execute(cp.__table__.delete().where(cp.id == period_id))
+        db.commit()
+    return closed
+
+# -- Analytics (monthly rollups, see rollups.py) --
+
+# Splits start..end into whole months, read from the rollups, and the days before / after them,
+# read from the ledger. Returns ((first month, last month) or None, [(first day, last day), ...]).
+def split_months(start: date, end: date):
+    first_month = start if start.day == 1 else (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    after_end = end + timedelta(days=1)
+    last_month_end = end if after_end.day == 1 else end.replace(day=1) - timedelta(days=1)
+    if first_month > last_month_end:
+        return None, [(start, end)]
+
+    edges = []
+    if start < first_month:
+        edges.append((start, first_month - timedelta(days=1)))
+    if end > last_month_end:
+        edges.append((last_month_end + timedelta(days=1), end))
+    return (first_month, last_month_end.replace(day=1)), edges
+
+ANALYTICS_SUMS = ("days", "overtime_hours", "wage", "overtime", "extra")
+
+# One row per boat or employee (and month with by_month). Whole months come from the rollup table
+# matching the filters, the unaligned edges from the ledger, both summed in one statement.
+def analytics_query(dimension: str, start: date, end: date, boat_id: int = None, employee_id: int = None,
+                    by_month: bool = False):
+    led = models.DailyCostLedger
+    if dimension == "boat":
+        rollup = models.RollupBoatEmployeeMonth if employee_id else models.RollupBoatMonth
+        named = models.Boat
+    else:
+        rollup = models.RollupBoatEmployeeMonth if boat_id else models.RollupEmployeeMonth
+        named = models.Employee
+    key = f"{dimension}_id"
+
+    def filters(table):
+        found = []
+        if boat_id:
+            found.append(table.boat_id == boat_id)
+        if employee_id:
+            found.append(table.employee_id == employee_id)
+        return found
+
+    months, edges = split_months(start, end)
+    parts = []
+    if months:
+        parts.append(select(
+            getattr(rollup, key).label("key"), rollup.month.label("month"),
+            *(getattr(rollup, name).label(name) for name in ANALYTICS_SUMS),
+        ).where(rollup.month >= months[0], rollup.month <= months[1], *filters(rollup)))
+
+    is_wage, is_overtime = led.kind == "wage", led.kind == "overtime"
+    ledger_sums = (
+        case((is_wage, led.days), else_=0.0),
+        case((is_overtime, led.hours), else_=0.0),
+        case((is_wage, led.amount), else_=0.0),
+        case((is_overtime, led.amount), else_=0.0),
+        case((led.kind == "extra", led.amount), else_=0.0),
+    )
+    for first, last in edges:
+        month = type_coerce(func.date(led.date, "start of month"), Date)
+        parts.append(select(
+            getattr(led, key).label("key"), month.label("month"),
+            *(func.sum(value).label(name) for name, value in zip(ANALYTICS_SUMS, ledger_sums)),
+        ).where(led.date >= first, led.date <= last, *filters(led)).group_by(getattr(led, key), month))
+
+    rows = union_all(*parts).subquery()
+    keys = (rows.c.key, rows.c.month) if by_month else (rows.c.key,)
+    sums = [func.sum(rows.c[name]).label(name) for name in ANALYTICS_SUMS]
+    return select(
+        rows.c.key.label("id"), named.name, (rows.c.month if by_month else literal(None, Date)).label("month"), *sums,
+    ).join(named, named.id == rows.c.key).group_by(*keys).order_by(named.name, *keys)
+
+def _analytics(db: Session, dimension, start, end, boat_id=None, employee_id=None, by_month=False):
+    items = []
+    for rec in db.execute(analytics_query(dimension, start, end, boat_id, employee_id, by_month)):
+        item = {"id": rec.id, "name": rec.name, "month": rec.month}
+        item.update({name: getattr(rec, name) for name in ANALYTICS_SUMS})
+        item["total_cost"] = rec.wage + rec.overtime + rec.extra
+        items.append(item)
+    return {
+        "start_date": start,
+        "end_date": end,
+        "total_cost": sum(item["total_cost"] for item in items),
+        "items": items,
+    }
+
+# Cost per boat, optionally of one employee only
+@report_cache.cached(("employees", "boats", "attendance"))
+def get_boat_analytics(db: Session, start: date, end: date, employee_id: int = None, by_month: bool = False):
+    return _analytics(db, "boat", start, end, employee_id=employee_id, by_month=by_month)
+
+# Cost per employee, optionally on one boat only
+@report_cache.cached(("employees", "boats", "attendance"), boat="boat_id")
+def get_employee_analytics(db: Session, start: date, end: date, boat_id: int = None, by_month: bool = False):
+    return _analytics(db, "employee", start, end, boat_id=boat_id, by_month=by_month)
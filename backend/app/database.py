@@ -1,13 +1,86 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from . import metrics
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./payroll.db"  # Creates a file payroll.db at the current path
+# -- Configuration (environment variables) --
+# PAYROLL_DATABASE_URL   where the base lives, default is payroll.db at the current path
+# PAYROLL_DB_PROFILE     "fast" (WAL, default) or "safe" (rollback journal, full fsync on every commit)
+# PAYROLL_DB_POOL_SIZE   connections kept open in the pool
 
-engine = create_engine (
-    SQLALCHEMY_DATABASE_URL, connect_args= {"check_same_thread" : False} # We allow a lot of threads to use the base at the same time
-)
+SQLALCHEMY_DATABASE_URL = os.getenv("PAYROLL_DATABASE_URL", "sqlite:///./payroll.db")
+DB_PROFILE = os.getenv("PAYROLL_DB_PROFILE", "fast")
+DB_POOL_SIZE = int(os.getenv("PAYROLL_DB_POOL_SIZE", "5"))
+
+PROFILES = {
+    # Readers do not wait for writers and a commit no longer waits for a full fsync
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,       # 64 MB page cache (negative means KiB)
+        "mmap_size": 268435456,     # 256 MB memory mapped reads
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,       # ms to wait for a lock before "database is locked"
+    },
+    # SQLite defaults, kept for network drives where WAL is not supported
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+}
+
+def _check_profile(profile):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}', choose one of {list(PROFILES)}")
+    return PROFILES[profile]
+
+def _apply_pragmas(engine, pragmas):
+    # Runs once for every new connection of the pool
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+def make_engine(url=SQLALCHEMY_DATABASE_URL, profile=DB_PROFILE, pool_size=DB_POOL_SIZE):
+    pragmas = _check_profile(profile)
+
+    engine = create_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,  # We allow a lot of threads to use the base at the same time
+            "factory": metrics.CountingConnection, # Rows read per request, see metrics.py
+        },
+        pool_size=pool_size,
+        max_overflow=pool_size * 2,
+    )
+    _apply_pragmas(engine, pragmas)
+    metrics.instrument(engine)
+    return engine
+
+# Same base through aiosqlite, used by the streamed exports. sqlite:/// urls are switched to the async driver.
+def make_async_engine(url=SQLALCHEMY_DATABASE_URL, profile=DB_PROFILE, pool_size=DB_POOL_SIZE):
+    pragmas = _check_profile(profile)
+    if url.startswith("sqlite:"):
+        url = "sqlite+aiosqlite:" + url[len("sqlite:"):]
+
+    # aiosqlite defaults to NullPool (a new connection and PRAGMAs on every request), keep a pool like the sync engine
+    engine = create_async_engine(
+        url, poolclass=AsyncAdaptedQueuePool, pool_size=pool_size, max_overflow=pool_size * 2
+    )
+    _apply_pragmas(engine.sync_engine, pragmas)
+    metrics.instrument(engine.sync_engine)
+    return engine
+
+engine = make_engine()
+async_engine = make_async_engine()
 
 SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = engine) # Not permanent save if the user does not give permission
+AsyncSessionLocal = async_sessionmaker(autoflush = False, bind = async_engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from . import crud
+
+# -- CSV / NDJSON exports --
+# Generators of text for StreamingResponse. The first CSV line starts with a BOM
+# so Excel opens the Greek names as UTF-8.
+# The streamed exports take the partitions of async_crud.stream_rows and write one chunk
+# per partition, so memory follows the partition size and not the length of the range.
+
+BOM = "﻿"
+
+def _format(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def _csv_lines(header, rows):
+    yield BOM + _format([header])
+    for row in rows:
+        yield _format([row])
+
+async def _csv_stream(header, partitions, item):
+    yield BOM + _format([header])
+    async for rows in partitions:
+        lines = (item(row) for row in rows)
+        yield _format([line[column] for column in header] for line in lines)
+
+PAYROLL_COLUMNS = [
+    "employee_id", "employee_name", "days_worked", "total_wage", "total_overtime_hours",
+    "total_overtime", "total_extra", "extra_reasons", "grand_total", "bank_pay", "cash_pay",
+]
+EXPENSE_COLUMNS = ["date", "employee_name", "boat_name", "daily_cost", "overtime_cost", "total_cost"]
+
+# One line per (period, employee), the period in the first two columns
+def payroll_batch_csv(batch):
+    rows = (
+        [period["start_date"], period["end_date"]] + [item[column] for column in PAYROLL_COLUMNS]
+        for period in batch["periods"]
+        for item in period["payments"]
+    )
+    return _csv_lines(["period_start", "period_end"] + PAYROLL_COLUMNS, rows)
+
+# Rows of crud.payroll_query
+def payroll_csv(partitions):
+    return _csv_stream(PAYROLL_COLUMNS, partitions, crud.payment_item)
+
+# The payments of a stored payroll report (closed periods), same lines as payroll_csv
+def payroll_report_csv(report):
+    return _csv_lines(PAYROLL_COLUMNS, ([item[column] for column in PAYROLL_COLUMNS] for item in report["payments"]))
+
+# Rows of crud.expenses_query
+def expenses_csv(partitions):
+    return _csv_stream(EXPENSE_COLUMNS, partitions, crud.expense_item)
+
+# Rows of crud.boat_analysis_query, one JSON object per line
+async def boat_analysis_ndjson(partitions):
+    async for rows in partitions:
+        yield "".join(
+            json.dumps(crud.analysis_item(row), default=str, ensure_ascii=False) + "\n" for row in rows
+        )
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from . import migrations
+
+# -- Conditional GET --
+# The list and report routes send a strong ETag made of the URL and the data versions of the tables
+# they read (see versions.py). A request whose If-None-Match holds it gets 304 after one query, the
+# read of data_versions (every request reads it, so the tags follow the writes of the other workers),
+# and Cache-Control: no-cache lets the browser keep the body and ask again every time.
+# The schema version is in the tag too, so an upgrade that changes the responses drops the old tags.
+
+def etag(path, query, data_versions):
+    raw = json.dumps([path, query, migrations.LATEST_VERSION, data_versions], sort_keys=True)
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+# The tag of If-None-Match that is still current (sent back with the 304), None when there is none
+def matched(if_none_match, tag):
+    if not if_none_match:
+        return None
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    if "*" in candidates:
+        return tag
+    return next((candidate for candidate in (tag, gzip_tag(tag)) if candidate in candidates), None)
+
+def cache_headers(tag):
+    return {"ETag": tag, "Cache-Control": "no-cache"}
+
+# -- Compression --
+# JSON, CSV and ndjson bodies of at least COMPRESS_MIN_BYTES are gzipped for the clients that accept it.
+# PDFs and ZIPs are already compressed and go out as they are. A gzipped body is another
+# representation, so its strong ETag gets a -gzip suffix (and matched() takes both back).
+#
+# PAYROLL_GZIP_MIN_BYTES   smallest body worth compressing (default 1024)
+# PAYROLL_GZIP_LEVEL       1 (fastest) to 9 (smallest), default 6
+
+COMPRESS_MIN_BYTES = int(os.getenv("PAYROLL_GZIP_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("PAYROLL_GZIP_LEVEL", "6"))
+COMPRESSED_TYPES = ("application/json", "text/csv", "application/x-ndjson")
+
+def gzip_tag(tag):
+    return tag[:-1] + '-gzip"' if tag.endswith('"') else tag
+
+class _Compressible:
+    """Skips the content types outside COMPRESSED_TYPES, the rest is Starlette's GZip responder."""
+
+    async def send_with_compression(self, message):
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            await super().send_with_compression(message)
+            self.content_type_is_excluded = not content_type.startswith(COMPRESSED_TYPES)
+        else:
+            await super().send_with_compression(message)
+
+class _GZipResponder(_Compressible, GZipResponder):
+    pass
+
+class _IdentityResponder(_Compressible, IdentityResponder):
+    pass
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES, compresslevel=COMPRESS_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if "gzip" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            return await _IdentityResponder(self.app, self.minimum_size)(scope, receive, send)
+
+        async def send_with_tag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if headers.get("content-encoding") == "gzip" and "etag" in headers:
+                    headers["ETag"] = gzip_tag(headers["etag"])
+            await send(message)
+
+        responder = _GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        await responder(scope, receive, send_with_tag)
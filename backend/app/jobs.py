@@ -0,0 +1,240 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+from . import crud, pdf_utils, report_cache, versions
+
+# -- Background PDF jobs --
+# PDFs are rendered in a pool of worker processes so the API threads stay free.
+# A finished PDF is kept on disk under a key made of (report, parameters, data versions),
+# so asking again for the same month while nothing changed returns the file right away.
+#
+# Configuration (environment variables):
+# PAYROLL_JOB_WORKERS         processes rendering PDFs, default 2
+# PAYROLL_ARTIFACT_DIR        folder of the finished PDFs, default payroll_artifacts in the temp folder
+# PAYROLL_ARTIFACT_CACHE_MB   size limit of that folder, the least recently used files are removed first
+
+JOB_WORKERS = int(os.getenv("PAYROLL_JOB_WORKERS", "2"))
+ARTIFACT_DIR = os.getenv("PAYROLL_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "payroll_artifacts"))
+ARTIFACT_CACHE_BYTES = int(os.getenv("PAYROLL_ARTIFACT_CACHE_MB", "200")) * 1024 * 1024
+JOB_TTL = 3600 # seconds a finished job stays pollable
+
+# Which tables every report reads (their versions go into the key) and how the download is named
+REPORTS = {
+    "payroll-pdf": {
+        "tables": ("employees", "attendance"),
+        "filename": "payroll_{start}_{end}.pdf",
+    },
+    "boat-analysis-pdf": {
+        "tables": ("employees", "boats", "attendance"),
+        "filename": "boat_{boat_id}_analysis_{start}_{end}.pdf",
+    },
+    "short-analysis-pdf": {
+        "tables": ("employees", "boats", "attendance"),
+        "filename": "short_analysis_boat_{boat_id}_{start}_{end}.pdf",
+    },
+}
+
+# Progress written by the worker next to the artifact, read back when the job is polled
+STAGES = {"querying": 10, "rendering": 40, "saving": 90}
+
+# -- Worker side (runs in the pool processes) --
+
+def _init_worker():
+    pdf_utils.load_fonts()
+    report_cache.disable() # Writes invalidate the cache of the API process only
+
+def _set_stage(path, stage):
+    with open(path + ".progress", "w") as f:
+        f.write(stage)
+
+def render_report(report, params, path):
+    try:
+        return _render_report(report, params, path)
+    finally:
+        if os.path.exists(path + ".progress"):
+            os.remove(path + ".progress")
+
+def _render_report(report, params, path):
+    from .database import SessionLocal
+
+    start = date.fromisoformat(params["start"])
+    end = date.fromisoformat(params["end"])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _set_stage(path, "querying")
+    db = SessionLocal()
+    try:
+        # Streamed like the PDF routes, the rows are read while the PDF is laid out
+        if report == "payroll-pdf":
+            data = crud.stream_payroll(db, start, end)
+            render = pdf_utils.generate_payroll_pdf
+        elif report == "boat-analysis-pdf":
+            data = crud.stream_boat_analysis(db, params["boat_id"], start_date=start, end_date=end)
+            render = pdf_utils.generate_boat_analysis_pdf
+        else:
+            data = crud.stream_short_boat_analysis(db, params["boat_id"], start_date=start, end_date=end)
+            render = pdf_utils.generate_short_boat_analysis_pdf
+        if not data:
+            raise LookupError("Δεν βρέθηκαν δεδομένα")
+
+        _set_stage(path, "rendering")
+        output = render(data)
+    finally:
+        db.close()
+
+    _set_stage(path, "saving")
+    return save_artifact(path, output)
+
+# Written under a temporary name first so a half written file is never served
+def save_artifact(path, output):
+    partial = f"{path}.{os.getpid()}.part"
+    with output, open(partial, "wb") as f:
+        shutil.copyfileobj(output, f)
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+# -- Artifact cache --
+
+def artifact_key(report, params, data_versions):
+    raw = json.dumps([report, params, data_versions], sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def artifact_path(key):
+    return os.path.join(ARTIFACT_DIR, key + ".pdf")
+
+def prune_artifacts(limit=ARTIFACT_CACHE_BYTES):
+    if not os.path.isdir(ARTIFACT_DIR):
+        return
+    files = []
+    for entry in os.scandir(ARTIFACT_DIR):
+        if entry.name.endswith(".pdf"):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+# -- Job registry (in memory, per API process) --
+
+@dataclass
+class Job:
+    id: str
+    report: str
+    params: dict
+    key: str
+    created_at: float
+    future: Optional[object] = None # None when the artifact was already cached
+
+    @property
+    def path(self):
+        return artifact_path(self.key)
+
+    @property
+    def filename(self):
+        return REPORTS[self.report]["filename"].format(**self.params)
+
+    @property
+    def status(self):
+        if self.future is None:
+            return "done"
+        if self.future.done():
+            return "failed" if self.future.exception() else "done"
+        return "running" if self.future.running() else "queued"
+
+    def progress(self):
+        status = self.status
+        if status in ("done", "failed"):
+            return 100
+        if status == "queued":
+            return 0
+        try:
+            with open(self.path + ".progress") as f:
+                return STAGES.get(f.read(), 0)
+        except FileNotFoundError:
+            return 0
+
+    def to_dict(self):
+        status = self.status
+        return {
+            "id": self.id,
+            "report": self.report,
+            "params": self.params,
+            "status": status,
+            "progress": self.progress(),
+            "error": str(self.future.exception()) if status == "failed" else None,
+            "download_url": f"/jobs/{self.id}/download" if status == "done" else None,
+        }
+
+_lock = threading.RLock() # The done callback takes it too and may run inside submit
+_jobs = {}
+_running = {} # artifact key -> future, two requests for the same PDF share one render
+_pool = None
+
+def _get_pool(renew=False):
+    global _pool
+    if _pool is None or renew:
+        # spawn everywhere, so Linux behaves like Windows and no lock of the API threads is copied
+        _pool = ProcessPoolExecutor(
+            max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        )
+    return _pool
+
+def _finished(key):
+    def callback(future):
+        with _lock:
+            _running.pop(key, None)
+        prune_artifacts()
+    return callback
+
+def submit(db, report, **params):
+    # A closed payroll period has its PDF stored (see crud.get_snapshot), keyed by the snapshot and not the data
+    snapshot = crud.get_snapshot(db, params["start"], params["end"], "pdf") if report == "payroll-pdf" else None
+    params = {name: value.isoformat() if isinstance(value, date) else value for name, value in params.items()}
+    if snapshot:
+        key = artifact_key(report, params, {"closed": snapshot.content_hash})
+    else:
+        key = artifact_key(report, params, versions.read(db, *REPORTS[report]["tables"]))
+    job = Job(id=uuid.uuid4().hex, report=report, params=params, key=key, created_at=time.time())
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    with _lock:
+        now = time.time()
+        for old_id in [old.id for old in _jobs.values() if now - old.created_at > JOB_TTL]:
+            del _jobs[old_id]
+
+        if key in _running:
+            job.future = _running[key]
+        elif os.path.exists(job.path):
+            os.utime(job.path) # Marks it as recently used for the pruning
+        elif snapshot:
+            save_artifact(job.path, io.BytesIO(snapshot.content))
+        else:
+            try:
+                job.future = _get_pool().submit(render_report, report, params, job.path)
+            except BrokenProcessPool: # A worker died (killed, out of memory), start a fresh pool
+                job.future = _get_pool(renew=True).submit(render_report, report, params, job.path)
+            _running[key] = job.future
+            job.future.add_done_callback(_finished(key))
+        _jobs[job.id] = job
+    return job
+
+def get(job_id):
+    return _jobs.get(job_id)
@@ -0,0 +1,101 @@
+from sqlalchemy import text
+
+# -- Daily cost ledger --
+# One row per attendance row and kind of cost, and one per adjustment:
+#   wage     -> boat_id,          days = multiplier, amount = daily_wage * multiplier   (only when worked)
+#   overtime -> overtime_boat_id, hours,             amount = overtime_hours * rate     (even when not worked)
+#   extra    -> boat_id of the adjustment, reason,   amount                             (adjustment_id set)
+# "worked" keeps whether the employee was present or half day, payroll only pays overtime on worked days.
+# The table is created by the migrations (steps 5 and 9), which keep their own copy of the SQL they ran.
+
+# Which attendance rows a refresh touches
+SCOPES = {
+    "all": "1 = 1",
+    "attendance": "a.id IN (SELECT value FROM json_each(:ids))",
+    "employee": "a.employee_id = :employee_id",
+}
+
+_DELETE = "DELETE FROM daily_cost_ledger WHERE attendance_id IN (SELECT a.id FROM attendance a WHERE {scope})"
+
+_INSERT = """
+    WITH src AS (
+        SELECT a.id, a.date, a.employee_id, a.boat_id, a.overtime_boat_id, a.overtime_hours,
+               COALESCE(e.daily_wage, 0.0) AS daily_wage,
+               COALESCE(e.overtime_rate, 0.0) AS overtime_rate,
+               CASE WHEN a.is_half_day THEN 0.5 WHEN a.present THEN 1.0 ELSE 0.0 END AS multiplier
+        FROM attendance a JOIN employees e ON e.id = a.employee_id
+        WHERE {scope}
+    )
+    INSERT INTO daily_cost_ledger (attendance_id, date, employee_id, boat_id, kind, days, hours, amount, worked, reason)
+    SELECT id, date, employee_id, boat_id, 'wage', multiplier, 0.0, daily_wage * multiplier, 1, NULL
+        FROM src WHERE multiplier > 0
+    UNION ALL
+    SELECT id, date, employee_id, overtime_boat_id, 'overtime', 0.0, overtime_hours, overtime_hours * overtime_rate, multiplier > 0, NULL
+        FROM src WHERE overtime_hours != 0
+"""
+
+# Which adjustments a refresh touches. Ledger rows go by adjustment_id, so deleted adjustments are cleared too.
+ADJUSTMENT_SCOPES = {
+    "all": ("adjustment_id IS NOT NULL", "1 = 1"),
+    "adjustment": ("adjustment_id IN (SELECT value FROM json_each(:ids))", "j.id IN (SELECT value FROM json_each(:ids))"),
+}
+
+_DELETE_ADJUSTMENTS = "DELETE FROM daily_cost_ledger WHERE {scope}"
+
+_INSERT_ADJUSTMENTS = """
+    INSERT INTO daily_cost_ledger (adjustment_id, date, employee_id, boat_id, kind, days, hours, amount, worked, reason)
+    SELECT j.id, j.date, j.employee_id, j.boat_id, 'extra', 0.0, 0.0, j.amount, 0, j.reason
+    FROM adjustments j WHERE {scope} AND j.amount != 0
+"""
+
+def refresh_statements(scope):
+    where = SCOPES[scope]
+    return [_DELETE.format(scope=where), _INSERT.format(scope=where)]
+
+def adjustment_statements(scope):
+    delete_where, insert_where = ADJUSTMENT_SCOPES[scope]
+    return [_DELETE_ADJUSTMENTS.format(scope=delete_where), _INSERT_ADJUSTMENTS.format(scope=insert_where)]
+
+# -- Session helpers used by crud, they run inside the caller's transaction --
+
+def _refresh(db, scope, params):
+    for statement in refresh_statements(scope):
+        db.execute(text(statement), params)
+
+def _ids(ids):
+    return "[" + ",".join(str(int(i)) for i in ids) + "]"
+
+def refresh_attendance(db, attendance_ids):
+    if attendance_ids:
+        _refresh(db, "attendance", {"ids": _ids(attendance_ids)})
+
+def refresh_adjustments(db, adjustment_ids):
+    for statement in adjustment_statements("adjustment"):
+        db.execute(text(statement), {"ids": _ids(adjustment_ids)})
+
+def refresh_employee(db, employee_id):
+    _refresh(db, "employee", {"employee_id": employee_id})
+
+def delete_employee(db, employee_id):
+    db.execute(text("DELETE FROM daily_cost_ledger WHERE employee_id = :employee_id"), {"employee_id": employee_id})
+
+def rebuild(db):
+    db.execute(text("DELETE FROM daily_cost_ledger"))
+    _refresh(db, "all", {})
+    for statement in adjustment_statements("all"):
+        db.execute(text(statement))
+
+if __name__ == "__main__":
+    # Regenerates the whole ledger from attendance and adjustments. Run from the backend folder: python -m app.ledger
+    from .database import SessionLocal, engine
+    from . import migrations, rollups
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        rollups.rebuild(db) # The monthly sums follow the ledger
+        db.commit()
+        count = db.execute(text("SELECT COUNT(*) FROM daily_cost_ledger")).scalar()
+        print(f"Success: daily cost ledger rebuilt with {count} rows")
+    finally:
+        db.close()
@@ -1,13 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException
+import json
+import os
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
 from datetime import date
-from fastapi.responses import StreamingResponse
-from . import crud, models, schemas, pdf_utils
-from .database import SessionLocal, engine
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from . import async_crud, crud, exports, http_cache, models, schemas, pdf_utils, migrations, jobs, metrics, packs, report_cache, versions
+from .database import AsyncSessionLocal, SessionLocal, engine
+from .responses import render_report, report_response
 
-models.Base.metadata.create_all(bind=engine) # Creates the base if not exists
+migrations.upgrade(engine) # Creates or upgrades the base, only reads the schema version when up to date
+pdf_utils.load_fonts() # Parses the TTF files once, every PDF reuses them
 app = FastAPI()
 
 # Here we will define who is allowed to talk with our frontend
@@ -22,11 +28,15 @@ app.add_middleware(
     allow_credentials = True , # Enables cookies / auth headers
     allow_methods = ["*"] , # We allow all the request methods
     allow_headers = ["*"] , # We allow all kind of headers
+    expose_headers = ["X-Total-Count", "X-Next-Cursor"] , # Pagination metadata readable by the frontend
 )
+app.add_middleware(http_cache.CompressionMiddleware) # gzip for large JSON / CSV bodies, see http_cache.py
+app.add_middleware(metrics.MetricsMiddleware) # Latency, SQL and PDF time per route, read at /metrics
 
 # -- Dependency --
 
 # Creates a connection at base for every request. Also close the base when request has finish.
+# Routes are plain def, Starlette runs them (queries and PDF layout) in its threadpool.
 def get_db():
     db = SessionLocal()
     try:
@@ -34,22 +44,101 @@ def get_db():
     finally:
         db.close()
 
+# The streamed exports read through an async session (see async_crud.stream_rows),
+# so a long export does not hold a threadpool thread while the client downloads it
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# -- Listing helpers --
+
+def list_page_or_400(list_function, db, skip, limit, after, order_by, q, status):
+    try:
+        return list_function(db, limit=limit, after=after, order_by=order_by, name_prefix=q, status=status, skip=skip)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Μη έγκυρο cursor")
+
+def set_page_headers(response: Response, page):
+    response.headers["X-Total-Count"] = str(page["total"])
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+
+# Exports read the rows from a server side cursor while the response is being sent (see exports.py)
+def stream_export(chunks, media_type, filename, headers=None):
+    return StreamingResponse(
+        chunks, media_type=media_type, headers={"Content-Disposition": f"attachment; filename={filename}", **(headers or {})}
+    )
+
+# The stored bytes of a closed payroll period, with its content hash as ETag (304 when the client has them).
+# content replaces the stored bytes by another form of them (the CSV of the stored report).
+def snapshot_response(request: Request, snapshot, media_type, headers=None, content=None):
+    tag = f'"{snapshot.content_hash}"'
+    current = http_cache.matched(request.headers.get("If-None-Match"), tag)
+    if current:
+        return Response(status_code=304, headers=http_cache.cache_headers(current))
+    return Response(
+        snapshot.content if content is None else content,
+        media_type=media_type, headers={**http_cache.cache_headers(tag), **(headers or {})}
+    )
+
+# -- Conditional GET (see http_cache.py) --
+
+# Dependency of the GET routes that read `tables`. Raises 304 when the client's copy is still current,
+# after one read of data_versions and nothing else, else returns the ETag headers, already set for routes returning data and to pass on by the ones returning a Response.
+def conditional(*tables):
+    def check(request: Request, response: Response, db: Session = Depends(get_db)):
+        data_versions = versions.current(db) # One read per request, the cached reports reuse it
+        tag = http_cache.etag(
+            request.url.path, sorted(request.query_params.multi_items()), {table: data_versions[table] for table in tables}
+        )
+        current = http_cache.matched(request.headers.get("If-None-Match"), tag)
+        if current:
+            raise HTTPException(status_code=304, headers=http_cache.cache_headers(current))
+        headers = http_cache.cache_headers(tag)
+        response.headers.update(headers)
+        return headers
+    return check
+
+# -- Errors --
+
+# Attendance and adjustments inside a closed payroll period are refused (see crud.check_open)
+@app.exception_handler(crud.PeriodClosedError)
+async def period_closed(request, error: crud.PeriodClosedError):
+    return JSONResponse(status_code=409, content={"detail": f"Η μισθοδοσία {error.start} έως {error.end} είναι κλειστή"})
+
 # -- Routes --
 
 @app.get("/")
 def read_root():
     return{"message" : "API works fine"}
 
+# Prometheus scrape endpoint, see metrics.py
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(report_cache.stats()), media_type="text/plain; version=0.0.4")
+
 # 1. -- Employee --
-# When we read the database we will ask from the code to bring max 100 registrations
 @app.post("/employees/", response_model = schemas.Employee)
 def create_employee(employee: schemas.EmployeeCreate, db: Session = Depends(get_db)):
     return crud.create_employee(db= db, employee= employee)
 
+# Pages with ?limit=&after=<X-Next-Cursor>, the total of matching rows is in X-Total-Count.
+# Without limit the whole (filtered) list is returned like before.
 @app.get("/employees/", response_model= List[schemas.Employee])
-def read_employees(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    employees = crud.get_employees(db)
-    return employees
+def read_employees(
+    response: Response,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    order_by: Literal["id", "name"] = "id",
+    q: Optional[str] = None,
+    status: Literal["active", "archived", "all"] = "all",
+    db: Session = Depends(get_db),
+    etag: dict = Depends(conditional("employees"))
+):
+    page = list_page_or_400(crud.list_employees, db, skip, limit, after, order_by, q, status)
+    set_page_headers(response, page)
+    return page["items"]
 
 @app.put("/employees/{employee_id}", response_model= schemas.Employee)
 def update_employee(employee_id: int, employee: schemas.EmployeeCreate, db: Session = Depends(get_db)):
@@ -71,9 +160,20 @@ def create_boat(boat: schemas.BoatCreate, db: Session = Depends(get_db)):
     return crud.create_boat(db= db, boat= boat)
 
 @app.get("/boats/", response_model= List[schemas.Boat])
-def read_boats(skip: int = 0, limit: int = 100, db: Session =Depends (get_db)):
-    boats = crud.get_boats(db)
-    return boats
+def read_boats(
+    response: Response,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    order_by: Literal["id", "name"] = "id",
+    q: Optional[str] = None,
+    status: Literal["active", "archived", "all"] = "all",
+    db: Session =Depends (get_db),
+    etag: dict = Depends(conditional("boats"))
+):
+    page = list_page_or_400(crud.list_boats, db, skip, limit, after, order_by, q, status)
+    set_page_headers(response, page)
+    return page["items"]
 
 @app.put("/boats/{boat_id}", response_model= schemas.Boat)
 def update_boat(boat_id: int, boat: schemas.BoatCreate, db: Session = Depends(get_db)):
@@ -89,25 +189,73 @@ def delete_boat(boat_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Το σκάφος δεν βρέθηκε")
     return {"message": "Επιτυχής διαγραφή", "name": deleted_boat.name}
 
+# Month end PDFs of every boat with a cost in the range (kind=short for the per employee ones),
+# as a ZIP with one file per boat or format=pdf for one PDF with a bookmark per boat
+@app.get("/boats/analysis/pack")
+async def export_boat_analysis_pack(
+    start: date,
+    end: date,
+    kind: Literal["analysis", "short"] = "analysis",
+    format: Literal["zip", "pdf"] = "zip",
+    db: Session = Depends(get_db),
+    etag: dict = Depends(conditional(*versions.TABLES))
+):
+    # async because the boats render in the process pool (packs.render_all), the rest goes to the threadpool
+    pack_query = crud.get_boat_analysis_pack if kind == "analysis" else crud.get_short_boat_analysis_pack
+    reports = await run_in_threadpool(pack_query, db, start, end)
+    if not reports:
+        raise HTTPException(status_code=404, detail="Δεν βρέθηκαν δεδομένα")
+
+    pdfs = await packs.render_all(kind, reports)
+    filename = f"boats_{kind}_{start}_{end}"
+    if format == "pdf":
+        output = await run_in_threadpool(packs.merge_pack, reports, pdfs)
+        media_type = "application/pdf"
+    else:
+        output = await run_in_threadpool(packs.zip_pack, kind, reports, pdfs, start, end)
+        media_type = "application/zip"
+    return StreamingResponse(
+        pdf_utils.stream_file(output),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{format}", **etag}
+    )
+
 @app.get("/boats/{boat_id}/analysis", response_model = schemas.BoatAnalysisResponse)
-def get_boat_analysis(boat_id: int, start: date, end: date, db: Session = Depends(get_db)):
+def get_boat_analysis(
+    boat_id: int, start: date, end: date, db: Session = Depends(get_db), etag: dict = Depends(conditional(*versions.TABLES))
+):
     report = crud.get_boat_analysis(db, boat_id, start_date=start, end_date=end)
     if not report:
         raise HTTPException(status_code=404, detail= "Το σκάφος δεν βρέθηκε")
-    return report
+    return report_response(report, etag)
 
 @app.get("/boats/{boat_id}/analysis/pdf")
-def export_boat_analysis_pdf(boat_id: int, start: date, end: date, db: Session = Depends(get_db)):
-    report = crud.get_boat_analysis(db, boat_id, start_date=start, end_date=end)
+def export_boat_analysis_pdf(
+    boat_id: int, start: date, end: date, db: Session = Depends(get_db), etag: dict = Depends(conditional(*versions.TABLES))
+):
+    report = crud.stream_boat_analysis(db, boat_id, start_date=start, end_date=end)
     if not report:
         raise HTTPException(status_code=404, detail="Δεν βρέθηκαν δεδομένα")
     
     pdf_buffer = pdf_utils.generate_boat_analysis_pdf(report)
     filename = f"boat_{boat_id}_analysis_{start}_{end}.pdf"
     return StreamingResponse(
-        pdf_buffer, 
+        pdf_utils.stream_file(pdf_buffer), 
         media_type="application/pdf", 
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers={"Content-Disposition": f"attachment; filename={filename}", **etag}
+    )
+
+# One analysis line per row of the ndjson, in date order
+@app.get("/boats/{boat_id}/analysis/export.ndjson")
+async def export_boat_analysis_ndjson(
+    boat_id: int, start: date, end: date,
+    db: AsyncSession = Depends(get_async_db), etag: dict = Depends(conditional(*versions.TABLES))
+):
+    if await db.get(models.Boat, boat_id) is None:
+        raise HTTPException(status_code=404, detail="Το σκάφος δεν βρέθηκε")
+    rows = async_crud.stream_rows(db, crud.boat_analysis_query(boat_id, start, end))
+    return stream_export(
+        exports.boat_analysis_ndjson(rows), "application/x-ndjson", f"boat_{boat_id}_analysis_{start}_{end}.ndjson", etag
     )
 
 # 3. -- Attendance --
@@ -115,10 +263,58 @@ def export_boat_analysis_pdf(boat_id: int, start: date, end: date, db: Session =
 def create_attendance_record(attendance: schemas.AttendanceCreate, db: Session = Depends(get_db)):
     return crud.create_attendance(db=db, attendance=attendance)
 
+# Saves a whole day (or week) in one transaction, returns the saved rows in the same order
+@app.post("/attendance/bulk", response_model=List[schemas.Attendance])
+def create_attendance_bulk(records: List[schemas.AttendanceCreate], db: Session = Depends(get_db)):
+    if any(record.employee_id is None for record in records):
+        raise HTTPException(status_code=422, detail="Κάθε εγγραφή πρέπει να έχει εργαζόμενο")
+    try:
+        return crud.bulk_upsert_attendance(db, records)
+    except crud.DuplicateAttendanceError:
+        raise HTTPException(status_code=400, detail="Ο ίδιος εργαζόμενος υπάρχει δύο φορές για την ίδια ημέρα")
+
+# A whole week or month in one request, one cell per employee and day (declared before /attendance/{target_date})
+@app.get("/attendance/matrix", response_model=schemas.AttendanceMatrix)
+def read_attendance_matrix(
+    start: date, end: date, db: Session = Depends(get_db), etag: dict = Depends(conditional("attendance"))
+):
+    if end < start:
+        raise HTTPException(status_code=422, detail="Μη έγκυρο διάστημα")
+    return report_response(crud.get_attendance_matrix(db, start, end), etag)
+
 @app.get("/attendance/{target_date}", response_model=List[schemas.Attendance])
-def read_attendance_by_date(target_date: date, db: Session = Depends(get_db)):
+def read_attendance_by_date(
+    target_date: date, db: Session = Depends(get_db), etag: dict = Depends(conditional("attendance"))
+):
     return crud.get_attendance_by_date(db, target_date)
 
+# -- Adjustments --
+# Extras (bonus, fuel...) of the payroll, the payroll screen saves them at the end of the period
+@app.get("/adjustments/", response_model=List[schemas.Adjustment])
+def read_adjustments(
+    start: date, end: date, employee_id: Optional[int] = None,
+    db: Session = Depends(get_db), etag: dict = Depends(conditional("attendance"))
+):
+    return crud.list_adjustments(db, start, end, employee_id)
+
+@app.post("/adjustments/", response_model=schemas.Adjustment)
+def create_adjustment(adjustment: schemas.AdjustmentCreate, db: Session = Depends(get_db)):
+    return crud.create_adjustment(db, adjustment)
+
+@app.put("/adjustments/{adjustment_id}", response_model=schemas.Adjustment)
+def update_adjustment(adjustment_id: int, adjustment: schemas.AdjustmentCreate, db: Session = Depends(get_db)):
+    updated_adjustment = crud.update_adjustment(db, adjustment_id, adjustment)
+    if updated_adjustment is None:
+        raise HTTPException(status_code=404, detail="Το πρόσθετο ποσό δεν βρέθηκε")
+    return updated_adjustment
+
+@app.delete("/adjustments/{adjustment_id}")
+def delete_adjustment(adjustment_id: int, db: Session = Depends(get_db)):
+    deleted_adjustment = crud.delete_adjustment(db, adjustment_id)
+    if deleted_adjustment is None:
+        raise HTTPException(status_code=404, detail="Το πρόσθετο ποσό δεν βρέθηκε")
+    return {"message": "Επιτυχής διαγραφή", "amount": deleted_adjustment.amount}
+
 # 4. -- Expenses endpoint --
 @app.get("/expenses/", response_model=schemas.ExpensesResponse)
 def read_expenses(
@@ -126,58 +322,214 @@ def read_expenses(
     end: date, 
     boat_id: Optional[int] = None, 
     emp_id: Optional[int] = None, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    etag: dict = Depends(conditional(*versions.TABLES))
 ):
-    return crud.get_expenses_report(db, start, end, boat_id, emp_id)
+    return report_response(crud.get_expenses_report(db, start, end, boat_id, emp_id), etag)
+
+# Same lines as /expenses/ for spreadsheets, streamed in date order whatever the length of the range
+@app.get("/expenses/export.csv")
+async def export_expenses_csv(
+    start: date,
+    end: date,
+    boat_id: Optional[int] = None,
+    emp_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    etag: dict = Depends(conditional(*versions.TABLES))
+):
+    rows = async_crud.stream_rows(db, crud.expenses_query(start, end, boat_id, emp_id))
+    return stream_export(exports.expenses_csv(rows), "text/csv; charset=utf-8", f"expenses_{start}_{end}.csv", etag)
 
 # 5. -- Payment Endpoint -- 
 @app.get("/payroll/", response_model= schemas.PayrollReport)
-def get_payroll(start: date, end: date, db: Session = Depends(get_db)):
-    return crud.calculate_payroll(db, start, end)
+def get_payroll(
+    request: Request, start: date, end: date,
+    db: Session = Depends(get_db), etag: dict = Depends(conditional(*crud.PAYROLL_TABLES))
+):
+    snapshot = crud.get_snapshot(db, start, end, "report")
+    if snapshot:
+        return snapshot_response(request, snapshot, "application/json")
+    return report_response(crud.calculate_payroll(db, start, end), etag)
+
+@app.get("/payroll/export.csv")
+async def export_payroll_csv(
+    request: Request, start: date, end: date,
+    db: AsyncSession = Depends(get_async_db), etag: dict = Depends(conditional(*crud.PAYROLL_TABLES))
+):
+    filename = f"payroll_{start}_{end}.csv"
+    snapshot = await db.run_sync(crud.get_snapshot, start, end, "report")
+    if snapshot: # The lines of the stored report, one per employee
+        content = "".join(exports.payroll_report_csv(json.loads(snapshot.content))).encode()
+        return snapshot_response(
+            request, snapshot, "text/csv; charset=utf-8", {"Content-Disposition": f"attachment; filename={filename}"}, content
+        )
+    rows = async_crud.stream_rows(db, crud.payroll_query(start, end))
+    return stream_export(exports.payroll_csv(rows), "text/csv; charset=utf-8", filename, etag)
+
+# Several periods (for example every week of a quarter) computed in one pass over the ledger.
+# format=pdf returns one PDF with all periods and a summary page, format=csv one line per period and employee.
+@app.post("/payroll/batch", response_model=schemas.PayrollBatchReport)
+def get_payroll_batch(
+    request: schemas.PayrollBatchRequest,
+    format: Literal["json", "pdf", "csv"] = "json",
+    db: Session = Depends(get_db)
+):
+    try:
+        if request.periods:
+            periods = [(period.start, period.end) for period in request.periods]
+        elif request.start and request.end and request.period:
+            periods = crud.split_periods(request.start, request.end, request.period)
+        else:
+            raise HTTPException(status_code=422, detail="Δώστε περιόδους ή διάστημα με διάρκεια περιόδου")
+        report = crud.calculate_payroll_batch(db, periods)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Μη έγκυρες περίοδοι")
+
+    filename = f"payroll_batch_{report['start_date']}_{report['end_date']}"
+    if format == "pdf":
+        pdf_buffer = pdf_utils.generate_payroll_batch_pdf(report)
+        return StreamingResponse(
+            pdf_utils.stream_file(pdf_buffer),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f"attachment; filename={filename}.pdf"}
+        )
+    if format == "csv":
+        return StreamingResponse(
+            exports.payroll_batch_csv(report),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
+        )
+    return report_response(report)
+
+# Hits / misses of the report cache in front of the four reports above
+@app.get("/reports/cache", response_model=schemas.CacheStats)
+def read_report_cache_stats():
+    return report_cache.stats()
+
+# 6. -- Analytics --
+# Cost per boat / per employee for any range, whole months are read from the monthly rollups.
+# by=month gives one row per month (the first day of the month in "month").
+@app.get("/analytics/boats", response_model=schemas.AnalyticsResponse)
+def read_boat_analytics(
+    start: date,
+    end: date,
+    employee_id: Optional[int] = None,
+    by: Literal["total", "month"] = "total",
+    db: Session = Depends(get_db),
+    etag: dict = Depends(conditional(*versions.TABLES))
+):
+    return report_response(crud.get_boat_analytics(db, start, end, employee_id, by == "month"), etag)
 
-# 6. -- PDF Export --
+@app.get("/analytics/employees", response_model=schemas.AnalyticsResponse)
+def read_employee_analytics(
+    start: date,
+    end: date,
+    boat_id: Optional[int] = None,
+    by: Literal["total", "month"] = "total",
+    db: Session = Depends(get_db),
+    etag: dict = Depends(conditional(*versions.TABLES))
+):
+    return report_response(crud.get_employee_analytics(db, start, end, boat_id, by == "month"), etag)
+
+# 7. -- PDF Export --
 @app.get("/payroll/pdf")
-def export_payroll_pdf(start: date, end: date, db: Session = Depends(get_db)):
-    payroll_data = crud.calculate_payroll(db, start, end)
-    data_dict = {
-        "start_date": payroll_data["start_date"],
-        "end_date": payroll_data["end_date"],
-        "payments": [
-            {
-                "employee_name": p["employee_name"],
-                "days_worked": p["days_worked"],
-                "total_wage": p["total_wage"],
-                "total_overtime_hours": p["total_overtime_hours"],
-                "total_overtime": p["total_overtime"],
-                "total_extra": p["total_extra"],     
-                "extra_reasons": p["extra_reasons"],
-                "grand_total": p["grand_total"],
-                "bank_pay": p["bank_pay"],
-                "cash_pay": p["cash_pay"]
-            } 
-            for p in payroll_data["payments"]
-        ]
-    }
-
-    pdf_buffer = pdf_utils.generate_payroll_pdf(data_dict)
+def export_payroll_pdf(
+    request: Request, start: date, end: date,
+    db: Session = Depends(get_db), etag: dict = Depends(conditional(*crud.PAYROLL_TABLES))
+):
     filename = f"payroll_{start}_{end}.pdf"
+    snapshot = crud.get_snapshot(db, start, end, "pdf")
+    if snapshot:
+        return snapshot_response(request, snapshot, "application/pdf", {"Content-Disposition": f"attachment; filename={filename}"})
+
+    pdf_buffer = pdf_utils.generate_payroll_pdf(crud.stream_payroll(db, start, end))
     return StreamingResponse(
-        pdf_buffer, 
+        pdf_utils.stream_file(pdf_buffer), 
         media_type="application/pdf", 
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers={"Content-Disposition": f"attachment; filename={filename}", **etag}
     )
 
 # -- Short analysis --
 @app.get("/boats/{boat_id}/short-analysis/pdf")
-def export_short_boat_analysis_pdf(boat_id: int, start: date, end: date, db: Session = Depends(get_db)):
-    data = crud.get_short_boat_analysis_data(db, boat_id, start_date=start, end_date=end)
+def export_short_boat_analysis_pdf(
+    boat_id: int, start: date, end: date, db: Session = Depends(get_db), etag: dict = Depends(conditional(*versions.TABLES))
+):
+    data = crud.stream_short_boat_analysis(db, boat_id, start_date=start, end_date=end)
     if not data:
         raise HTTPException(status_code=404, detail="Δεν βρέθηκαν δεδομένα")
     
     pdf_buffer = pdf_utils.generate_short_boat_analysis_pdf(data)
     filename = f"short_analysis_boat_{boat_id}_{start}_{end}.pdf"
     return StreamingResponse(
-        pdf_buffer, 
+        pdf_utils.stream_file(pdf_buffer), 
         media_type="application/pdf", 
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
\ No newline at end of file
+        headers={"Content-Disposition": f"attachment; filename={filename}", **etag}
+    )
+
+# 8. -- Background jobs --
+# POST returns at once with a job id, poll GET /jobs/{id} until status is "done" and then download.
+# An unchanged report that was already rendered is "done" from the start.
+@app.post("/jobs/payroll-pdf", response_model=schemas.JobStatus, status_code=202)
+def queue_payroll_pdf(start: date, end: date, db: Session = Depends(get_db)):
+    job = jobs.submit(db, "payroll-pdf", start=start, end=end)
+    return job.to_dict()
+
+@app.post("/jobs/boat-analysis-pdf", response_model=schemas.JobStatus, status_code=202)
+def queue_boat_analysis_pdf(boat_id: int, start: date, end: date, db: Session = Depends(get_db)):
+    if db.get(models.Boat, boat_id) is None:
+        raise HTTPException(status_code=404, detail="Το σκάφος δεν βρέθηκε")
+    job = jobs.submit(db, "boat-analysis-pdf", boat_id=boat_id, start=start, end=end)
+    return job.to_dict()
+
+@app.post("/jobs/short-analysis-pdf", response_model=schemas.JobStatus, status_code=202)
+def queue_short_analysis_pdf(boat_id: int, start: date, end: date, db: Session = Depends(get_db)):
+    if db.get(models.Boat, boat_id) is None:
+        raise HTTPException(status_code=404, detail="Το σκάφος δεν βρέθηκε")
+    job = jobs.submit(db, "short-analysis-pdf", boat_id=boat_id, start=start, end=end)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+def read_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Η εργασία δεν βρέθηκε")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/download")
+def download_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Η εργασία δεν βρέθηκε")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="Το αρχείο δεν είναι ακόμα έτοιμο")
+    if not os.path.exists(job.path): # Removed by the size limit of the artifact folder
+        raise HTTPException(status_code=410, detail="Το αρχείο δεν είναι πλέον διαθέσιμο")
+    return FileResponse(job.path, media_type="application/pdf", filename=job.filename)
+
+# 9. -- Payroll period close --
+# A closed period keeps the payroll it had when it was closed: /payroll/, /payroll/pdf, /payroll/export.csv,
+# /jobs/payroll-pdf and the periods of /payroll/batch of exactly start..end return the stored report and PDF,
+# attendance and adjustments inside it get 409.
+# DELETE reopens the period.
+@app.post("/payroll/periods", response_model=schemas.ClosedPeriod, status_code=201)
+def close_payroll_period(start: date, end: date, db: Session = Depends(get_db)):
+    if start > end:
+        raise HTTPException(status_code=422, detail="Μη έγκυρη περίοδος")
+    seen_versions = crud.payroll_versions(db)
+    report = crud.calculate_payroll(db, start, end)
+    pdf = pdf_utils.render_bytes(pdf_utils.generate_payroll_pdf, report)
+    try:
+        return crud.close_payroll_period(db, start, end, report, render_report(report), pdf, seen_versions)
+    except crud.PeriodChangedError:
+        raise HTTPException(status_code=409, detail="Τα δεδομένα άλλαξαν κατά το κλείσιμο, δοκιμάστε ξανά")
+
+@app.get("/payroll/periods", response_model=List[schemas.ClosedPeriod])
+def read_closed_periods(db: Session = Depends(get_db)):
+    return crud.list_closed_periods(db)
+
+@app.delete("/payroll/periods/{period_id}", response_model=schemas.ClosedPeriod)
+def reopen_payroll_period(period_id: int, db: Session = Depends(get_db)):
+    period = crud.reopen_payroll_period(db, period_id)
+    if period is None:
+        raise HTTPException(status_code=404, detail="Η περίοδος δεν βρέθηκε")
+    return period
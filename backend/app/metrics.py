@@ -0,0 +1,256 @@
+import bisect
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from sqlalchemy import event
+
+# -- Request metrics --
+# MetricsMiddleware times every request and the cursor hooks of the engines add, to the request
+# being served, its SQL statements, their time and their rows. pdf_utils adds the ReportLab time.
+# So a slow /payroll/pdf splits into sql, render and other (Python work, JSON, streaming).
+# GET /metrics returns the sums per route in the Prometheus text format.
+#
+# Rows are the ones writes changed (the cursor rowcount) or the ones read from SELECTs. sqlite3 has
+# no row count for a SELECT, so the sync engine counts them as they are fetched (CountingCursor),
+# and the async engine counts the rows aiosqlite buffered when the statement ran (the server side
+# cursor of a streamed export reads them later and counts 0).
+#
+# Configuration (environment variables):
+# PAYROLL_SLOW_QUERY_MS   statements slower than this are logged with their query plan
+#                         (logger "payroll.slow_query", off when unset or 0)
+
+SLOW_QUERY_MS = float(os.getenv("PAYROLL_SLOW_QUERY_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+slow_query_log = logging.getLogger("payroll.slow_query")
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    sql_seconds: float = 0.0
+    rows: int = 0
+    render_seconds: float = 0.0
+
+# The stats of the request being served, None outside requests (benchmark, migrations, workers)
+_current = contextvars.ContextVar("payroll_request_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class RouteMetrics:
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.render_seconds = 0.0
+        self.other_seconds = 0.0
+
+_lock = threading.Lock()
+_routes = {} # (method, route path) -> RouteMetrics
+
+def _record(method, route, status, seconds, stats):
+    with _lock:
+        metrics = _routes.get((method, route))
+        if metrics is None:
+            metrics = _routes[(method, route)] = RouteMetrics()
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.latency.observe(seconds)
+        metrics.statements.observe(stats.statements)
+        metrics.sql_seconds += stats.sql_seconds
+        metrics.rows += stats.rows
+        metrics.render_seconds += stats.render_seconds
+        metrics.other_seconds += max(seconds - stats.sql_seconds - stats.render_seconds, 0.0)
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+# -- Middleware --
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streamed bodies (exports, PDFs) are inside the measured time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = scope.get("route") # Set by the router, its path keeps {boat_id} instead of the value
+            _record(scope["method"], route.path if route else "unmatched", status, time.perf_counter() - started, stats)
+
+# -- SQL --
+
+def record_sql(seconds, cursor, connection=None, statement=None, parameters=None):
+    """Adds one statement to the current request, logs it when slow. connection is needed for the plan."""
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += seconds
+        # rowcount is -1 for a SELECT, its rows are counted by CountingCursor or buffered by aiosqlite
+        stats.rows += cursor.rowcount if cursor.rowcount >= 0 else len(getattr(cursor, "_rows", ()))
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS and statement:
+        slow_query_log.warning(
+            "%.1f ms: %s\nparameters: %r\nplan:\n%s",
+            seconds * 1000, statement.strip(), parameters, query_plan(connection, statement, parameters),
+        )
+
+def query_plan(connection, statement, parameters):
+    if connection is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return "  (only for SELECT)"
+    try:
+        # A plain DBAPI cursor, so the EXPLAIN does not go through the hooks again
+        cursor = connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+            return "\n".join(f"  {row[3]}" for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as error:
+        return f"  (no plan: {error})"
+
+def _count_rows(rows):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += rows
+
+class CountingCursor(sqlite3.Cursor):
+    """Adds the rows the SELECTs return to the current request, when they are fetched."""
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _count_rows(len(rows))
+        return rows
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are CountingCursors, pass it as the factory connect argument."""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+def instrument(engine):
+    """Cursor hooks on a sync engine (for an async engine pass engine.sync_engine)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["metrics_started"].pop()
+        record_sql(seconds, cursor, conn.connection, statement, None if executemany else parameters)
+
+# -- PDF rendering --
+
+@contextmanager
+def timed_render():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.render_seconds += time.perf_counter() - started
+
+# -- Prometheus text format --
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _histogram(lines, name, histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {cumulative}")
+
+COUNTERS = [
+    ("payroll_http_request_sql_seconds_total", "sql_seconds", "Time spent in SQL statements."),
+    ("payroll_http_request_sql_rows_total", "rows", "Rows returned by SELECTs or changed by writes."),
+    ("payroll_http_request_render_seconds_total", "render_seconds", "Time spent laying out PDFs (ReportLab)."),
+    ("payroll_http_request_other_seconds_total", "other_seconds",
+     "Time outside SQL and PDF layout (Python work, serialization, streaming)."),
+]
+
+def render(cache_stats=None):
+    with _lock:
+        routes = sorted(_routes.items())
+        lines = [
+            "# HELP payroll_http_requests_total Requests by route, method and status.",
+            "# TYPE payroll_http_requests_total counter",
+        ]
+        for (method, route), metrics in routes:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f"payroll_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP payroll_http_request_duration_seconds Request latency, until the last byte of the body.",
+            "# TYPE payroll_http_request_duration_seconds histogram",
+        ]
+        for (method, route), metrics in routes:
+            _histogram(lines, "payroll_http_request_duration_seconds", metrics.latency, method=method, route=route)
+
+        lines += [
+            "# HELP payroll_http_request_sql_statements SQL statements per request.",
+            "# TYPE payroll_http_request_sql_statements histogram",
+        ]
+        for (method, route), metrics in routes:
+            _histogram(lines, "payroll_http_request_sql_statements", metrics.statements, method=method, route=route)
+
+        for name, attribute, description in COUNTERS:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            for (method, route), metrics in routes:
+                lines.append(f"{name}{_labels(method=method, route=route)} {getattr(metrics, attribute)}")
+
+    if cache_stats is not None:
+        for key in ("hits", "misses", "evictions"):
+            lines += [f"# TYPE payroll_report_cache_{key}_total counter", f"payroll_report_cache_{key}_total {cache_stats[key]}"]
+        for key in ("entries", "bytes"):
+            lines += [f"# TYPE payroll_report_cache_{key} gauge", f"payroll_report_cache_{key} {cache_stats[key]}"]
+    return "\n".join(lines) + "\n"
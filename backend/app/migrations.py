@@ -0,0 +1,393 @@
+import sqlite3
+from datetime import datetime
+from .database import engine as default_engine
+
+# -- Schema migrations --
+# Every change to the database goes here as a new numbered step.
+# Never edit a step that has already shipped, append a new one instead.
+# Steps are written so they also succeed on databases that were upgraded by hand
+# with the old upgrade_db scripts (IF NOT EXISTS / column checks).
+
+class MigrationError(Exception):
+    pass
+
+def _column_exists(cursor, table, column):
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_info({table})"))
+
+def _initial_schema(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER NOT NULL,
+            name VARCHAR,
+            daily_wage FLOAT,
+            overtime_rate FLOAT,
+            bank_daily_amount FLOAT,
+            PRIMARY KEY (id)
+        )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_employees_name ON employees (name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_employees_id ON employees (id)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS boats (
+            id INTEGER NOT NULL,
+            name VARCHAR,
+            PRIMARY KEY (id)
+        )""")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_boats_name ON boats (name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_boats_id ON boats (id)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER NOT NULL,
+            date DATE,
+            employee_id INTEGER,
+            boat_id INTEGER,
+            present BOOLEAN,
+            overtime_hours FLOAT,
+            extra_amount FLOAT,
+            extra_reason VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(employee_id) REFERENCES employees (id),
+            FOREIGN KEY(boat_id) REFERENCES boats (id)
+        )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_date ON attendance (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_id ON attendance (id)")
+
+def _add_half_day(cursor):
+    if not _column_exists(cursor, "attendance", "is_half_day"):
+        cursor.execute("ALTER TABLE attendance ADD COLUMN is_half_day BOOLEAN DEFAULT 0")
+
+def _add_overtime_boat(cursor):
+    if not _column_exists(cursor, "attendance", "overtime_boat_id"):
+        cursor.execute("ALTER TABLE attendance ADD COLUMN overtime_boat_id INTEGER REFERENCES boats(id)")
+
+def _attendance_indexes(cursor):
+    duplicates = cursor.execute(
+        "SELECT employee_id, date, COUNT(*) FROM attendance "
+        "WHERE employee_id IS NOT NULL GROUP BY employee_id, date HAVING COUNT(*) > 1"
+    ).fetchall()
+    if duplicates:
+        raise MigrationError(f"Duplicate attendance rows (employee_id, date, count) must be merged first: {duplicates}")
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_attendance_employee_date ON attendance (employee_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_boat_date ON attendance (boat_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_overtime_boat_date ON attendance (overtime_boat_id, date)")
+
+# The ledger as it was when step 5 shipped, extras still on the attendance rows.
+# Frozen here: ledger.py follows the current schema, which step 9 builds.
+def _daily_cost_ledger(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_cost_ledger (
+            id INTEGER NOT NULL,
+            attendance_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            employee_id INTEGER NOT NULL,
+            boat_id INTEGER,
+            kind VARCHAR NOT NULL,
+            days FLOAT NOT NULL DEFAULT 0,
+            hours FLOAT NOT NULL DEFAULT 0,
+            amount FLOAT NOT NULL DEFAULT 0,
+            worked BOOLEAN NOT NULL DEFAULT 0,
+            reason VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(attendance_id) REFERENCES attendance (id),
+            FOREIGN KEY(employee_id) REFERENCES employees (id),
+            FOREIGN KEY(boat_id) REFERENCES boats (id)
+        )""")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_ledger_attendance_kind ON daily_cost_ledger (attendance_id, kind)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_ledger_date ON daily_cost_ledger (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_ledger_employee_date ON daily_cost_ledger (employee_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_ledger_boat_date ON daily_cost_ledger (boat_id, date)")
+
+    cursor.execute("DELETE FROM daily_cost_ledger")
+    cursor.execute("""
+        WITH src AS (
+            SELECT a.id, a.date, a.employee_id, a.boat_id, a.overtime_boat_id,
+                   a.overtime_hours, a.extra_amount, a.extra_reason,
+                   COALESCE(e.daily_wage, 0.0) AS daily_wage,
+                   COALESCE(e.overtime_rate, 0.0) AS overtime_rate,
+                   CASE WHEN a.is_half_day THEN 0.5 WHEN a.present THEN 1.0 ELSE 0.0 END AS multiplier
+            FROM attendance a JOIN employees e ON e.id = a.employee_id
+        )
+        INSERT INTO daily_cost_ledger (attendance_id, date, employee_id, boat_id, kind, days, hours, amount, worked, reason)
+        SELECT id, date, employee_id, boat_id, 'wage', multiplier, 0.0, daily_wage * multiplier, 1, NULL
+            FROM src WHERE multiplier > 0
+        UNION ALL
+        SELECT id, date, employee_id, overtime_boat_id, 'overtime', 0.0, overtime_hours, overtime_hours * overtime_rate, multiplier > 0, NULL
+            FROM src WHERE overtime_hours != 0
+        UNION ALL
+        SELECT id, date, employee_id, boat_id, 'extra', 0.0, 0.0, extra_amount, multiplier > 0, extra_reason
+            FROM src WHERE extra_amount != 0""")
+
+def _active_flags(cursor):
+    for table in ("employees", "boats"):
+        if not _column_exists(cursor, table, "active"):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN active BOOLEAN NOT NULL DEFAULT 1")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_employees_active_name ON employees (active, name)")
+
+# The SQL of steps 7 to 9 is frozen like step 5's: versions.py and rollups.py follow the current schema.
+
+def _data_versions(cursor):
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS data_versions (table_name VARCHAR PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+    )
+    for table in ("employees", "boats", "attendance"):
+        cursor.execute("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+
+# Sums every month again from the ledger, run by steps 8 and 9
+_ROLLUPS_REBUILD = [
+    "DELETE FROM rollup_boat_employee_month",
+    "DELETE FROM rollup_employee_month",
+    "DELETE FROM rollup_boat_month",
+    """
+        INSERT INTO rollup_boat_employee_month (month, boat_id, employee_id, days, overtime_hours, wage, overtime, extra)
+        SELECT date(l.date, 'start of month'), l.boat_id, l.employee_id,
+            SUM(CASE WHEN l.kind = 'wage' THEN l.days ELSE 0.0 END),
+            SUM(CASE WHEN l.kind = 'overtime' THEN l.hours ELSE 0.0 END),
+            SUM(CASE WHEN l.kind = 'wage' THEN l.amount ELSE 0.0 END),
+            SUM(CASE WHEN l.kind = 'overtime' THEN l.amount ELSE 0.0 END),
+            SUM(CASE WHEN l.kind = 'extra' THEN l.amount ELSE 0.0 END)
+        FROM daily_cost_ledger l
+        GROUP BY date(l.date, 'start of month'), l.boat_id, l.employee_id""",
+    """
+        INSERT INTO rollup_employee_month (month, employee_id, days, overtime_hours, wage, overtime, extra)
+        SELECT month, employee_id, SUM(days), SUM(overtime_hours), SUM(wage), SUM(overtime), SUM(extra)
+        FROM rollup_boat_employee_month GROUP BY employee_id, month""",
+    """
+        INSERT INTO rollup_boat_month (month, boat_id, days, overtime_hours, wage, overtime, extra)
+        SELECT month, boat_id, SUM(days), SUM(overtime_hours), SUM(wage), SUM(overtime), SUM(extra)
+        FROM rollup_boat_employee_month WHERE boat_id IS NOT NULL GROUP BY boat_id, month""",
+]
+
+def _monthly_rollups(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_boat_employee_month (
+            id INTEGER NOT NULL,
+            month DATE NOT NULL,
+            boat_id INTEGER,
+            employee_id INTEGER NOT NULL,
+            days FLOAT NOT NULL DEFAULT 0,
+            overtime_hours FLOAT NOT NULL DEFAULT 0,
+            wage FLOAT NOT NULL DEFAULT 0,
+            overtime FLOAT NOT NULL DEFAULT 0,
+            extra FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (id),
+            FOREIGN KEY(boat_id) REFERENCES boats (id),
+            FOREIGN KEY(employee_id) REFERENCES employees (id)
+        )""")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_employee_month (
+            month DATE NOT NULL,
+            employee_id INTEGER NOT NULL,
+            days FLOAT NOT NULL DEFAULT 0,
+            overtime_hours FLOAT NOT NULL DEFAULT 0,
+            wage FLOAT NOT NULL DEFAULT 0,
+            overtime FLOAT NOT NULL DEFAULT 0,
+            extra FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_id, month),
+            FOREIGN KEY(employee_id) REFERENCES employees (id)
+        )""")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_boat_month (
+            month DATE NOT NULL,
+            boat_id INTEGER NOT NULL,
+            days FLOAT NOT NULL DEFAULT 0,
+            overtime_hours FLOAT NOT NULL DEFAULT 0,
+            wage FLOAT NOT NULL DEFAULT 0,
+            overtime FLOAT NOT NULL DEFAULT 0,
+            extra FLOAT NOT NULL DEFAULT 0,
+            PRIMARY KEY (boat_id, month),
+            FOREIGN KEY(boat_id) REFERENCES boats (id)
+        )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_rollup_bem_employee_month ON rollup_boat_employee_month (employee_id, month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_rollup_bem_boat_month ON rollup_boat_employee_month (boat_id, month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_rollup_bem_month ON rollup_boat_employee_month (month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_rollup_boat_month_month ON rollup_boat_month (month)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_rollup_employee_month_month ON rollup_employee_month (month)")
+    for statement in _ROLLUPS_REBUILD:
+        cursor.execute(statement)
+
+# Extras move from fake attendance rows (dated at the end of the payroll period) to their own table.
+# Rows that only carried an extra are deleted, the rest keep their day. The ledger is derived data,
+# it is made again with the adjustment_id column and the rollups summed again from it.
+def _payroll_adjustments(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS adjustments (
+            id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            boat_id INTEGER,
+            amount FLOAT NOT NULL DEFAULT 0,
+            reason VARCHAR NOT NULL DEFAULT '',
+            PRIMARY KEY (id),
+            FOREIGN KEY(employee_id) REFERENCES employees (id),
+            FOREIGN KEY(boat_id) REFERENCES boats (id)
+        )""")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_adjustments_employee_date ON adjustments (employee_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_adjustments_date ON adjustments (date)")
+
+    if _column_exists(cursor, "attendance", "extra_amount"):
+        cursor.execute("""
+            INSERT INTO adjustments (employee_id, date, boat_id, amount, reason)
+            SELECT employee_id, date, boat_id, extra_amount, COALESCE(extra_reason, '') FROM attendance
+            WHERE COALESCE(extra_amount, 0) != 0 AND employee_id IS NOT NULL AND date IS NOT NULL
+            ORDER BY date, id""")
+        cursor.execute("""
+            DELETE FROM attendance
+            WHERE COALESCE(extra_amount, 0) != 0 AND NOT COALESCE(present, 0) AND NOT COALESCE(is_half_day, 0)
+              AND COALESCE(overtime_hours, 0) = 0""")
+        cursor.execute("ALTER TABLE attendance DROP COLUMN extra_amount")
+        cursor.execute("ALTER TABLE attendance DROP COLUMN extra_reason")
+
+    cursor.execute("DROP TABLE IF EXISTS daily_cost_ledger")
+    cursor.execute("""
+        CREATE TABLE daily_cost_ledger (
+            id INTEGER NOT NULL,
+            attendance_id INTEGER,
+            adjustment_id INTEGER,
+            date DATE NOT NULL,
+            employee_id INTEGER NOT NULL,
+            boat_id INTEGER,
+            kind VARCHAR NOT NULL,
+            days FLOAT NOT NULL DEFAULT 0,
+            hours FLOAT NOT NULL DEFAULT 0,
+            amount FLOAT NOT NULL DEFAULT 0,
+            worked BOOLEAN NOT NULL DEFAULT 0,
+            reason VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(attendance_id) REFERENCES attendance (id),
+            FOREIGN KEY(adjustment_id) REFERENCES adjustments (id),
+            FOREIGN KEY(employee_id) REFERENCES employees (id),
+            FOREIGN KEY(boat_id) REFERENCES boats (id)
+        )""")
+    cursor.execute("CREATE UNIQUE INDEX ix_ledger_attendance_kind ON daily_cost_ledger (attendance_id, kind)")
+    cursor.execute("CREATE UNIQUE INDEX ix_ledger_adjustment ON daily_cost_ledger (adjustment_id)")
+    cursor.execute("CREATE INDEX ix_ledger_date ON daily_cost_ledger (date)")
+    cursor.execute("CREATE INDEX ix_ledger_employee_date ON daily_cost_ledger (employee_id, date)")
+    cursor.execute("CREATE INDEX ix_ledger_boat_date ON daily_cost_ledger (boat_id, date)")
+
+    cursor.execute("""
+        WITH src AS (
+            SELECT a.id, a.date, a.employee_id, a.boat_id, a.overtime_boat_id, a.overtime_hours,
+                   COALESCE(e.daily_wage, 0.0) AS daily_wage,
+                   COALESCE(e.overtime_rate, 0.0) AS overtime_rate,
+                   CASE WHEN a.is_half_day THEN 0.5 WHEN a.present THEN 1.0 ELSE 0.0 END AS multiplier
+            FROM attendance a JOIN employees e ON e.id = a.employee_id
+        )
+        INSERT INTO daily_cost_ledger (attendance_id, date, employee_id, boat_id, kind, days, hours, amount, worked, reason)
+        SELECT id, date, employee_id, boat_id, 'wage', multiplier, 0.0, daily_wage * multiplier, 1, NULL
+            FROM src WHERE multiplier > 0
+        UNION ALL
+        SELECT id, date, employee_id, overtime_boat_id, 'overtime', 0.0, overtime_hours, overtime_hours * overtime_rate, multiplier > 0, NULL
+            FROM src WHERE overtime_hours != 0""")
+    cursor.execute("""
+        INSERT INTO daily_cost_ledger (adjustment_id, date, employee_id, boat_id, kind, days, hours, amount, worked, reason)
+        SELECT id, date, employee_id, boat_id, 'extra', 0.0, 0.0, amount, 0, reason
+        FROM adjustments WHERE amount != 0""")
+    for statement in _ROLLUPS_REBUILD:
+        cursor.execute(statement)
+
+def _closed_periods(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS closed_periods (
+            id INTEGER NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            closed_at DATETIME NOT NULL,
+            employees INTEGER NOT NULL,
+            grand_total FLOAT NOT NULL,
+            content_hash VARCHAR NOT NULL,
+            report BLOB NOT NULL,
+            pdf BLOB NOT NULL,
+            PRIMARY KEY (id)
+        )""")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_closed_periods_range ON closed_periods (start_date, end_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_closed_periods_end ON closed_periods (end_date)")
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "attendance half day", _add_half_day),
+    (3, "attendance overtime boat", _add_overtime_boat),
+    (4, "attendance composite indexes", _attendance_indexes),
+    (5, "daily cost ledger", _daily_cost_ledger),
+    (6, "employee and boat active flag", _active_flags),
+    (7, "data versions", _data_versions),
+    (8, "monthly rollups", _monthly_rollups),
+    (9, "payroll adjustments", _payroll_adjustments),
+    (10, "closed payroll periods", _closed_periods),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# -- Runner --
+
+def current_version(cursor):
+    row = cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if row is None:
+        return 0
+    return cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+# ALTER TABLE ... DROP COLUMN (step 9) and RETURNING (the attendance upsert, the version bumps)
+MIN_SQLITE_VERSION = (3, 35, 0)
+# How long a worker waits for the write lock while another one applies a step
+LOCK_TIMEOUT_MS = 600_000
+
+def check_sqlite():
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise MigrationError(
+            f"SQLite {sqlite3.sqlite_version} is too old, {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer is needed"
+        )
+
+def upgrade(engine=default_engine, target=LATEST_VERSION):
+    """Applies pending migrations up to target, each one in its own transaction. Returns the final version."""
+    check_sqlite()
+    raw = engine.raw_connection()
+    conn = raw.driver_connection
+    isolation_level = conn.isolation_level
+    # sqlite3 only opens transactions for DML, so we issue BEGIN / COMMIT ourselves to make DDL atomic
+    conn.isolation_level = None
+    try:
+        cursor = conn.cursor()
+        version = current_version(cursor)
+        if version >= target:
+            return version
+
+        # Several workers can start on the same base at once (uvicorn --workers). Each step takes the
+        # write lock first (BEGIN IMMEDIATE) and reads the version again, so a step another worker
+        # applied in the meantime is skipped instead of being applied twice.
+        busy_timeout = cursor.execute("PRAGMA busy_timeout").fetchone()[0]
+        cursor.execute(f"PRAGMA busy_timeout = {LOCK_TIMEOUT_MS}")
+        try:
+            for number, description, apply in MIGRATIONS:
+                if number <= version or number > target:
+                    continue
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor.execute(
+                        "CREATE TABLE IF NOT EXISTS schema_version ("
+                        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at VARCHAR)"
+                    )
+                    version = current_version(cursor)
+                    if number > version:
+                        apply(cursor)
+                        cursor.execute(
+                            "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                            (number, description, datetime.now().isoformat(timespec="seconds")),
+                        )
+                        version = number
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+        finally:
+            cursor.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+        return version
+    finally:
+        conn.isolation_level = isolation_level
+        raw.close()
+
+if __name__ == "__main__":
+    # Run from the backend folder: python -m app.migrations
+    print(f"Database is at version {upgrade()} (latest {LATEST_VERSION})")
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Date
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Date, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,9 +12,14 @@ class Employee(Base):
     daily_wage = Column(Float)
     overtime_rate = Column(Float)
     bank_daily_amount = Column(Float)
+    active = Column(Boolean, nullable = False, default = True) # Archived employees keep their history
 
     attendance_records = relationship("Attendance", back_populates="employee")
 
+    __table_args__ = (
+        Index("ix_employees_active_name", "active", "name"),
+    )
+
 # -- Board No.2 Boats --
 
 class Boat(Base):
@@ -22,6 +27,7 @@ class Boat(Base):
 
     id = Column(Integer, primary_key = True, index = True)
     name = Column(String, unique=True, index=True)
+    active = Column(Boolean, nullable = False, default = True)
 
     attendance_records = relationship(
         "Attendance", 
@@ -45,9 +51,142 @@ class Attendance(Base):
     is_half_day = Column(Boolean, default=False)
     overtime_hours = Column(Float, default = 0.0)
 
-    extra_amount = Column(Float, default = 0.0)
-    extra_reason = Column(String, nullable = True)
+    # Reports select the columns they need, so touching these per row would be one SELECT per row.
+    # lazy="raise" turns that into an error, load them with joinedload / selectinload where needed.
+    employee = relationship("Employee", back_populates = "attendance_records", lazy = "raise")
+    boat = relationship("Boat", foreign_keys=[boat_id], back_populates = "attendance_records", lazy = "raise")
+    overtime_boat = relationship("Boat", foreign_keys=[overtime_boat_id], lazy = "raise")
+
+    # Every report filters one of these columns together with a date range
+    __table_args__ = (
+        Index("ix_attendance_employee_date", "employee_id", "date", unique=True),
+        Index("ix_attendance_boat_date", "boat_id", "date"),
+        Index("ix_attendance_overtime_boat_date", "overtime_boat_id", "date"),
+    )
+
+# -- Board No.4 Daily cost ledger (maintained by app/ledger.py, never written directly) --
+
+class DailyCostLedger(Base):
+    __tablename__ = "daily_cost_ledger"
+
+    id = Column(Integer, primary_key = True)
+    attendance_id = Column(Integer, ForeignKey("attendance.id"), nullable = True) # wage / overtime rows
+    adjustment_id = Column(Integer, ForeignKey("adjustments.id"), nullable = True) # extra rows
+    date = Column(Date, nullable = False)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable = False)
+    boat_id = Column(Integer, ForeignKey("boats.id"), nullable = True)
+
+    kind = Column(String, nullable = False) # wage / overtime / extra
+    days = Column(Float, nullable = False, default = 0.0)
+    hours = Column(Float, nullable = False, default = 0.0)
+    amount = Column(Float, nullable = False, default = 0.0)
+    worked = Column(Boolean, nullable = False, default = False)
+    reason = Column(String, nullable = True)
+
+    __table_args__ = (
+        Index("ix_ledger_attendance_kind", "attendance_id", "kind", unique=True),
+        Index("ix_ledger_adjustment", "adjustment_id", unique=True),
+        Index("ix_ledger_date", "date"),
+        Index("ix_ledger_employee_date", "employee_id", "date"),
+        Index("ix_ledger_boat_date", "boat_id", "date"),
+    )
+
+# -- Board No.5 Data versions (bumped by crud, see app/versions.py) --
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    table_name = Column(String, primary_key = True)
+    version = Column(Integer, nullable = False, default = 0)
+
+# -- Board No.6 Monthly rollups (maintained by app/rollups.py, never written directly) --
+
+class RollupBoatEmployeeMonth(Base):
+    __tablename__ = "rollup_boat_employee_month"
+
+    id = Column(Integer, primary_key = True)
+    month = Column(Date, nullable = False) # First day of the month
+    boat_id = Column(Integer, ForeignKey("boats.id"), nullable = True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable = False)
+    days = Column(Float, nullable = False, default = 0.0)
+    overtime_hours = Column(Float, nullable = False, default = 0.0)
+    wage = Column(Float, nullable = False, default = 0.0)
+    overtime = Column(Float, nullable = False, default = 0.0)
+    extra = Column(Float, nullable = False, default = 0.0)
+
+    __table_args__ = (
+        Index("ix_rollup_bem_employee_month", "employee_id", "month"),
+        Index("ix_rollup_bem_boat_month", "boat_id", "month"),
+        Index("ix_rollup_bem_month", "month"),
+    )
 
-    employee = relationship("Employee", back_populates = "attendance_records")
-    boat = relationship("Boat", foreign_keys=[boat_id], back_populates = "attendance_records")
-    overtime_boat = relationship("Boat", foreign_keys=[overtime_boat_id])
+class RollupEmployeeMonth(Base):
+    __tablename__ = "rollup_employee_month"
+
+    month = Column(Date, primary_key = True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key = True)
+    days = Column(Float, nullable = False, default = 0.0)
+    overtime_hours = Column(Float, nullable = False, default = 0.0)
+    wage = Column(Float, nullable = False, default = 0.0)
+    overtime = Column(Float, nullable = False, default = 0.0)
+    extra = Column(Float, nullable = False, default = 0.0)
+
+    __table_args__ = (
+        Index("ix_rollup_employee_month_month", "month"),
+    )
+
+class RollupBoatMonth(Base):
+    __tablename__ = "rollup_boat_month"
+
+    month = Column(Date, primary_key = True)
+    boat_id = Column(Integer, ForeignKey("boats.id"), primary_key = True)
+    days = Column(Float, nullable = False, default = 0.0)
+    overtime_hours = Column(Float, nullable = False, default = 0.0)
+    wage = Column(Float, nullable = False, default = 0.0)
+    overtime = Column(Float, nullable = False, default = 0.0)
+    extra = Column(Float, nullable = False, default = 0.0)
+
+    __table_args__ = (
+        Index("ix_rollup_boat_month_month", "month"),
+    )
+
+# -- Board No.7 Payroll adjustments --
+# Extras paid to an employee (bonus, fuel...) on top of the days at work, one row each
+
+class Adjustment(Base):
+    __tablename__ = "adjustments"
+
+    id = Column(Integer, primary_key = True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable = False)
+    date = Column(Date, nullable = False)
+    boat_id = Column(Integer, ForeignKey("boats.id"), nullable = True) # Charged to a boat in its reports
+    amount = Column(Float, nullable = False, default = 0.0)
+    reason = Column(String, nullable = False, default = "")
+
+    __table_args__ = (
+        Index("ix_adjustments_employee_date", "employee_id", "date"),
+        Index("ix_adjustments_date", "date"),
+    )
+
+# -- Board No.8 Closed payroll periods --
+# The payroll of a closed period as it was when it was closed: the JSON of the report, its PDF and the
+# sha256 of the JSON. Later edits of the employees do not change it and attendance / adjustments
+# can no longer be written inside the period (crud.check_open).
+
+class ClosedPeriod(Base):
+    __tablename__ = "closed_periods"
+
+    id = Column(Integer, primary_key = True)
+    start_date = Column(Date, nullable = False)
+    end_date = Column(Date, nullable = False)
+    closed_at = Column(DateTime, nullable = False)
+    employees = Column(Integer, nullable = False)
+    grand_total = Column(Float, nullable = False)
+    content_hash = Column(String, nullable = False)
+    report = Column(LargeBinary, nullable = False) # The /payroll/ response body
+    pdf = Column(LargeBinary, nullable = False)
+
+    __table_args__ = (
+        Index("ix_closed_periods_range", "start_date", "end_date", unique=True),
+        Index("ix_closed_periods_end", "end_date"),
+    )
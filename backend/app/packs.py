@@ -0,0 +1,83 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from tempfile import SpooledTemporaryFile
+from pypdf import PdfReader, PdfWriter
+from . import jobs, metrics, pdf_utils
+
+# -- Boat PDF packs --
+# The month end PDFs of every boat in one download, a ZIP with one file per boat or one merged PDF
+# with a bookmark per boat. The data of all boats comes from one query (crud.get_*_pack), then each
+# boat is rendered in a worker process, so the time follows the number of cores and not of boats.
+#
+# Configuration (environment variables):
+# PAYROLL_PACK_WORKERS   processes rendering the boats, default the number of CPUs
+
+PACK_WORKERS = int(os.getenv("PAYROLL_PACK_WORKERS", str(os.cpu_count() or 1)))
+
+KINDS = {
+    "analysis": {
+        "render": pdf_utils.generate_boat_analysis_pdf,
+        "filename": "boat_{boat_id}_analysis_{start}_{end}.pdf",
+    },
+    "short": {
+        "render": pdf_utils.generate_short_boat_analysis_pdf,
+        "filename": "short_analysis_boat_{boat_id}_{start}_{end}.pdf",
+    },
+}
+
+# -- Worker side --
+
+def render_boat(kind, report):
+    with KINDS[kind]["render"](report) as output:
+        return output.read()
+
+# -- Pool --
+
+_lock = threading.Lock()
+_pool = None
+
+def _get_pool(renew=False):
+    global _pool
+    with _lock:
+        if _pool is None or renew:
+            # spawn like the jobs pool, the same initializer loads the fonts once per process
+            _pool = ProcessPoolExecutor(
+                max_workers=PACK_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=jobs._init_worker
+            )
+        return _pool
+
+async def render_all(kind, reports):
+    """The PDF bytes of every report, in the order of reports."""
+    loop = asyncio.get_running_loop()
+    with metrics.timed_render(): # Wall time of the whole pool, the workers have no request to add to
+        try:
+            pool = _get_pool()
+            return await asyncio.gather(*(loop.run_in_executor(pool, render_boat, kind, report) for report in reports))
+        except BrokenProcessPool: # A worker died (killed, out of memory), start a fresh pool and try once more
+            pool = _get_pool(renew=True)
+            return await asyncio.gather(*(loop.run_in_executor(pool, render_boat, kind, report) for report in reports))
+
+# -- Packing (file objects for pdf_utils.stream_file) --
+
+def zip_pack(kind, reports, pdfs, start, end):
+    output = SpooledTemporaryFile(max_size=pdf_utils.SPOOL_MAX_MEMORY)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for report, pdf in zip(reports, pdfs):
+            archive.writestr(KINDS[kind]["filename"].format(boat_id=report["boat_id"], start=start, end=end), pdf)
+    output.seek(0)
+    return output
+
+def merge_pack(reports, pdfs):
+    writer = PdfWriter()
+    for report, pdf in zip(reports, pdfs):
+        writer.append(PdfReader(io.BytesIO(pdf)), outline_item=report["boat_name"])
+    output = SpooledTemporaryFile(max_size=pdf_utils.SPOOL_MAX_MEMORY)
+    writer.write(output)
+    output.seek(0)
+    return output
@@ -1,208 +1,330 @@
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
-from io import BytesIO
+from collections import deque
+from functools import lru_cache
+from tempfile import SpooledTemporaryFile
+from . import metrics
 
-def register_greek_font():
-    try:
-        font_path = "C:\\Windows\\Fonts\\arial.ttf"
-        
-        if not os.path.exists(font_path):
-             font_path = "C:\\Users\\alexn\\OneDrive\\Desktop\\ARIAL.TTF"
-
-        if os.path.exists(font_path):
-            pdfmetrics.registerFont(TTFont('Arial', font_path))
-            return 'Arial'
-        else:
-            return 'Helvetica' 
-    except:
-        return 'Helvetica'
+# -- Fonts (registered once per process) --
+# Folders are searched in order, the first one holding a regular + bold pair wins.
+# Extra folders can be given with PAYROLL_PDF_FONT_DIRS (separated by os.pathsep).
+# The bundled DejaVu Sans (app/fonts) covers Greek, so there is always a usable font.
 
-def generate_payroll_pdf(payroll_data):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-    elements = []
-    
-    font_name = register_greek_font()   
-    
+BUNDLED_FONT_DIR = os.path.join(os.path.dirname(__file__), "fonts")
+
+FONT_DIRS = [d for d in os.getenv("PAYROLL_PDF_FONT_DIRS", "").split(os.pathsep) if d] + [
+    "C:\\Windows\\Fonts",
+    "/usr/share/fonts/truetype/msttcorefonts",
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/TTF",
+    "/Library/Fonts",
+    BUNDLED_FONT_DIR,
+]
+
+# (regular, bold) file names
+FONT_FILES = [
+    ("arial.ttf", "arialbd.ttf"),
+    ("Arial.ttf", "Arial_Bold.ttf"),
+    ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf"),
+]
+
+FONT_NAME = "PayrollSans"
+BOLD_FONT_NAME = "PayrollSans-Bold"
+
+@lru_cache(maxsize=None)
+def load_fonts():
+    """Registers the first regular/bold pair found and returns their names."""
+    for folder in FONT_DIRS:
+        for regular, bold in FONT_FILES:
+            regular_path = os.path.join(folder, regular)
+            bold_path = os.path.join(folder, bold)
+            if not (os.path.isfile(regular_path) and os.path.isfile(bold_path)):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, regular_path))
+                pdfmetrics.registerFont(TTFont(BOLD_FONT_NAME, bold_path))
+            except Exception:
+                continue # Broken or unsupported file, try the next one
+            return FONT_NAME, BOLD_FONT_NAME
+    return 'Helvetica', 'Helvetica-Bold'
+
+# -- Styles (built once, ReportLab only reads them) --
+
+@lru_cache(maxsize=None)
+def get_styles():
+    font_name, bold_font = load_fonts()
     styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontName=font_name,
-        fontSize=18,
-        alignment=1, 
-        spaceAfter=20
-    )
-    
-    start = payroll_data["start_date"]
-    end = payroll_data["end_date"]
-    title_text = f"Μισθοδοσία: {start} έως {end}"
-    elements.append(Paragraph(title_text, title_style))
-    
-    data = [[
-        "Εργαζόμενος", "Ημέρες", "Μισθός","Ώρες Υπ.", "Υπερωρία", 
-        "Extra", "Αιτιολογία", 
-        "Σύνολο", "Τράπεζα", "Μετρητά"
-    ]]
-    
-    total_bank = 0
-    total_cash = 0
-    total_grand = 0
-    total_extra_sum = 0
-
-    for item in payroll_data["payments"]:
-        row = [
-            item["employee_name"],
-            str(item["days_worked"]),
-            f"{item['total_wage']:.2f}",
-            f"{item['total_overtime_hours']:.1f}",
-            f"{item['total_overtime']:.2f}",
-            f"{item['total_extra']:.2f}",    
-            item['extra_reasons'],
-            f"{item['grand_total']:.2f}",
-            f"{item['bank_pay']:.2f}",
-            f"{item['cash_pay']:.2f}"
-        ]
-        data.append(row)
-        
-        total_bank += item['bank_pay']
-        total_cash += item['cash_pay']
-        total_grand += item['grand_total']
-        total_extra_sum += item['total_extra']
-
-    data.append([
-        "ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", "", 
-        f"{total_extra_sum:.2f}", "", 
-        f"{total_grand:.2f}", f"{total_bank:.2f}", f"{total_cash:.2f}"
-    ])
 
-    table = Table(data)
-    
-    style = TableStyle([
+    common_table = [
         ('FONT', (0, 0), (-1, -1), font_name),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.gray),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 0), (-1, 0), bold_font),
+    ]
+    # Only the last table of a report carries the totals row
+    total_row = [
+        ('FONTNAME', (0, -1), (-1, -1), bold_font),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+    ]
+    payroll_table = TableStyle(common_table + [
         ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.gray),      
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
         ('ALIGN', (0, 0), (0, -1), 'LEFT'), 
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        
         ('BACKGROUND', (7, 0), (7, -1), colors.aliceblue), 
         ('BACKGROUND', (8, 0), (8, -1), colors.lightyellow), 
-        ('FONTNAME', (0, -1), (-1, -1), f'{font_name}-Bold' if font_name=='Arial' else font_name),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
     ])
-    
+    analysis_table = TableStyle(common_table + [
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ])
+
+    return {
+        "payroll_title": ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            fontName=font_name,
+            fontSize=18,
+            alignment=1, 
+            spaceAfter=20
+        ),
+        "title": ParagraphStyle('Title', parent=styles['Heading1'], fontName=font_name, alignment=1),
+        "subtitle": ParagraphStyle('Sub', fontName=font_name, alignment=1),
+        "payroll_table": payroll_table,
+        "payroll_table_last": TableStyle(total_row, parent=payroll_table),
+        "analysis_table": analysis_table,
+        "analysis_table_last": TableStyle(total_row, parent=analysis_table),
+    }
+
+# -- Page-sized rendering --
+# Rows come from any iterable (lists, generators or a yield_per cursor) and are laid out by
+# _RowTable, which is cut by the layout engine into one table per frame: each one holds the rows
+# that fit in the space left, under a repeated header. Only the rows of the page being laid out
+# are in memory. The finished PDF is written to a spooled temp file that moves to disk when it grows.
+
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+PAYROLL_COL_WIDTHS = [110, 45, 60, 50, 60, 55, 113, 70, 65, 70]   # landscape A4 inside the margins
+BOAT_ANALYSIS_COL_WIDTHS = [75, 136, 80, 80, 80]
+SHORT_ANALYSIS_COL_WIDTHS = [171, 90, 90, 100]
+PAYROLL_SUMMARY_COL_WIDTHS = [220, 80, 120, 120, 120]
+
+class _RowTable(Flowable):
+    """A table over a row iterator. total_row is called once all rows are consumed."""
+
+    def __init__(self, header, rows, col_widths, style, last_style, total_row):
+        Flowable.__init__(self)
+        self._header = header
+        self._rows = iter(rows)
+        self._pending = deque() # Rows pulled from the iterator that did not fit on the last page
+        self._col_widths = col_widths
+        self._style = style
+        self._last_style = last_style
+        self._total_row = total_row
+        self._line_height = None # Height of the header row, measured on the first split
+
+    def _fill(self):
+        """Makes sure a row is pending, False once the iterator is exhausted."""
+        if not self._pending:
+            try:
+                self._pending.append(next(self._rows))
+            except StopIteration:
+                return False
+        return True
+
+    def _table(self, data, style, width, height):
+        table = Table(data, colWidths=self._col_widths, repeatRows=1)
+        table.setStyle(get_styles()[style])
+        return table, table.wrap(width, height)[1]
+
+    def _rest(self):
+        """The rows still to lay out, as a new flowable (the layout marks the one it had to put back)."""
+        rest = _RowTable(self._header, self._rows, self._col_widths, self._style, self._last_style, self._total_row)
+        rest._pending, rest._line_height = self._pending, self._line_height
+        return rest
+
+    def wrap(self, availWidth, availHeight):
+        # Never fits as a whole, so the frame always asks split() for the part that does
+        return sum(self._col_widths), availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        # As many rows as fit if each takes one line like the header, the table is then cut down
+        # to what really fits (a reason with line breaks is taller). Handing back a table shorter
+        # than the space would put the header of the next one in the middle of the page.
+        if self._line_height is None:
+            self._line_height = self._table([self._header], self._style, availWidth, availHeight)[1]
+        page = []
+        while len(page) < availHeight // self._line_height - 1 and self._fill():
+            page.append(self._pending.popleft())
+        last = not self._fill()
+
+        while True:
+            if last:
+                table, height = self._table([self._header] + page + [self._total_row()], self._last_style, availWidth, availHeight)
+            else:
+                table, height = self._table([self._header] + page, self._style, availWidth, availHeight)
+            if height <= availHeight:
+                break
+            if not page:
+                return [] # Not even one row fits, the layout moves on to the next frame
+            self._pending.appendleft(page.pop())
+            last = False
+
+        if not page and not last:
+            return []
+        return [table] if last else [table, self._rest()]
+
+def _render(pagesize, story):
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    doc = SimpleDocTemplate(output, pagesize=pagesize)
+    with metrics.timed_render():
+        doc.build(story)
+    output.seek(0)
+    return output
+
+def render_bytes(generate, data):
+    """The whole PDF in memory, for the snapshots of closed payroll periods."""
+    with generate(data) as output:
+        return output.read()
+
+def stream_file(output):
+    """Generator for StreamingResponse, closes the file once everything has been sent."""
     try:
-        pdfmetrics.registerFont(TTFont('Arial-Bold', "C:\\Windows\\Fonts\\arialbd.ttf"))
-        style.add('FONTNAME', (0, 0), (-1, 0), 'Arial-Bold') 
-        style.add('FONTNAME', (0, -1), (-1, -1), 'Arial-Bold') 
-    except:
-        pass
+        while True:
+            chunk = output.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        output.close()
+
+# -- Reports --
+
+def _payroll_story(payroll_data):
+    styles = get_styles()
+    totals = {"bank": 0.0, "cash": 0.0, "grand": 0.0, "extra": 0.0}
+
+    def rows():
+        for item in payroll_data["payments"]:
+            totals["bank"] += item['bank_pay']
+            totals["cash"] += item['cash_pay']
+            totals["grand"] += item['grand_total']
+            totals["extra"] += item['total_extra']
+            yield [
+                item["employee_name"],
+                str(item["days_worked"]),
+                f"{item['total_wage']:.2f}",
+                f"{item['total_overtime_hours']:.1f}",
+                f"{item['total_overtime']:.2f}",
+                f"{item['total_extra']:.2f}",    
+                item['extra_reasons'],
+                f"{item['grand_total']:.2f}",
+                f"{item['bank_pay']:.2f}",
+                f"{item['cash_pay']:.2f}"
+            ]
+
+    def total_row():
+        return [
+            "ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", "", "", 
+            f"{totals['extra']:.2f}", "", 
+            f"{totals['grand']:.2f}", f"{totals['bank']:.2f}", f"{totals['cash']:.2f}"
+        ]
+
+    header = [
+        "Εργαζόμενος", "Ημέρες", "Μισθός","Ώρες Υπ.", "Υπερωρία", 
+        "Extra", "Αιτιολογία", 
+        "Σύνολο", "Τράπεζα", "Μετρητά"
+    ]
 
-    table.setStyle(style)
-    elements.append(table)
+    start = payroll_data["start_date"]
+    end = payroll_data["end_date"]
+    return [
+        Paragraph(f"Μισθοδοσία: {start} έως {end}", styles["payroll_title"]),
+        _RowTable(header, rows(), PAYROLL_COL_WIDTHS, "payroll_table", "payroll_table_last", total_row),
+    ]
 
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+def generate_payroll_pdf(payroll_data):
+    return _render(landscape(A4), _payroll_story(payroll_data))
+
+# Every period on its own pages like the single payroll PDF, then one page with the period totals
+def generate_payroll_batch_pdf(batch):
+    styles = get_styles()
+
+    def summary_rows():
+        for period in batch["periods"]:
+            totals = period["totals"]
+            yield [
+                f"{period['start_date']} έως {period['end_date']}",
+                str(totals["employees"]),
+                f"{totals['grand_total']:.2f}",
+                f"{totals['bank_pay']:.2f}",
+                f"{totals['cash_pay']:.2f}",
+            ]
+
+    story = []
+    for period in batch["periods"]:
+        story += _payroll_story(period)
+        story.append(PageBreak())
+    totals = batch["totals"]
+    story += [
+        Paragraph(f"Σύνοψη περιόδων: {batch['start_date']} έως {batch['end_date']}", styles["payroll_title"]),
+        _RowTable(
+            ["Διάστημα", "Άτομα", "Σύνολο", "Τράπεζα", "Μετρητά"], summary_rows(), PAYROLL_SUMMARY_COL_WIDTHS,
+            "analysis_table", "analysis_table_last",
+            lambda: ["ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", f"{totals['grand_total']:.2f}", f"{totals['bank_pay']:.2f}", f"{totals['cash_pay']:.2f}"],
+        ),
+    ]
+    return _render(landscape(A4), story)
 
 def generate_boat_analysis_pdf(data):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    font_name = register_greek_font()   
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontName=font_name, alignment=1)
-    
-    elements.append(Paragraph(f"Ανάλυση Σκάφους: {data['boat_name']}", title_style))
-    elements.append(Spacer(1, 20))
-    
-    table_data = [["Ημερομηνία", "Εργαζόμενος", "Μισθός", "Υπερωρία", "Σύνολο"]]
-    
-    for item in data["analysis_data"]:
-        table_data.append([
-            str(item["date"]), 
-            item["employee_name"],
-            f"{item['daily_cost']:.2f}",
-            f"{item['overtime_cost']:.2f}",
-            f"{item['total_cost']:.2f}"
-        ])
-        
-    table_data.append(["ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", "", f"{data['total_cost']:.2f}"])
-    
-    table = Table(table_data)
-    style = TableStyle([
-        ('FONT', (0, 0), (-1, -1), font_name),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.gray),      
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), f'{font_name}-Bold' if font_name=='Arial' else font_name),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-    ])
-    try:
-        pdfmetrics.registerFont(TTFont('Arial-Bold', "C:\\Windows\\Fonts\\arialbd.ttf"))
-        style.add('FONTNAME', (0, 0), (-1, 0), 'Arial-Bold') 
-        style.add('FONTNAME', (0, -1), (-1, -1), 'Arial-Bold') 
-    except: pass
+    styles = get_styles()
 
-    table.setStyle(style)
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    def rows():
+        for item in data["analysis_data"]:
+            yield [
+                str(item["date"]), 
+                item["employee_name"],
+                f"{item['daily_cost']:.2f}",
+                f"{item['overtime_cost']:.2f}",
+                f"{item['total_cost']:.2f}"
+            ]
+
+    # total_cost is read once the rows are consumed, a streamed report (crud.stream_boat_analysis) sums it meanwhile
+    return _render(A4, [
+        Paragraph(f"Ανάλυση Σκάφους: {data['boat_name']}", styles["title"]),
+        Spacer(1, 20),
+        _RowTable(
+            ["Ημερομηνία", "Εργαζόμενος", "Μισθός", "Υπερωρία", "Σύνολο"], rows(), BOAT_ANALYSIS_COL_WIDTHS,
+            "analysis_table", "analysis_table_last",
+            lambda: ["ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", "", f"{data['total_cost']:.2f}"],
+        ),
+    ])
 
 
 def generate_short_boat_analysis_pdf(data):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    font_name = register_greek_font()   
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontName=font_name, alignment=1)
-    
-    elements.append(Paragraph(f"Συνοπτική Ανάλυση: {data['boat_name']}", title_style))
-    elements.append(Paragraph(f"Διάστημα: {data['start_date']} έως {data['end_date']}", ParagraphStyle('Sub', fontName=font_name, alignment=1)))
-    elements.append(Spacer(1, 20))
-    
-    table_data = [["Εργαζόμενος", "Μεροκάματα", "Ώρες Υπερ.", "Συνολικό Κόστος"]]
-    
-    for emp in data["employees"]:
-        table_data.append([
-            emp["name"],
-            str(emp["days"]),
-            f"{emp['ot_hours']:.1f}",
-            f"{emp['cost']:.2f} €"
-        ])
-        
-    table_data.append(["ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", f"{data['total_cost']:.2f} €"])
-    
-    table = Table(table_data)
-    style = TableStyle([
-        ('FONT', (0, 0), (-1, -1), font_name),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.gray),      
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), f'{font_name}-Bold' if font_name=='Arial' else font_name),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+    styles = get_styles()
+
+    def rows():
+        for emp in data["employees"]:
+            yield [
+                emp["name"],
+                str(emp["days"]),
+                f"{emp['ot_hours']:.1f}",
+                f"{emp['cost']:.2f} €"
+            ]
+
+    return _render(A4, [
+        Paragraph(f"Συνοπτική Ανάλυση: {data['boat_name']}", styles["title"]),
+        Paragraph(f"Διάστημα: {data['start_date']} έως {data['end_date']}", styles["subtitle"]),
+        Spacer(1, 20),
+        _RowTable(
+            ["Εργαζόμενος", "Μεροκάματα", "Ώρες Υπερ.", "Συνολικό Κόστος"], rows(), SHORT_ANALYSIS_COL_WIDTHS,
+            "analysis_table", "analysis_table_last",
+            lambda: ["ΓΕΝΙΚΟ ΣΥΝΟΛΟ", "", "", f"{data['total_cost']:.2f} €"],
+        ),
     ])
-    try:
-        pdfmetrics.registerFont(TTFont('Arial-Bold', "C:\\Windows\\Fonts\\arialbd.ttf"))
-        style.add('FONTNAME', (0, 0), (-1, 0), 'Arial-Bold') 
-        style.add('FONTNAME', (0, -1), (-1, -1), 'Arial-Bold') 
-    except: pass
-
-    table.setStyle(style)
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
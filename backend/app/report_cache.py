@@ -0,0 +1,158 @@
+import functools
+import inspect
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+from . import versions
+
+# -- Report cache --
+# Keeps the results of the crud report functions in memory, least recently used first out.
+# Every entry remembers the date range, the boat, the tables it was computed from and their
+# data versions (see versions.py), and is only returned while the base still has those versions.
+# crud calls invalidate() after each committed write of this process, describing what changed
+# (the dates of the attendance rows, the date span of an employee or a boat): the entries
+# overlapping that change are dropped and the others move on to the new version.
+# A write of another worker or process moves the versions without that call, so every entry
+# of its tables misses and is computed again.
+# Cached results are shared between requests, callers must treat them as read only.
+#
+# PAYROLL_REPORT_CACHE_MB   memory limit of the cache, 0 turns it off (default 64)
+
+CONFIGURED_BYTES = int(os.getenv("PAYROLL_REPORT_CACHE_MB", "64")) * 1024 * 1024
+MAX_BYTES = CONFIGURED_BYTES # disable() sets it to 0, reset() back to the configured limit
+
+@dataclass
+class Entry:
+    value: object
+    size: int
+    start: date
+    end: date
+    boat_id: Optional[int]
+    tables: tuple
+    versions: dict
+
+    def overlaps(self, start, end):
+        return self.start <= end and start <= self.end
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_bytes = 0
+# Bumped on every invalidation. A result computed while a write committed is not stored,
+# it may have read the rows from before the write.
+_generation = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def _size_of(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_size_of(k) + _size_of(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_size_of(item) for item in value)
+    return size
+
+def _drop(key):
+    global _bytes
+    _bytes -= _entries.pop(key).size
+
+def cached(tables, start="start", end="end", boat=None):
+    """Caches a crud report function (db, ...). start / end / boat name its range and boat parameters."""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(db, *args, **kwargs):
+            global _bytes
+            if MAX_BYTES <= 0:
+                return func(db, *args, **kwargs)
+
+            bound = signature.bind(db, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple((name, value) for name, value in bound.arguments.items() if name != "db")
+            key = (func.__name__, str(db.get_bind().url), params)
+            data_versions = versions.current(db) # Read before computing, the result is at least that recent
+            data_versions = {table: data_versions[table] for table in tables}
+
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None and entry.versions == data_versions:
+                    _entries.move_to_end(key)
+                    _stats["hits"] += 1
+                    return entry.value
+                _stats["misses"] += 1
+                generation = _generation
+
+            value = func(db, *args, **kwargs)
+
+            entry = Entry(
+                value=value, size=_size_of(value),
+                start=bound.arguments[start], end=bound.arguments[end],
+                boat_id=bound.arguments[boat] if boat else None, tables=tables, versions=data_versions,
+            )
+            with _lock:
+                if generation == _generation and entry.size <= MAX_BYTES:
+                    if key in _entries:
+                        _drop(key)
+                    _entries[key] = entry
+                    _bytes += entry.size
+                    while _bytes > MAX_BYTES:
+                        _drop(next(iter(_entries)))
+                        _stats["evictions"] += 1
+            return value
+
+        return wrapper
+    return decorator
+
+def invalidate(db, table, dates=(), span=None, boat_id=None):
+    """
+    Called after db.commit(). Drops the entries built from `table` that overlap the change
+    and moves the others from the version before the commit to the one after it:
+    dates   days of the changed attendance rows
+    span    (first, last) day of an employee's or a boat's rows, None when it has none
+    boat_id entries of that boat are dropped whatever their range (the boat name is in the report)
+    """
+    global _generation
+    ranges = [(day, day) for day in dates] + ([span] if span else [])
+    # Only entries at exactly `before` are moved: one of an older version may miss another worker's write
+    before, after = versions.committed(db, table) or (None, None)
+    with _lock:
+        _generation += 1
+        for key, entry in list(_entries.items()):
+            if table not in entry.tables:
+                continue
+            if boat_id is not None and entry.boat_id == boat_id:
+                stale = True
+            elif boat_id is not None and entry.boat_id is not None:
+                stale = False # Another boat's report, the changed boat is not in it
+            else:
+                stale = any(entry.overlaps(first, last) for first, last in ranges)
+            if stale:
+                _drop(key)
+                _stats["invalidations"] += 1
+            elif before is not None and entry.versions[table] == before:
+                entry.versions = {**entry.versions, table: after}
+
+def clear():
+    global _bytes, _generation
+    with _lock:
+        _entries.clear()
+        _bytes = 0
+        _generation += 1
+
+def disable():
+    global MAX_BYTES
+    MAX_BYTES = 0
+    clear()
+
+# Empty and on again with the configured limit, after disable()
+def reset():
+    global MAX_BYTES
+    MAX_BYTES = CONFIGURED_BYTES
+    clear()
+
+def stats():
+    with _lock:
+        return {**_stats, "entries": len(_entries), "bytes": _bytes, "max_bytes": MAX_BYTES}
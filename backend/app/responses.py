@@ -0,0 +1,37 @@
+import json
+import os
+from datetime import date
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError: # Optional, the standard json module is used without it
+    orjson = None
+
+# -- Report responses --
+# The report routes keep their response_model, so the OpenAPI schema stays the one of schemas.py,
+# but they return the crud result already rendered: FastAPI skips validating and re-serializing
+# every row, which for long ranges took longer than the query itself.
+# crud builds these dicts with the types of the schemas (floats, dates, str), so the JSON is the same.
+#
+# PAYROLL_VALIDATE_REPORTS   "1" goes back to FastAPI validating the reports against their schema
+
+VALIDATE = os.getenv("PAYROLL_VALIDATE_REPORTS", "0") == "1"
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def render_report(report) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(report)
+    return json.dumps(report, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+class ReportJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return render_report(content)
+
+def report_response(report, headers=None):
+    """Wraps the report in a ReportJSONResponse, or returns it as is for FastAPI to validate when VALIDATE is on."""
+    return report if VALIDATE else ReportJSONResponse(report, headers=headers)
@@ -0,0 +1,156 @@
+import json
+from sqlalchemy import text
+
+# -- Monthly rollups --
+# Sums of the daily cost ledger per calendar month, for the analytics dashboards:
+#   rollup_boat_employee_month   (month, boat_id, employee_id)   boat_id NULL for extras without a boat
+#   rollup_employee_month        (month, employee_id)            every boat together
+#   rollup_boat_month            (month, boat_id)                every employee together
+# month is the first day of the month. Each row holds days, overtime_hours, wage, overtime and extra,
+# the same figures the boat reports show (overtime counts whether or not the day was worked).
+#
+# crud refreshes the (employee, month) pairs a write (attendance or adjustment) touched right after the ledger:
+# their boat x employee rows are summed again from the ledger, the two other tables from those rows.
+# Like ledger.py the SQL is plain text, shared by the migration (sqlite3 cursor) and crud (Session).
+
+TABLES = ("rollup_boat_employee_month", "rollup_employee_month", "rollup_boat_month")
+
+_SUM_COLUMNS = """
+        days FLOAT NOT NULL DEFAULT 0,
+        overtime_hours FLOAT NOT NULL DEFAULT 0,
+        wage FLOAT NOT NULL DEFAULT 0,
+        overtime FLOAT NOT NULL DEFAULT 0,
+        extra FLOAT NOT NULL DEFAULT 0"""
+
+CREATE_TABLES = [
+    f"""CREATE TABLE IF NOT EXISTS rollup_boat_employee_month (
+        id INTEGER NOT NULL,
+        month DATE NOT NULL,
+        boat_id INTEGER,
+        employee_id INTEGER NOT NULL,{_SUM_COLUMNS},
+        PRIMARY KEY (id),
+        FOREIGN KEY(boat_id) REFERENCES boats (id),
+        FOREIGN KEY(employee_id) REFERENCES employees (id)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS rollup_employee_month (
+        month DATE NOT NULL,
+        employee_id INTEGER NOT NULL,{_SUM_COLUMNS},
+        PRIMARY KEY (employee_id, month),
+        FOREIGN KEY(employee_id) REFERENCES employees (id)
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS rollup_boat_month (
+        month DATE NOT NULL,
+        boat_id INTEGER NOT NULL,{_SUM_COLUMNS},
+        PRIMARY KEY (boat_id, month),
+        FOREIGN KEY(boat_id) REFERENCES boats (id)
+    )""",
+]
+
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_rollup_bem_employee_month ON rollup_boat_employee_month (employee_id, month)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_bem_boat_month ON rollup_boat_employee_month (boat_id, month)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_bem_month ON rollup_boat_employee_month (month)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_boat_month_month ON rollup_boat_month (month)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_employee_month_month ON rollup_employee_month (month)",
+]
+
+COLUMNS = "days, overtime_hours, wage, overtime, extra"
+
+# Ledger rows (alias l) to the rollup columns, in the order of COLUMNS
+LEDGER_SUMS = """
+    SUM(CASE WHEN l.kind = 'wage' THEN l.days ELSE 0.0 END),
+    SUM(CASE WHEN l.kind = 'overtime' THEN l.hours ELSE 0.0 END),
+    SUM(CASE WHEN l.kind = 'wage' THEN l.amount ELSE 0.0 END),
+    SUM(CASE WHEN l.kind = 'overtime' THEN l.amount ELSE 0.0 END),
+    SUM(CASE WHEN l.kind = 'extra' THEN l.amount ELSE 0.0 END)"""
+
+_ROLLUP_SUMS = "SUM(days), SUM(overtime_hours), SUM(wage), SUM(overtime), SUM(extra)"
+
+# Which (employee, month) pairs a refresh recomputes. Read from tables the refresh does not change,
+# so every statement sees the same pairs (also after the ledger rows are gone). Adjustments pass
+# their pairs as [[employee_id, "YYYY-MM-01"], ...], a deleted adjustment is no longer in its table.
+SCOPES = {
+    "attendance": "SELECT DISTINCT employee_id, date(date, 'start of month') FROM attendance "
+                  "WHERE id IN (SELECT value FROM json_each(:ids)) AND employee_id IS NOT NULL",
+    "employee": "SELECT employee_id, date(date, 'start of month') FROM attendance WHERE employee_id = :employee_id "
+                "UNION SELECT employee_id, date(date, 'start of month') FROM adjustments WHERE employee_id = :employee_id",
+    "months": "SELECT DISTINCT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(:months)",
+}
+
+_KEYS = "WITH keys (employee_id, month) AS ({scope}) "
+
+_REFRESH = [
+    "DELETE FROM rollup_boat_employee_month WHERE (employee_id, month) IN (SELECT employee_id, month FROM keys)",
+    f"""INSERT INTO rollup_boat_employee_month (month, boat_id, employee_id, {COLUMNS})
+        SELECT k.month, l.boat_id, l.employee_id, {LEDGER_SUMS}
+        FROM keys k JOIN daily_cost_ledger l
+            ON l.employee_id = k.employee_id AND l.date >= k.month AND l.date < date(k.month, '+1 month')
+        GROUP BY k.month, l.boat_id, l.employee_id""",
+    "DELETE FROM rollup_employee_month WHERE (employee_id, month) IN (SELECT employee_id, month FROM keys)",
+    f"""INSERT INTO rollup_employee_month (month, employee_id, {COLUMNS})
+        SELECT month, employee_id, {_ROLLUP_SUMS} FROM rollup_boat_employee_month
+        WHERE (employee_id, month) IN (SELECT employee_id, month FROM keys)
+        GROUP BY employee_id, month""",
+    "DELETE FROM rollup_boat_month WHERE month IN (SELECT month FROM keys)",
+    f"""INSERT INTO rollup_boat_month (month, boat_id, {COLUMNS})
+        SELECT month, boat_id, {_ROLLUP_SUMS} FROM rollup_boat_employee_month
+        WHERE month IN (SELECT month FROM keys) AND boat_id IS NOT NULL
+        GROUP BY boat_id, month""",
+]
+
+_REBUILD = [
+    "DELETE FROM rollup_boat_employee_month",
+    "DELETE FROM rollup_employee_month",
+    "DELETE FROM rollup_boat_month",
+    f"""INSERT INTO rollup_boat_employee_month (month, boat_id, employee_id, {COLUMNS})
+        SELECT date(l.date, 'start of month'), l.boat_id, l.employee_id, {LEDGER_SUMS}
+        FROM daily_cost_ledger l
+        GROUP BY date(l.date, 'start of month'), l.boat_id, l.employee_id""",
+    f"""INSERT INTO rollup_employee_month (month, employee_id, {COLUMNS})
+        SELECT month, employee_id, {_ROLLUP_SUMS} FROM rollup_boat_employee_month GROUP BY employee_id, month""",
+    f"""INSERT INTO rollup_boat_month (month, boat_id, {COLUMNS})
+        SELECT month, boat_id, {_ROLLUP_SUMS} FROM rollup_boat_employee_month
+        WHERE boat_id IS NOT NULL GROUP BY boat_id, month""",
+]
+
+def refresh_statements(scope):
+    if scope == "all":
+        return list(_REBUILD)
+    keys = _KEYS.format(scope=SCOPES[scope])
+    return [keys + statement for statement in _REFRESH]
+
+# -- Session helpers used by crud, they run inside the caller's transaction, after the ledger --
+
+def _refresh(db, scope, params):
+    for statement in refresh_statements(scope):
+        db.execute(text(statement), params)
+
+def refresh_attendance(db, attendance_ids):
+    if attendance_ids:
+        _refresh(db, "attendance", {"ids": "[" + ",".join(str(int(i)) for i in attendance_ids) + "]"})
+
+def refresh_employee(db, employee_id):
+    _refresh(db, "employee", {"employee_id": employee_id})
+
+def refresh_months(db, employee_days):
+    """Refreshes the months of (employee_id, day) pairs, the days of the adjustments before and after a write."""
+    if employee_days:
+        months = [[employee_id, day.replace(day=1).isoformat()] for employee_id, day in employee_days]
+        _refresh(db, "months", {"months": json.dumps(months)})
+
+def rebuild(db):
+    _refresh(db, "all", {})
+
+if __name__ == "__main__":
+    # Backfill: sums every month again from the ledger. Run from the backend folder: python -m app.rollups
+    from .database import SessionLocal, engine
+    from . import migrations
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        db.commit()
+        counts = {table: db.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in TABLES}
+        print("Success: monthly rollups rebuilt, " + ", ".join(f"{table} {count} rows" for table, count in counts.items()))
+    finally:
+        db.close()
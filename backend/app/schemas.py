@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import date
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
 # -- Schemas for boats -- 
 
@@ -9,10 +9,11 @@ class BoatBase(BaseModel):
     name: str
 
 class BoatCreate(BoatBase):
-    pass 
+    active: Optional[bool] = None # None keeps the current value
 
 class Boat(BoatBase):
     id: int
+    active: bool = True
 
     class Config:
         from_attributes = True  # Allows Pydantic to read SQLAlchemy Models
@@ -26,10 +27,11 @@ class EmployeeBase(BaseModel):
     bank_daily_amount: float
 
 class EmployeeCreate(EmployeeBase):
-    pass 
+    active: Optional[bool] = None # None keeps the current value
 
 class Employee(EmployeeBase):
     id: int
+    active: bool = True
 
     class Config:
         from_attributes = True
@@ -44,8 +46,6 @@ class AttendanceBase(BaseModel):
     present: bool = False
     is_half_day: bool = False
     overtime_hours: float = 0.0
-    extra_amount: float = 0.0
-    extra_reason: Optional[str] = None
 
 class AttendanceCreate(AttendanceBase):
     boat_id: Optional[int] = None
@@ -53,11 +53,46 @@ class AttendanceCreate(AttendanceBase):
     present: Optional[bool] = None
     is_half_day: Optional[bool] = None
     overtime_hours: Optional[float] = None
-    extra_amount: Optional[float] = None
-    extra_reason: Optional[str] = None
+    # Deprecated, extras are adjustments now (/adjustments/). Still taken from the older clients:
+    # the amount becomes the employee's only adjustment of the day, 0 deletes them (see crud.save_day_extras)
+    extra_amount: Optional[float] = Field(None, deprecated="Use /adjustments/")
+    extra_reason: Optional[str] = Field(None, deprecated="Use /adjustments/")
 
 class Attendance(AttendanceBase):
     id: int
+    # Deprecated, the sum and the reasons of the employee's adjustments of the day
+    extra_amount: float = Field(0.0, deprecated="Use /adjustments/")
+    extra_reason: Optional[str] = Field(None, deprecated="Use /adjustments/")
+
+    class Config:
+        from_attributes = True
+
+# Employee x date grid of a range, as parallel arrays (see crud.get_attendance_matrix)
+class AttendanceMatrix(BaseModel):
+    start: date
+    end: date
+    days: int
+    employee_ids: List[int]
+    boats: List[Optional[int]]
+    status: List[int]           # 0 no row, 1 absent, 2 present, 3 half day
+    boat: List[int]             # index into boats, 0 is no boat
+    overtime_boat: List[int]
+    overtime_hours: List[float]
+
+# -- Schemas for adjustments (payroll extras) --
+
+class AdjustmentBase(BaseModel):
+    employee_id: int
+    date: date
+    amount: float
+    reason: str = ""
+    boat_id: Optional[int] = None
+
+class AdjustmentCreate(AdjustmentBase):
+    pass
+
+class Adjustment(AdjustmentBase):
+    id: int
 
     class Config:
         from_attributes = True
@@ -107,3 +142,82 @@ class PayrollReport (BaseModel):
     start_date: date
     end_date: date 
     payments: List[PaymentItem]
+
+# -- Schemas for closed payroll periods (the report and the PDF are served by /payroll/ and /payroll/pdf) --
+class ClosedPeriod(BaseModel):
+    id: int
+    start_date: date
+    end_date: date
+    closed_at: datetime
+    employees: int
+    grand_total: float
+    content_hash: str
+
+    class Config:
+        from_attributes = True
+
+# -- Schemas for payroll batch --
+class PayrollPeriod(BaseModel):
+    start: date
+    end: date
+
+# Either the periods one by one, or a range cut in weeks / fortnights / months
+class PayrollBatchRequest(BaseModel):
+    periods: Optional[List[PayrollPeriod]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    period: Optional[Literal["week", "fortnight", "month"]] = None
+
+class PayrollTotals(BaseModel):
+    employees: int
+    total_extra: float
+    grand_total: float
+    bank_pay: float
+    cash_pay: float
+
+class PayrollBatchPeriod(PayrollReport):
+    totals: PayrollTotals
+
+class PayrollBatchReport(BaseModel):
+    start_date: date
+    end_date: date
+    periods: List[PayrollBatchPeriod]
+    totals: PayrollTotals
+
+# -- Schemas for analytics --
+class AnalyticsItem(BaseModel):
+    id: int
+    name: str
+    month: Optional[date] = None # First day of the month, only with by=month
+    days: float
+    overtime_hours: float
+    wage: float
+    overtime: float
+    extra: float
+    total_cost: float
+
+class AnalyticsResponse(BaseModel):
+    start_date: date
+    end_date: date
+    total_cost: float
+    items: List[AnalyticsItem]
+
+# -- Schemas for background jobs --
+class JobStatus(BaseModel):
+    id: str
+    report: str
+    params: dict
+    status: str # queued / running / done / failed
+    progress: int # 0 - 100
+    error: Optional[str] = None
+    download_url: Optional[str] = None
+
+# -- Schemas for the report cache --
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+    bytes: int
+    max_bytes: int
@@ -0,0 +1,354 @@
+import os
+import time
+from datetime import date
+from . import metrics
+
+try:
+    import numpy as np
+except ImportError: # Optional, the reports keep using the SQL path without it
+    np = None
+
+# -- Vectorized reports (optional, needs numpy) --
+# Same results as the crud reports, computed from raw attendance and adjustments instead of the cost ledger:
+# the rows of the range are loaded once as columns, the costs are array arithmetic and the
+# per employee / per row totals are bincounts. Useful for long ranges (a year of a large fleet)
+# and to check the ledger against the source rows.
+#
+# PAYROLL_COMPUTE   "sql" (default) or "numpy", which path crud uses for payroll, boat analysis and expenses
+
+AVAILABLE = np is not None
+ENABLED = AVAILABLE and os.getenv("PAYROLL_COMPUTE", "sql") == "numpy"
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+# NULLs become 0 / -1 so every column has a plain numeric dtype
+_ATTENDANCE_SQL = """
+    SELECT id,
+           CAST(julianday(date) - 2440587.5 AS INTEGER),
+           employee_id,
+           COALESCE(boat_id, -1),
+           COALESCE(overtime_boat_id, -1),
+           COALESCE(present, 0),
+           COALESCE(is_half_day, 0),
+           COALESCE(overtime_hours, 0.0)
+    FROM attendance
+    WHERE date >= ? AND date <= ? AND employee_id IS NOT NULL {where}
+"""
+
+_ATTENDANCE_DTYPE = [
+    ("id", "i8"), ("day", "i8"), ("employee_id", "i8"), ("boat_id", "i8"), ("overtime_boat_id", "i8"),
+    ("present", "?"), ("is_half_day", "?"), ("overtime_hours", "f8"),
+]
+
+_ADJUSTMENTS_SQL = """
+    SELECT id, CAST(julianday(date) - 2440587.5 AS INTEGER), employee_id, COALESCE(boat_id, -1), amount
+    FROM adjustments
+    WHERE date >= ? AND date <= ? {where}
+"""
+
+_ADJUSTMENTS_DTYPE = [("id", "i8"), ("day", "i8"), ("employee_id", "i8"), ("boat_id", "i8"), ("amount", "f8")]
+
+# DBAPI cursor of the session's connection, works for sqlite3 and for aiosqlite under run_sync
+# (whose execute() does not return the cursor, so it is not chained)
+def _query(db, sql, params=()):
+    connection = db.connection().connection
+    cursor = connection.cursor()
+    started = time.perf_counter() # Bypasses the engine hooks, so it is counted here
+    cursor.execute(sql, params)
+    metrics.record_sql(time.perf_counter() - started, cursor, connection, sql, params)
+    return cursor
+
+def load_attendance(db, start, end, where="", params=()):
+    cursor = _query(db, _ATTENDANCE_SQL.format(where=where), (start.isoformat(), end.isoformat(), *params))
+    return np.fromiter(cursor, dtype=_ATTENDANCE_DTYPE)
+
+# where / params filter boat_id and employee_id like for load_attendance
+def load_adjustments(db, start, end, employees, where="", params=()):
+    cursor = _query(db, _ADJUSTMENTS_SQL.format(where=where), (start.isoformat(), end.isoformat(), *params))
+    return _known(np.fromiter(cursor, dtype=_ADJUSTMENTS_DTYPE), employees)
+
+# Rate columns indexed by employee id
+def load_employees(db):
+    rows = _query(
+        db,
+        "SELECT id, name, COALESCE(daily_wage, 0.0), COALESCE(overtime_rate, 0.0), COALESCE(bank_daily_amount, 0.0) "
+        "FROM employees",
+    ).fetchall()
+    size = max((row[0] for row in rows), default=0) + 1
+    employees = {
+        "exists": np.zeros(size, dtype=bool),
+        "daily_wage": np.zeros(size),
+        "overtime_rate": np.zeros(size),
+        "bank_daily_amount": np.zeros(size),
+        "name_rank": np.zeros(size, dtype=np.int64),
+        "names": [None] * size,
+    }
+    for emp_id, name, daily_wage, overtime_rate, bank_daily_amount in rows:
+        employees["exists"][emp_id] = True
+        employees["daily_wage"][emp_id] = daily_wage
+        employees["overtime_rate"][emp_id] = overtime_rate
+        employees["bank_daily_amount"][emp_id] = bank_daily_amount
+        employees["names"][emp_id] = name
+    for rank, emp_id in enumerate(sorted((row[0] for row in rows), key=lambda i: employees["names"][i] or "")):
+        employees["name_rank"][emp_id] = rank
+    return employees
+
+def _to_dates(days):
+    return [date.fromordinal(_EPOCH + int(day)) for day in days]
+
+# First index of every run of equal keys, the columns being sorted on them
+def _group_starts(*keys):
+    changed = np.zeros(len(keys[0]), dtype=bool)
+    if len(changed):
+        changed[0] = True
+        for key in keys:
+            changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+def _group_sums(values, starts):
+    return np.add.reduceat(values, starts) if len(starts) else np.zeros(0, dtype=values.dtype)
+
+# Rows of deleted employees are not reported
+def _known(rows, employees):
+    rows = rows[rows["employee_id"] < len(employees["exists"])]
+    return rows[employees["exists"][rows["employee_id"]]]
+
+# The same costs the ledger stores, one value per attendance row
+def _costs(rows, employees):
+    rows = _known(rows, employees)
+    emp = rows["employee_id"]
+
+    multiplier = np.where(rows["is_half_day"], 0.5, np.where(rows["present"], 1.0, 0.0))
+    return rows, {
+        "multiplier": multiplier,
+        "worked": multiplier > 0,
+        "wage": employees["daily_wage"][emp] * multiplier,
+        "overtime": rows["overtime_hours"] * employees["overtime_rate"][emp],
+    }
+
+# -- Payroll --
+
+def calculate_payroll(db, start: date, end: date):
+    employees = load_employees(db)
+    rows, costs = _costs(load_attendance(db, start, end), employees)
+    adjustments = load_adjustments(db, start, end, employees)
+    reasons = _extra_reasons(db, start, end) if (adjustments["amount"] > 0).any() else {}
+    return {"start_date": start, "end_date": end, "payments": _payments(rows, costs, adjustments, employees, reasons)}
+
+# Periods are sorted and do not overlap: the span is loaded once and every row goes
+# to the period whose start is the last one before its day
+def calculate_payroll_batch(db, periods):
+    employees = load_employees(db)
+    rows, costs = _costs(load_attendance(db, periods[0][0], periods[-1][1]), employees)
+    adjustments = load_adjustments(db, periods[0][0], periods[-1][1], employees)
+    starts = np.array([first.toordinal() - _EPOCH for first, _ in periods])
+    ends = np.array([last.toordinal() - _EPOCH for _, last in periods])
+
+    def periods_of(days):
+        period = np.searchsorted(starts, days, side="right") - 1
+        return np.where(ends[period] >= days, period, -1) # -1 in the gaps between periods
+
+    period = periods_of(rows["day"])
+    adjustment_period = periods_of(adjustments["day"])
+
+    reasons = [{} for _ in periods]
+    if (adjustments["amount"] > 0).any():
+        for (emp_id, day), found in _extra_reasons(db, periods[0][0], periods[-1][1], by_day=True).items():
+            index = np.searchsorted(starts, day, side="right") - 1
+            if ends[index] >= day:
+                period_reasons = reasons[index].setdefault(emp_id, [])
+                period_reasons += [reason for reason in found if reason not in period_reasons]
+
+    results = []
+    for index in range(len(periods)):
+        mask = period == index
+        results.append(_payments(
+            rows[mask], {name: values[mask] for name, values in costs.items()},
+            adjustments[adjustment_period == index], employees, reasons[index],
+        ))
+    return results
+
+# Distinct extra reasons per employee id, or per (employee id, epoch day) with by_day
+def _extra_reasons(db, start, end, by_day=False):
+    day = ", CAST(julianday(date) - 2440587.5 AS INTEGER)" if by_day else ""
+    cursor = _query(
+        db,
+        f"SELECT DISTINCT employee_id, reason{day} FROM adjustments "
+        "WHERE date >= ? AND date <= ? AND amount > 0 AND reason != ''",
+        (start.isoformat(), end.isoformat()),
+    )
+    reasons = {}
+    for emp_id, reason, *key in cursor:
+        reasons.setdefault((emp_id, *key) if by_day else emp_id, []).append(reason)
+    return reasons
+
+def _payments(rows, costs, adjustments, employees, reasons):
+    size = len(employees["exists"])
+    emp = rows["employee_id"]
+    worked = costs["worked"]
+    paid_hours = np.where(worked, rows["overtime_hours"], 0.0)
+    extra = np.where(adjustments["amount"] > 0, adjustments["amount"], 0.0)
+
+    has_rows = (np.bincount(emp, minlength=size) > 0) | (np.bincount(adjustments["employee_id"], minlength=size) > 0)
+    days_worked = np.bincount(emp, weights=costs["multiplier"], minlength=size)
+    total_wage = np.bincount(emp, weights=costs["wage"], minlength=size)
+    total_overtime_hours = np.bincount(emp, weights=paid_hours, minlength=size)
+    total_overtime = np.bincount(emp, weights=np.where(worked, costs["overtime"], 0.0), minlength=size)
+    total_extra = np.bincount(adjustments["employee_id"], weights=extra, minlength=size)
+    grand_total = total_wage + total_overtime + total_extra
+
+    # 50€ split as array operations, same rules as crud.split_bank_cash
+    target_bank = employees["bank_daily_amount"] * days_worked
+    target_cash = grand_total - target_bank
+    negative = target_cash < 0
+    target_cash = np.where(negative, 0.0, target_cash)
+    target_bank = np.where(negative, grand_total, target_bank)
+    remainder = np.mod(target_cash, 50)
+    keep = (target_bank == 0) | (target_bank < remainder)
+    cash_pay = np.where(keep, target_cash, target_cash - remainder)
+    bank_pay = np.where(keep, target_bank, grand_total - cash_pay)
+
+    payments = []
+    for emp_id in np.flatnonzero(has_rows & ((days_worked != 0) | (total_extra != 0))).tolist():
+        payments.append({
+            "employee_id": emp_id,
+            "employee_name": employees["names"][emp_id],
+            "days_worked": float(days_worked[emp_id]),
+            "total_wage": float(total_wage[emp_id]),
+            "total_overtime_hours": float(total_overtime_hours[emp_id]),
+            "total_overtime": float(total_overtime[emp_id]),
+            "total_extra": float(total_extra[emp_id]),
+            "extra_reasons": ", ".join(reasons.get(emp_id, [])),
+            "grand_total": float(grand_total[emp_id]),
+            "bank_pay": float(bank_pay[emp_id]),
+            "cash_pay": float(cash_pay[emp_id]),
+        })
+    return payments
+
+# -- Boat analysis --
+
+def get_boat_analysis(db, boat_id: int, start_date: date, end_date: date):
+    boat = _query(db, "SELECT name FROM boats WHERE id = ?", (boat_id,)).fetchone()
+    if boat is None:
+        return None
+
+    employees = load_employees(db)
+    rows, costs = _costs(
+        load_attendance(db, start_date, end_date, "AND (boat_id = ? OR overtime_boat_id = ?)", (boat_id, boat_id)),
+        employees,
+    )
+    adjustments = load_adjustments(db, start_date, end_date, employees, "AND boat_id = ?", (boat_id,))
+    return _boat_analysis(_analysis_lines(rows, costs, adjustments, employees), employees, boat_id, boat[0])
+
+# Every boat with a cost in the range, from one scan of the attendance rows and adjustments
+def get_boat_analysis_pack(db, start: date, end: date):
+    employees = load_employees(db)
+    rows, costs = _costs(load_attendance(db, start, end), employees)
+    lines = _analysis_lines(rows, costs, load_adjustments(db, start, end, employees), employees) # Sorted once for every boat
+    reports = []
+    for boat_id, name in _query(db, "SELECT id, name FROM boats ORDER BY name").fetchall():
+        report = _boat_analysis(lines, employees, boat_id, name)
+        if report["analysis_data"]:
+            reports.append({"boat_id": boat_id, **report})
+    return reports
+
+# Attendance rows and adjustments (those with an amount, like the ledger) as one set of columns,
+# sorted by date and employee name so the rows of an employee and day are next to each other
+def _analysis_lines(rows, costs, adjustments, employees):
+    adjustments = adjustments[adjustments["amount"] != 0]
+    count = len(adjustments)
+    lines = {
+        "day": np.concatenate([adjustments["day"], rows["day"]]),
+        "employee_id": np.concatenate([adjustments["employee_id"], rows["employee_id"]]),
+        "boat_id": np.concatenate([adjustments["boat_id"], rows["boat_id"]]),
+        "overtime_boat_id": np.concatenate([np.full(count, -1), rows["overtime_boat_id"]]),
+        "daily": np.concatenate([adjustments["amount"], costs["wage"]]),
+        "overtime": np.concatenate([np.zeros(count), costs["overtime"]]),
+        "is_adjustment": np.arange(count + len(rows)) < count,
+    }
+    order = np.lexsort((employees["name_rank"][lines["employee_id"]], lines["day"]))
+    return {name: values[order] for name, values in lines.items()}
+
+# One line per employee and day on the boat, its adjustments summed into the daily cost (see boat_analysis_query)
+def _boat_analysis(lines, employees, boat_id, boat_name):
+    on_boat = (lines["boat_id"] == boat_id) | (lines["overtime_boat_id"] == boat_id)
+    lines = {name: values[on_boat] for name, values in lines.items()}
+    starts = _group_starts(lines["day"], lines["employee_id"])
+    daily_cost = _group_sums(np.where(lines["boat_id"] == boat_id, lines["daily"], 0.0), starts)
+    overtime_cost = _group_sums(np.where(lines["overtime_boat_id"] == boat_id, lines["overtime"], 0.0), starts)
+    adjusted = _group_sums(lines["is_adjustment"] & (lines["boat_id"] == boat_id), starts) > 0
+    total_cost = daily_cost + overtime_cost
+    shown = (total_cost > 0) | adjusted # Deductions are shown too
+    firsts = starts[shown]
+
+    analysis_data = [
+        {"date": day, "employee_name": employees["names"][emp_id],
+         "daily_cost": daily, "overtime_cost": overtime, "total_cost": total}
+        for day, emp_id, daily, overtime, total in zip(
+            _to_dates(lines["day"][firsts]), lines["employee_id"][firsts].tolist(),
+            daily_cost[shown].tolist(), overtime_cost[shown].tolist(), total_cost[shown].tolist(),
+        )
+    ]
+    return {"boat_name": boat_name, "total_cost": float(total_cost[shown].sum()), "analysis_data": analysis_data}
+
+# -- Expenses --
+
+def get_expenses_report(db, start: date, end: date, boat_id: int = None, emp_id: int = None):
+    where, params = "", []
+    if boat_id:
+        where += " AND boat_id = ?"
+        params.append(boat_id)
+    if emp_id:
+        where += " AND employee_id = ?"
+        params.append(emp_id)
+
+    employees = load_employees(db)
+    rows, costs = _costs(load_attendance(db, start, end, where, params), employees)
+    adjustments = load_adjustments(db, start, end, employees, where, params)
+    boat_names = dict(_query(db, "SELECT id, name FROM boats").fetchall())
+
+    # The ledger rows: wage on the working boat when worked, overtime on the overtime boat (which must be
+    # the filtered boat too), adjustments with an amount on their boat. Per employee, day and boat, one
+    # day line (wage and adjustments) and one overtime line, shown when positive, adjusted ones also when negative.
+    overtime_line = rows["overtime_hours"] != 0
+    if boat_id:
+        overtime_line &= rows["overtime_boat_id"] == boat_id
+    adjustments = adjustments[adjustments["amount"] != 0]
+    count = len(rows)
+    kind = np.repeat([0, 1, 2], [len(adjustments), count, count]) # adjustment, day, overtime
+    columns = {
+        "day": np.concatenate([adjustments["day"], rows["day"], rows["day"]]),
+        "employee_id": np.concatenate([adjustments["employee_id"], rows["employee_id"], rows["employee_id"]]),
+        "boat_id": np.concatenate([adjustments["boat_id"], rows["boat_id"], rows["overtime_boat_id"]]),
+        "amount": np.concatenate([adjustments["amount"], costs["wage"], costs["overtime"]]),
+    }
+    present = np.concatenate([np.ones(len(adjustments), dtype=bool), costs["worked"], overtime_line])
+
+    # Ordered by date, employee, day line before overtime line, then boat, like expenses_query
+    kind = kind[present]
+    columns = {name: values[present] for name, values in columns.items()}
+    is_overtime = kind == 2
+    order = np.lexsort((columns["boat_id"], is_overtime, columns["employee_id"], columns["day"]))
+    kind, is_overtime = kind[order], is_overtime[order]
+    columns = {name: values[order] for name, values in columns.items()}
+    starts = _group_starts(columns["day"], columns["employee_id"], is_overtime, columns["boat_id"])
+    amounts = _group_sums(columns["amount"], starts)
+    shown = (_group_sums(columns["amount"] > 0, starts) > 0) | (_group_sums(kind == 0, starts) > 0)
+    firsts = starts[shown]
+    amounts = amounts[shown]
+
+    report_data = []
+    for day, employee, boat, overtime, amount in zip(
+        _to_dates(columns["day"][firsts]), columns["employee_id"][firsts].tolist(), columns["boat_id"][firsts].tolist(),
+        is_overtime[firsts].tolist(), amounts.tolist(),
+    ):
+        name = boat_names.get(boat)
+        report_data.append({
+            "date": day, "employee_name": employees["names"][employee],
+            "boat_name": (name + " (Υπερ)" if overtime else name) if name else "-",
+            "daily_cost": 0.0 if overtime else amount,
+            "overtime_cost": amount if overtime else 0.0,
+            "total_cost": amount,
+        })
+
+    return {"total_sum": float(amounts.sum()), "results": report_data}
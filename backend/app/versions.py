@@ -0,0 +1,59 @@
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# -- Data versions --
+# One counter per table, bumped by crud inside the same transaction as the write.
+# Anything derived from the data (cached PDFs, reports, ETags) is keyed by these numbers,
+# so it is stale as soon as one of the tables it reads has moved on.
+# The counters live in the base, so they survive restarts and are shared by every worker:
+# nothing is kept between requests, every request reads them again (see current()).
+
+TABLES = ("employees", "boats", "attendance")
+
+CREATE_TABLE = "CREATE TABLE IF NOT EXISTS data_versions (table_name VARCHAR PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+
+SEED = "INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)"
+
+# Session.info keys: the versions read by the open transaction, the {table: (before, after)} moves
+# of its bumps, and the moves of the transaction that has just committed (for report_cache.invalidate)
+CURRENT, PENDING, COMMITTED = "current_versions", "pending_versions", "committed_versions"
+
+def bump(db, *tables):
+    moves = db.info.setdefault(PENDING, {})
+    for table in tables:
+        # Writers are serialized by the base, so nobody else moves the counter before this commit
+        version = db.execute(
+            text("UPDATE data_versions SET version = version + 1 WHERE table_name = :name RETURNING version"), {"name": table}
+        ).scalar_one()
+        moves[table] = (moves[table][0] if table in moves else version - 1, version)
+    db.info.pop(CURRENT, None)
+
+# Returns {table: version} for the asked tables (all of them by default)
+def read(db, *tables):
+    rows = db.execute(text("SELECT table_name, version FROM data_versions")).all()
+    versions = {name: version for name, version in rows}
+    return {table: versions.get(table, 0) for table in (tables or TABLES)}
+
+def current(db):
+    """The versions of every table, read once per transaction of `db` (one statement per request)."""
+    if CURRENT not in db.info:
+        db.info[CURRENT] = read(db)
+    return dict(db.info[CURRENT])
+
+# The (before, after) version of `table` moved by the last commit of `db`, None when it did not bump it
+def committed(db, table):
+    return db.info.get(COMMITTED, {}).get(table)
+
+@event.listens_for(Session, "after_begin")
+def _begin(session, transaction, connection):
+    session.info.pop(COMMITTED, None)
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    session.info[COMMITTED] = session.info.pop(PENDING, {})
+
+@event.listens_for(Session, "after_transaction_end")
+def _ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(CURRENT, None)
+        session.info.pop(PENDING, None) # Rolled back, or closed without a commit
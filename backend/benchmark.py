@@ -0,0 +1,553 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Keep the benchmark away from the real payroll.db when app.main is imported
+os.environ.setdefault("PAYROLL_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'payroll_benchmark.db')}")
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import fleet
+from fleet import StatementCounter, legacy_calculate_payroll, make_session, normalize_reasons, override_app_db, to_cents
+from app import crud, models, report_cache, rollups, schemas, vectorized, versions
+from app.database import make_async_engine
+
+# -- Benchmark helpers --
+# Run from the backend folder: python benchmark.py (the checks and microbenchmarks are under tests/, python -m pytest)
+
+def timed(counter, fn, *args):
+    counter.count = 0
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started, counter.count
+
+# -- Payroll: previous per-employee loop (fleet.legacy_calculate_payroll) vs the grouped query --
+
+def bench_payroll(employees):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees)
+        counter = StatementCounter(engine)
+        start, end = date(2024, 1, 1), date(2024, 1, 31)
+
+        old, old_time, old_queries = timed(counter, legacy_calculate_payroll, db, start, end)
+        db.expire_all()
+        new, new_time, new_queries = timed(counter, crud.calculate_payroll, db, start, end)
+
+        assert normalize_reasons(old) == normalize_reasons(new), "payroll output differs"
+        print(f"payroll  employees={employees:<6} legacy: {old_time*1000:8.1f} ms {old_queries:>6} queries"
+              f" | grouped: {new_time*1000:8.1f} ms {new_queries:>3} queries")
+        db.close()
+        engine.dispose()
+
+# -- Payroll batch: every week of a quarter in one pass vs one call per week --
+
+def bench_payroll_batch(employees=500, runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, days=91)
+        periods = crud.split_periods(date(2024, 1, 1), date(2024, 3, 31), "week")
+        report_cache.disable()
+        enabled = vectorized.ENABLED
+
+        for compute in ("sql", "numpy") if vectorized.AVAILABLE else ("sql",):
+            vectorized.ENABLED = compute == "numpy"
+            batch_time = single_time = float("inf")
+            for _ in range(runs):
+                started = time.perf_counter()
+                batch = crud.calculate_payroll_batch(db, periods)
+                batch_time = min(batch_time, time.perf_counter() - started)
+                started = time.perf_counter()
+                singles = [crud.calculate_payroll(db, first, last) for first, last in periods]
+                single_time = min(single_time, time.perf_counter() - started)
+
+            for report, single in zip(batch["periods"], singles):
+                assert to_cents(normalize_reasons(report)["payments"]) == to_cents(normalize_reasons(single)["payments"]), \
+                    "batch differs"
+            print(f"payroll batch {compute:<5} employees={employees} periods={len(periods)}"
+                  f" | one per period: {single_time*1000:8.1f} ms | batch: {batch_time*1000:8.1f} ms")
+
+        vectorized.ENABLED = enabled
+        report_cache.reset()
+        db.close()
+        engine.dispose()
+
+# -- Attendance: one request per employee vs one bulk upsert --
+
+def bench_attendance_save(employees):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, days=5)
+        counter = StatementCounter(engine)
+
+        def day(target):
+            return [
+                schemas.AttendanceCreate(
+                    date=target, employee_id=emp_id, boat_id=1 + emp_id % 10, overtime_boat_id=1,
+                    present=True, is_half_day=False, overtime_hours=1.0,
+                )
+                for emp_id in range(1, employees + 1)
+            ]
+
+        def per_row(records):
+            for record in records:
+                crud.create_attendance(db, record)
+
+        # Day 3 updates existing rows, day 20 inserts new ones
+        for label, target in (("update", date(2024, 1, 3)), ("insert", date(2024, 1, 20))):
+            _, row_time, row_queries = timed(counter, per_row, day(target))
+            _, bulk_time, bulk_queries = timed(counter, crud.bulk_upsert_attendance, db, day(target))
+            print(f"attendance {label} employees={employees:<5} per-row: {row_time*1000:8.1f} ms {row_queries:>5} statements"
+                  f" | bulk: {bulk_time*1000:8.1f} ms {bulk_queries:>3} statements")
+        db.close()
+        engine.dispose()
+
+# -- Attendance matrix: a month as one columnar response vs one day response per day --
+
+def bench_attendance_matrix(employees=500, days=31):
+    from pydantic import TypeAdapter
+    from app.responses import render_report
+    day_json = TypeAdapter(list[schemas.Attendance])
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, days=days)
+        counter = StatementCounter(engine)
+        start = date(2024, 1, 1)
+        end = start + timedelta(days=days - 1)
+
+        def per_day(): # Validated and dumped through the response model, like the route does
+            return [day_json.dump_json(day_json.validate_python(crud.get_attendance_by_date(db, start + timedelta(days=d))))
+                    for d in range(days)]
+
+        bodies, day_time, day_queries = timed(counter, per_day)
+        matrix, matrix_time, matrix_queries = timed(counter, crud.get_attendance_matrix, db, start, end)
+        body = render_report(matrix)
+
+        # Every row of the day responses is its cell of the matrix
+        column = {employee_id: i * matrix["days"] for i, employee_id in enumerate(matrix["employee_ids"])}
+        rows = [row for day in bodies for row in json.loads(day)]
+        for row in rows:
+            i = column[row["employee_id"]] + (date.fromisoformat(row["date"]) - start).days
+            assert matrix["status"][i] == crud.matrix_status(row["present"], row["is_half_day"])
+            assert matrix["boats"][matrix["boat"][i]] == row["boat_id"]
+            assert matrix["boats"][matrix["overtime_boat"][i]] == row["overtime_boat_id"]
+            assert matrix["overtime_hours"][i] == row["overtime_hours"]
+        assert len(rows) == sum(status != crud.MATRIX_NO_ROW for status in matrix["status"])
+
+        print(f"attendance matrix employees={employees} days={days}: per day {day_time*1000:7.1f} ms {day_queries:>3} statements"
+              f" {sum(map(len, bodies))/1024:7.1f} KiB | matrix {matrix_time*1000:6.1f} ms {matrix_queries} statement"
+              f" {len(body)/1024:6.1f} KiB")
+        db.close()
+        engine.dispose()
+
+# -- Vectorized reports: numpy over raw attendance vs grouped SQL over the ledger --
+# 10M rows take several minutes to seed, raise PAYROLL_BENCH_MAX_ROWS to include them
+
+MAX_ROWS = int(os.getenv("PAYROLL_BENCH_MAX_ROWS", "1000000"))
+
+def bench_vectorized(rows):
+    if not vectorized.AVAILABLE:
+        print("vectorized: numpy is not installed, skipped")
+        return
+    days = 365
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=max(1, rows // 310), days=days)
+        year = (date(2024, 1, 1), date(2024, 12, 31))
+        month = (date(2024, 1, 1), date(2024, 1, 31))
+
+        reports = {
+            "payroll(year)": (crud.calculate_payroll, vectorized.calculate_payroll, year, ()),
+            "boat analysis(month)": (crud.get_boat_analysis, vectorized.get_boat_analysis, month, (1,)),
+            "expenses(month)": (crud.get_expenses_report, vectorized.get_expenses_report, month, ()),
+        }
+        line = []
+        for name, (sql_report, numpy_report, (start, end), boat) in reports.items():
+            started = time.perf_counter()
+            expected = sql_report.__wrapped__(db, *boat, start, end)
+            sql_time = time.perf_counter() - started
+            started = time.perf_counter()
+            result = numpy_report(db, *boat, start, end)
+            numpy_time = time.perf_counter() - started
+
+            if name.startswith("payroll"):
+                expected, result = normalize_reasons(expected), normalize_reasons(result)
+            assert to_cents(expected) == to_cents(result), f"{name} differs from the SQL report"
+            line.append(f"{name}: sql {sql_time*1000:8.1f} ms numpy {numpy_time*1000:8.1f} ms")
+        print(f"vectorized rows={rows:<9}", " | ".join(line))
+        db.close()
+        engine.dispose()
+
+# -- Report cache: recomputed vs served from memory, and what one attendance save drops --
+
+def bench_report_cache(employees=1000, runs=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees)
+        weeks = [(date(2024, 1, 1) + timedelta(days=7 * w), date(2024, 1, 7) + timedelta(days=7 * w)) for w in range(4)]
+
+        started = time.perf_counter()
+        for _ in range(runs):
+            crud.calculate_payroll.__wrapped__(db, *weeks[0])
+        uncached = (time.perf_counter() - started) / runs
+
+        for start, end in weeks:
+            crud.calculate_payroll(db, start, end)
+        started = time.perf_counter()
+        for _ in range(runs):
+            crud.calculate_payroll(db, *weeks[0])
+        cached = (time.perf_counter() - started) / runs
+
+        crud.create_attendance(db, schemas.AttendanceCreate(date=weeks[2][0], employee_id=1, present=True))
+        hits = report_cache.stats()["hits"]
+        for start, end in weeks:
+            crud.calculate_payroll(db, start, end)
+        kept = report_cache.stats()["hits"] - hits
+
+        print(f"report cache employees={employees:<6} payroll: {uncached*1000:7.2f} ms -> {cached*1000:6.3f} ms"
+              f" | one save kept {kept} of {len(weeks)} cached weeks")
+        report_cache.clear()
+        db.close()
+        engine.dispose()
+
+# -- Analytics: a year summed from the daily ledger vs the monthly rollups --
+
+def bench_analytics(employees=300, days=365, runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, days=days)
+        start, end = date(2024, 1, 10), date(2024, 12, 20)   # unaligned: both edge months come from the ledger
+        ledger_sums = text(
+            f"SELECT l.boat_id, {rollups.LEDGER_SUMS} FROM daily_cost_ledger l "
+            "WHERE l.date BETWEEN :start AND :end GROUP BY l.boat_id"
+        )
+
+        timings = {}
+        for name, run in {
+            "ledger": lambda: db.execute(ledger_sums, {"start": start, "end": end}).all(),
+            "rollups": lambda: crud.get_boat_analytics.__wrapped__(db, start, end),
+            "rollups by month": lambda: crud.get_employee_analytics.__wrapped__(db, start, end, by_month=True),
+        }.items():
+            run()
+            started = time.perf_counter()
+            for _ in range(runs):
+                run()
+            timings[name] = (time.perf_counter() - started) / runs
+
+        started = time.perf_counter()
+        crud.create_attendance(db, schemas.AttendanceCreate(date=date(2024, 6, 3), employee_id=1, boat_id=1, present=True))
+        save = time.perf_counter() - started
+
+        print(f"analytics employees={employees} days={days} boats: ledger {timings['ledger']*1000:7.2f} ms"
+              f" -> rollups {timings['rollups']*1000:6.2f} ms | employees by month {timings['rollups by month']*1000:6.2f} ms"
+              f" | one save with refresh {save*1000:5.2f} ms")
+        db.close()
+        engine.dispose()
+
+# -- Closed payroll period: stored report / PDF vs computed and rendered again --
+
+def bench_closed_period(employees=500, days=365, runs=5):
+    from app import pdf_utils
+    from app.responses import render_report
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, days=days)
+        start, end = date(2024, 3, 1), date(2024, 3, 31)
+
+        def live():
+            report = crud.calculate_payroll.__wrapped__(db, start, end)
+            return render_report(report), pdf_utils.render_bytes(pdf_utils.generate_payroll_pdf, report)
+
+        seen = crud.payroll_versions(db)
+        body, pdf = live()
+        report = crud.calculate_payroll.__wrapped__(db, start, end)
+        crud.close_payroll_period(db, start, end, report, body, pdf, seen)
+
+        timings = {}
+        for name, run in {
+            "live": live,
+            "snapshot": lambda: (crud.get_snapshot(db, start, end, "report"), crud.get_snapshot(db, start, end, "pdf")),
+        }.items():
+            started = time.perf_counter()
+            for _ in range(runs):
+                run()
+            timings[name] = (time.perf_counter() - started) / runs
+        assert crud.get_snapshot(db, start, end, "report").content == body
+
+        try:
+            crud.create_attendance(db, schemas.AttendanceCreate(date=date(2024, 3, 3), employee_id=1, present=True))
+            raise AssertionError("write into a closed period was accepted")
+        except crud.PeriodClosedError:
+            pass
+
+        print(f"closed period employees={employees} history={days} days: report + pdf computed {timings['live']*1000:7.1f} ms"
+              f" | stored {timings['snapshot']*1000:6.2f} ms")
+        db.close()
+        engine.dispose()
+
+# -- Boat pack: one query + render per boat in the pool vs every boat one by one --
+
+def bench_boat_pack(employees=300, boats=10):
+    from app import packs, pdf_utils
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        db = Session()
+        fleet.generate(db, employees=employees, boats=boats)
+        start, end = date(2024, 1, 1), date(2024, 1, 31)
+        report_cache.disable()
+        pdf_utils.load_fonts()
+
+        started = time.perf_counter()
+        singles = [crud.get_boat_analysis(db, boat_id, start, end) for boat_id in range(1, boats + 1)]
+        single_query = time.perf_counter() - started
+        for report in singles:
+            pdf_utils.generate_boat_analysis_pdf(report).close()
+        single_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reports = crud.get_boat_analysis_pack(db, start, end)
+        pack_query = time.perf_counter() - started
+        asyncio.run(packs.render_all("analysis", reports[:1])) # Starts the workers outside the timing
+        started = time.perf_counter()
+        pdfs = asyncio.run(packs.render_all("analysis", reports))
+        packs.zip_pack("analysis", reports, pdfs, start, end).close()
+        pack_time = pack_query + time.perf_counter() - started
+
+        print(f"boat pack boats={boats} workers={packs.PACK_WORKERS}: one by one {single_time*1000:7.1f} ms"
+              f" (queries {single_query*1000:5.1f} ms) | pack {pack_time*1000:7.1f} ms (query {pack_query*1000:5.1f} ms)")
+        report_cache.reset()
+        db.close()
+        engine.dispose()
+
+# -- PDF: font parsing + styles on every request vs registered once --
+
+def bench_pdf(employees=100, runs=10):
+    from app import pdf_utils
+
+    payments = [{
+        "employee_name": f"Εργαζόμενος {i}", "days_worked": 22.0, "total_wage": 1760.0,
+        "total_overtime_hours": 10.0, "total_overtime": 100.0, "total_extra": 20.0, "extra_reasons": "Bonus",
+        "grand_total": 1880.0, "bank_pay": 880.0, "cash_pay": 1000.0,
+    } for i in range(employees)]
+    data = {"start_date": date(2024, 1, 1), "end_date": date(2024, 1, 31), "payments": payments}
+
+    def render(cold):
+        started = time.perf_counter()
+        for _ in range(runs):
+            if cold:
+                pdf_utils.load_fonts.cache_clear()
+                pdf_utils.get_styles.cache_clear()
+            pdf_utils.generate_payroll_pdf(data)
+        return (time.perf_counter() - started) / runs
+
+    cold, warm = render(True), render(False)
+    print(f"payroll pdf rows={employees:<5} fonts per request: {cold*1000:7.1f} ms | cached: {warm*1000:7.1f} ms")
+
+def bench_pdf_memory(rows):
+    import tracemalloc
+    from app import pdf_utils
+
+    def analysis_rows():
+        for i in range(rows):
+            yield {"date": date(2024, 1, 1) + timedelta(days=i % 365), "employee_name": f"Employee {i % 300}",
+                   "daily_cost": 80.0, "overtime_cost": 20.0, "total_cost": 100.0}
+
+    pdf_utils.load_fonts()
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = pdf_utils.generate_boat_analysis_pdf(
+        {"boat_name": "Boat 1", "total_cost": 100.0 * rows, "analysis_data": analysis_rows()}
+    )
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = sum(len(chunk) for chunk in pdf_utils.stream_file(output))
+    print(f"boat analysis pdf rows={rows:<6} {elapsed*1000:8.1f} ms  peak python memory {peak/1e6:6.1f} MB  pdf {size/1e6:5.1f} MB")
+
+# -- Report serialization: FastAPI validating against response_model vs the rendered report --
+
+def bench_report_serialization(rows=10_000, runs=5):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from app import responses
+    from app.main import app
+
+    fields = {route.path: route.response_field for route in app.routes if getattr(route, "response_field", None)}
+    day = date(2024, 1, 1)
+    reports = {
+        "/expenses/": {"total_sum": 100.0 * rows, "results": [
+            {"date": day + timedelta(days=i % 365), "employee_name": f"Employee {i % 300:05d}", "boat_name": "Boat 1",
+             "daily_cost": 80.0, "overtime_cost": 20.0, "total_cost": 100.0} for i in range(rows)]},
+        "/payroll/": {"start_date": day, "end_date": day, "payments": [
+            {"employee_id": i, "employee_name": f"Employee {i:05d}", "days_worked": 22.5, "total_wage": 1800.0,
+             "total_overtime_hours": 12.5, "total_overtime": 125.0, "total_extra": 50.0, "extra_reasons": "Bonus",
+             "grand_total": 1975.0, "bank_pay": 675.0, "cash_pay": 1300.0} for i in range(rows)]},
+    }
+
+    def best(run):
+        elapsed = float("inf")
+        for _ in range(runs):
+            started = time.perf_counter()
+            run()
+            elapsed = min(elapsed, time.perf_counter() - started)
+        return elapsed * 1000
+
+    renderer = "orjson" if responses.orjson is not None else "json"
+    for path, report in reports.items():
+        validated = best(lambda: JSONResponse(asyncio.run(serialize_response(field=fields[path], response_content=report))))
+        rendered = best(lambda: responses.ReportJSONResponse(report))
+        print(f"serialize {path:<10} rows={rows} | response_model: {validated:7.1f} ms | {renderer}: {rendered:7.1f} ms")
+
+# -- Exports: expenses report built in memory vs streamed CSV --
+
+def bench_export_memory(employees=300, days=365):
+    import tracemalloc
+    from app import async_crud, exports
+
+    async def stream_csv(path, start, end):
+        async_engine = make_async_engine(f"sqlite:///{path}")
+        try:
+            async with async_sessionmaker(bind=async_engine)() as session:
+                rows = async_crud.stream_rows(session, crud.expenses_query(start, end))
+                return sum([len(chunk) async for chunk in exports.expenses_csv(rows)])
+        finally:
+            await async_engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine, Session = make_session(path)
+        db = Session()
+        fleet.generate(db, employees=employees, days=days)
+        start, end = date(2024, 1, 1), date(2024, 12, 31)
+        report_cache.disable()
+
+        # Timed without tracemalloc (it slows Python down several times), then traced for the peak
+        def measure(run):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            tracemalloc.start()
+            result = run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return result, elapsed, peak
+
+        lines, built_time, built_peak = measure(lambda: len(crud.get_expenses_report(db, start, end)["results"]))
+        size, streamed_time, streamed_peak = measure(lambda: asyncio.run(stream_csv(path, start, end)))
+
+        print(f"expenses export lines={lines:<7} report in memory: {built_time*1000:8.1f} ms peak {built_peak/1e6:6.1f} MB"
+              f" | streamed csv: {streamed_time*1000:8.1f} ms peak {streamed_peak/1e6:6.1f} MB ({size/1e6:.1f} MB sent)")
+        report_cache.reset()
+        db.close()
+        engine.dispose()
+
+# -- Load test: concurrent report reads while attendance is being saved --
+# Runs a real uvicorn server and drives it with httpx clients. The routes are plain def and
+# run in Starlette's threadpool, so this is the number to watch when the threadpool size or
+# the engine profile changes. Client and server share the process, it is not absolute capacity.
+
+def serve(app, port=8765):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+async def drive(base_url, day, clients, seconds, write_every=5):
+    import httpx
+
+    latencies = {"read": [], "write": []}
+    month = {"start": "2024-01-01", "end": "2024-01-31"}
+    deadline = time.perf_counter() + seconds
+
+    async def client_loop(number, client):
+        i = number
+        while time.perf_counter() < deadline:
+            i += 1
+            started = time.perf_counter()
+            if i % write_every == 0:
+                kind, response = "write", await client.post("/attendance/bulk", json=day)
+            elif i % 2:
+                kind, response = "read", await client.get("/payroll/", params=month)
+            else:
+                kind, response = "read", await client.get(f"/boats/{1 + i % 10}/analysis", params=month)
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(client_loop(number, client) for number in range(clients)))
+    return latencies
+
+def bench_load(profile="fast", employees=300, clients=16, seconds=5.0):
+    from app.main import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine, Session = make_session(path, profile=profile)
+        db = Session()
+        fleet.generate(db, employees=employees)
+        db.close()
+
+        app_engine, async_engine = override_app_db(app, path, profile=profile)
+
+        day = [
+            {"date": "2024-01-15", "employee_id": emp_id, "boat_id": 1, "present": True, "overtime_hours": 1.0}
+            for emp_id in range(1, employees + 1)
+        ]
+        report_cache.disable() # Every read has to reach the base
+        server, thread = serve(app)
+        try:
+            latencies = asyncio.run(drive("http://127.0.0.1:8765", day, clients, seconds))
+        finally:
+            server.should_exit = True
+            thread.join()
+            app.dependency_overrides.clear()
+            report_cache.reset()
+            asyncio.run(async_engine.dispose())
+            app_engine.dispose()
+            engine.dispose()
+
+        everything = sorted(latencies["read"] + latencies["write"])
+        p99 = everything[int(len(everything) * 0.99) - 1] if everything else 0.0
+        print(f"load profile={profile:<5} requests/s: {len(everything)/seconds:7.1f} (p99 {p99*1000:7.1f} ms)"
+              f" | reads/s: {len(latencies['read'])/seconds:7.1f} | writes/s: {len(latencies['write'])/seconds:6.1f}")
+
+if __name__ == "__main__":
+    for n in (100, 500, 1000):
+        bench_payroll(n)
+    bench_payroll_batch()
+    for n in (50, 300):
+        bench_attendance_save(n)
+    bench_attendance_matrix()
+    bench_report_cache()
+    bench_analytics()
+    bench_closed_period()
+    bench_boat_pack()
+    bench_report_serialization()
+    for n in (10_000, 100_000, 1_000_000, 10_000_000):
+        if n <= MAX_ROWS:
+            bench_vectorized(n)
+    for n in (10, 100):
+        bench_pdf(n)
+    for n in (1000, 10000):
+        bench_pdf_memory(n)
+    for days in (90, 365):
+        bench_export_memory(days=days)
+    for profile in ("safe", "fast"):
+        bench_load(profile)
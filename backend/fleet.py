@@ -0,0 +1,206 @@
+import argparse
+import calendar
+import os
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, ledger, migrations, models, rollups
+from app.database import make_async_engine, make_engine
+
+# -- Synthetic fleet --
+# Builds a payroll base that looks like a working season, the same one for the same seed:
+# every employee has a home boat and works most days on it, some days on another boat or as a half day,
+# some days absent (with or without an attendance row). Overtime comes now and then, often on another
+# boat. At every month end some employees get an adjustment (bonus, fuel...), fuel charged to the boat.
+#
+# Run from the backend folder to make a fixture: python fleet.py fleet.db --employees 300 --boats 10 --years 2
+
+BATCH_ROWS = 100_000 # Core inserts of plain dicts, large fleets (millions of rows) would take minutes through the ORM
+
+def month_ends(start, end):
+    day = date(start.year, start.month, calendar.monthrange(start.year, start.month)[1])
+    while day <= end:
+        yield day
+        following = day + timedelta(days=1)
+        day = date(following.year, following.month, calendar.monthrange(following.year, following.month)[1])
+
+def generate(db, employees=500, boats=10, days=31, start=date(2024, 1, 1), rng_seed=42):
+    """Fills an empty, migrated base with `employees` over `days` days from `start`, then builds the ledger and rollups."""
+    rng = random.Random(rng_seed)
+    end = start + timedelta(days=days - 1)
+
+    db.add_all([models.Boat(name=f"Boat {i}") for i in range(boats)])
+    db.add_all([
+        models.Employee(
+            name=f"Employee {i:05d}",
+            daily_wage=rng.choice([60.0, 70.0, 80.0, 90.0]),
+            overtime_rate=rng.choice([8.0, 10.0, 12.5]),
+            bank_daily_amount=rng.choice([0.0, 30.0, 40.0]),
+        )
+        for i in range(employees)
+    ])
+    db.commit()
+
+    rows, adjustments = [], []
+    for emp_id in range(1, employees + 1):
+        home = rng.randint(1, boats)
+        absence = rng.uniform(0.05, 0.2)
+        for d in range(days):
+            roll = rng.random()
+            if roll < absence:
+                if roll < absence / 3: # The day screen saved the employee as absent
+                    rows.append(dict(date=start + timedelta(days=d), employee_id=emp_id, boat_id=None,
+                                     overtime_boat_id=None, present=False, is_half_day=False, overtime_hours=0.0))
+                continue
+            boat_id = home if rng.random() < 0.85 else rng.randint(1, boats)
+            rows.append(dict(
+                date=start + timedelta(days=d), employee_id=emp_id,
+                boat_id=boat_id,
+                overtime_boat_id=boat_id if rng.random() < 0.7 else rng.randint(1, boats),
+                present=True, is_half_day=roll < absence + 0.1,
+                overtime_hours=rng.choice([0.0, 0.0, 0.0, 1.0, 2.0, 2.5]),
+            ))
+        for month_end in month_ends(start, end):
+            if rng.random() < 0.1:
+                reason = rng.choice(["Bonus", "Fuel", ""])
+                adjustments.append(dict(
+                    date=month_end, employee_id=emp_id, boat_id=home if reason == "Fuel" else None,
+                    amount=rng.choice([20.0, 50.0, 100.0]), reason=reason,
+                ))
+        if len(rows) >= BATCH_ROWS:
+            db.execute(insert(models.Attendance), rows)
+            rows = []
+    if rows:
+        db.execute(insert(models.Attendance), rows)
+    if adjustments:
+        db.execute(insert(models.Adjustment), adjustments)
+    ledger.rebuild(db)
+    rollups.rebuild(db)
+    db.commit()
+
+# -- Sessions on a fleet base (the tests and benchmark.py) --
+
+def make_session(path, profile="fast"):
+    engine = make_engine(f"sqlite:///{path}", profile=profile)
+    migrations.upgrade(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Points the routes of app.main at the base, returns the engine of the routes
+# and the async engine of the streamed exports
+def override_app_db(app, path, profile="fast"):
+    from app.main import get_async_db, get_db
+
+    engine = make_engine(f"sqlite:///{path}", profile=profile)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = make_async_engine(f"sqlite:///{path}", profile=profile)
+    AsyncSession = async_sessionmaker(autoflush=False, bind=async_engine)
+
+    def override_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_async_db():
+        async with AsyncSession() as session:
+            yield session
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_async_db] = override_async_db
+    return engine, async_engine
+
+# Statements run on the engines, set .count = 0 before the part to measure
+class StatementCounter:
+    def __init__(self, *engines):
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+# -- Reference results (the tests and benchmark.py) --
+# The payroll of the per-employee loop the grouped ledger query replaced, read from the attendance
+# and adjustments tables. Reports are compared after normalize_reasons (the order of the reasons is
+# not fixed) and to_cents where the floats are summed in another order.
+
+def legacy_calculate_payroll(db, start, end):
+    results = []
+    for emp in crud.get_employees(db):
+        records = db.query(models.Attendance).filter(
+            models.Attendance.employee_id == emp.id,
+            models.Attendance.date >= start,
+            models.Attendance.date <= end
+        ).all()
+
+        days_worked = sum_wage = sum_overtime = sum_overtime_hours = sum_extra = 0.0
+        reasons_list = []
+        for rec in records:
+            if rec.present or rec.is_half_day:
+                multiplier = 0.5 if rec.is_half_day else 1.0
+                days_worked += multiplier
+                sum_wage += (emp.daily_wage * multiplier)
+                sum_overtime += (rec.overtime_hours * emp.overtime_rate)
+                sum_overtime_hours += rec.overtime_hours
+        for adjustment in db.query(models.Adjustment).filter(
+            models.Adjustment.employee_id == emp.id,
+            models.Adjustment.date >= start,
+            models.Adjustment.date <= end
+        ):
+            if adjustment.amount > 0:
+                sum_extra += adjustment.amount
+                if adjustment.reason:
+                    reasons_list.append(adjustment.reason)
+
+        if days_worked == 0 and sum_extra == 0:
+            continue
+
+        grand_total = sum_wage + sum_overtime + sum_extra
+        final_bank, final_cash = crud.split_bank_cash(grand_total, days_worked, emp.bank_daily_amount)
+        results.append({
+            "employee_id": emp.id, "employee_name": emp.name,
+            "days_worked": days_worked, "total_wage": sum_wage,
+            "total_overtime_hours": sum_overtime_hours, "total_overtime": sum_overtime,
+            "total_extra": sum_extra, "extra_reasons": ", ".join(list(set(reasons_list))),
+            "grand_total": grand_total, "bank_pay": final_bank, "cash_pay": final_cash
+        })
+    return {"start_date": start, "end_date": end, "payments": results}
+
+def normalize_reasons(report):
+    for p in report["payments"]:
+        p["extra_reasons"] = ", ".join(sorted(filter(None, p["extra_reasons"].split(", "))))
+    return report
+
+def to_cents(value):
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {key: to_cents(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_cents(item) for item in value]
+    return value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds a synthetic payroll base")
+    parser.add_argument("path", help="the SQLite file to create")
+    parser.add_argument("--employees", type=int, default=300)
+    parser.add_argument("--boats", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2024, 1, 1))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+
+    engine, Session = make_session(args.path)
+    db = Session()
+    try:
+        generate(db, args.employees, args.boats, round(args.years * 365), args.start, args.seed)
+    finally:
+        db.close()
+        engine.dispose()
+    print(f"{args.path}: {args.employees} employees, {args.boats} boats, {round(args.years * 365)} days from {args.start}")
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import tempfile
+
+# Keep the suite away from the real payroll.db when app.main is imported
+os.environ.setdefault("PAYROLL_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'payroll_tests.db')}")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import fleet
+from fleet import StatementCounter, make_session, override_app_db
+from app import report_cache
+from app.main import app
+
+# The first run of a checkout has no stored benchmarks to compare with (see pytest.ini), it only stores its own
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    session = getattr(config, "_benchmarksession", None)
+    if session is not None and session.compare and not session.storage.query():
+        session.compare_fail = []
+
+# -- Fixtures: a generated fleet base --
+# Run from the backend folder: python -m pytest -q
+# A test picks the size of its fleet (fleet.generate arguments) with
+# @pytest.mark.parametrize("fleet_engine", [{"employees": 200}], indirect=True)
+
+@pytest.fixture
+def fleet_engine(request, tmp_path):
+    engine, Session = make_session(str(tmp_path / "fleet.db"))
+    db = Session()
+    fleet.generate(db, **getattr(request, "param", {}))
+    db.close()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(fleet_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=fleet_engine)()
+    yield session
+    session.close()
+
+# -- Fixtures: the app on the fleet base and the statements it runs --
+
+# (engine, async engine) the routes use, the sync routes and the streamed exports
+@pytest.fixture
+def app_engines(fleet_engine):
+    app_engine, async_engine = override_app_db(app, fleet_engine.url.database)
+    yield app_engine, async_engine
+    app.dependency_overrides.clear()
+    asyncio.run(async_engine.dispose())
+    app_engine.dispose()
+
+@pytest.fixture
+def client(app_engines):
+    with TestClient(app) as test_client:
+        yield test_client
+
+# Counts the statements of both engines of the routes, set .count = 0 before the request to measure
+@pytest.fixture
+def statement_counter(app_engines):
+    app_engine, async_engine = app_engines
+    return StatementCounter(app_engine, async_engine.sync_engine)
+
+# Every test starts on its own base with the same data versions, so the reports cached by another test would match
+@pytest.fixture(autouse=True)
+def empty_report_cache():
+    report_cache.clear()
@@ -0,0 +1,63 @@
+import pytest
+
+# -- POST /attendance/bulk: partial updates, duplicates and the order of the saved rows --
+# A field left out of a row (or sent as null) keeps the stored value, a new row gets the defaults.
+
+DAY = "2024-03-01" # After the 31 generated days, so the rows of the day start empty
+
+def saved(response):
+    return [
+        {key: row[key] for key in ("employee_id", "date", "boat_id", "overtime_boat_id", "present", "is_half_day", "overtime_hours")}
+        for row in response.json()
+    ]
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_omitted_fields_keep_the_stored_values(client):
+    client.post("/attendance/bulk", json=[
+        {"date": DAY, "employee_id": 1, "boat_id": 1, "overtime_boat_id": 2, "present": True, "overtime_hours": 2.0},
+        {"date": DAY, "employee_id": 2, "boat_id": 3, "present": True, "is_half_day": True},
+    ]).raise_for_status()
+
+    # Each row sends other fields, so they are written by separate statements
+    response = client.post("/attendance/bulk", json=[
+        {"date": DAY, "employee_id": 1, "overtime_hours": 3.5},
+        {"date": DAY, "employee_id": 2, "boat_id": 4, "is_half_day": None},
+        {"date": DAY, "employee_id": 3},
+    ])
+    response.raise_for_status()
+
+    expected = [
+        {"employee_id": 1, "date": DAY, "boat_id": 1, "overtime_boat_id": 2, "present": True, "is_half_day": False, "overtime_hours": 3.5},
+        {"employee_id": 2, "date": DAY, "boat_id": 4, "overtime_boat_id": None, "present": True, "is_half_day": True, "overtime_hours": 0.0},
+        {"employee_id": 3, "date": DAY, "boat_id": None, "overtime_boat_id": None, "present": False, "is_half_day": False, "overtime_hours": 0.0},
+    ]
+    assert saved(response) == expected
+    stored = {row["employee_id"]: row for row in saved(client.get(f"/attendance/{DAY}"))}
+    assert [stored[row["employee_id"]] for row in expected] == expected
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_duplicate_employee_and_date_is_rejected(client):
+    before = client.get(f"/attendance/{DAY}").json()
+
+    response = client.post("/attendance/bulk", json=[
+        {"date": DAY, "employee_id": 5, "present": True},
+        {"date": "2024-01-22", "employee_id": 5, "present": True},
+        {"date": DAY, "employee_id": 5, "present": False},
+    ])
+
+    assert response.status_code == 400
+    assert client.get(f"/attendance/{DAY}").json() == before
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_saved_rows_follow_the_request_order(client):
+    # Not sorted by employee or date, and mixing new and existing rows of different field sets
+    keys = [(7, "2024-01-23"), (2, "2024-02-10"), (7, "2024-01-22"), (15, "2024-01-23"), (1, "2024-02-11"), (4, "2024-01-05")]
+    records = [
+        {"date": day, "employee_id": employee_id, **({"present": True} if index % 2 else {"overtime_hours": 1.0})}
+        for index, (employee_id, day) in enumerate(keys)
+    ]
+
+    response = client.post("/attendance/bulk", json=records)
+    response.raise_for_status()
+
+    assert [(row["employee_id"], row["date"]) for row in response.json()] == keys
@@ -0,0 +1,68 @@
+import pytest
+
+from app import jobs
+
+# -- Closed payroll periods: writes inside get 409, the reports of the period are the stored ones --
+# After the close, a wage change moves the live payroll but not the period: /payroll/, the CSV export,
+# its period in /payroll/batch and the PDF of /payroll/pdf and /jobs/payroll-pdf stay as they were.
+# Reopening lets the writes in again and the reports follow the data.
+
+PERIOD = {"start": "2024-01-01", "end": "2024-01-31"}
+OPEN_RANGE = {"start": "2024-01-01", "end": "2024-01-30"} # Not the closed period, computed from the data
+
+@pytest.fixture(autouse=True)
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+
+def reports(client):
+    """The payroll of the period as served by every route that reads it."""
+    batch = client.post("/payroll/batch", json={"periods": [PERIOD, {"start": "2024-02-01", "end": "2024-02-29"}]})
+    return {
+        "payroll": client.get("/payroll/", params=PERIOD).json()["payments"],
+        "csv": client.get("/payroll/export.csv", params=PERIOD).text,
+        "batch": batch.json()["periods"][0]["payments"],
+        "pdf": client.get("/payroll/pdf", params=PERIOD).content,
+    }
+
+# The job of a closed period copies the stored PDF at once, an open one would be rendered in the worker pool
+def job_pdf(client):
+    job = client.post("/jobs/payroll-pdf", params=PERIOD).json()
+    assert job["status"] == "done"
+    return client.get(f"/jobs/{job['id']}/download").content
+
+def raise_wage(client, employee_id):
+    employee = next(emp for emp in client.get("/employees/").json() if emp["id"] == employee_id)
+    client.put(f"/employees/{employee_id}", json={**employee, "daily_wage": employee["daily_wage"] + 10}).raise_for_status()
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_closed_period(client):
+    closed = client.post("/payroll/periods", params=PERIOD)
+    assert closed.status_code == 201
+    stored = reports(client)
+    assert job_pdf(client) == stored["pdf"]
+    attendance = client.get("/attendance/2024-01-15").json()
+
+    writes = [
+        client.post("/attendance/", json={"date": "2024-01-15", "employee_id": 1, "present": False}),
+        client.post("/attendance/bulk", json=[{"date": "2024-01-15", "employee_id": 2, "present": False}]),
+        client.post("/adjustments/", json={"employee_id": 1, "date": "2024-01-31", "amount": 40.0, "reason": "Fuel"}),
+    ]
+    assert [response.status_code for response in writes] == [409, 409, 409]
+    assert client.get("/attendance/2024-01-15").json() == attendance
+
+    live = client.get("/payroll/", params=OPEN_RANGE).json()["payments"]
+    raise_wage(client, 1)
+    assert client.get("/payroll/", params=OPEN_RANGE).json()["payments"] != live
+    assert reports(client) == stored
+    assert job_pdf(client) == stored["pdf"]
+
+    reopened = client.delete(f"/payroll/periods/{closed.json()['id']}")
+    assert reopened.status_code == 200
+    assert client.delete(f"/payroll/periods/{closed.json()['id']}").status_code == 404
+
+    client.post("/attendance/", json={"date": "2024-01-15", "employee_id": 1, "present": False}).raise_for_status()
+    current = reports(client)
+    assert current["payroll"] != stored["payroll"]
+    assert current["csv"] != stored["csv"]
+    assert current["batch"] == current["payroll"]
+    assert current["pdf"] != stored["pdf"]
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import text
+
+# -- Conditional GET: 304 after one versions read while the tables are unchanged, gzip above the threshold --
+# On the default fleet of fleet.generate (500 employees, one month).
+
+MONTH = {"start": "2024-01-01", "end": "2024-01-31"}
+
+ROUTES = {
+    "GET /employees/": ("/employees/", None),
+    "GET /boats/": ("/boats/", None),
+    "GET /payroll/": ("/payroll/", MONTH),
+    "GET /expenses/": ("/expenses/", MONTH),
+    "GET /attendance/matrix": ("/attendance/matrix", MONTH),
+    "GET /boats/{id}/analysis/pdf": ("/boats/2/analysis/pdf", MONTH),
+}
+
+# Which of the routes above a write makes stale
+WRITES = {
+    "PUT /boats/{id}": (("PUT", "/boats/1", {"name": "Boat renamed"}), {"GET /boats/", "GET /expenses/", "GET /boats/{id}/analysis/pdf"}),
+    "POST /attendance/": (("POST", "/attendance/", {"date": "2024-01-20", "employee_id": 1, "present": True}),
+                          {"GET /payroll/", "GET /expenses/", "GET /attendance/matrix", "GET /boats/{id}/analysis/pdf"}),
+}
+
+def current_tags(client):
+    tags = {}
+    for name, (url, params) in ROUTES.items():
+        response = client.get(url, params=params)
+        response.raise_for_status()
+        tags[name] = response.headers["ETag"]
+    return tags
+
+@pytest.mark.parametrize("name", ROUTES)
+def test_not_modified_reads_only_the_versions(client, statement_counter, name):
+    url, params = ROUTES[name]
+    tag = client.get(url, params=params).headers["ETag"]
+
+    statement_counter.count = 0
+    response = client.get(url, params=params, headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    assert statement_counter.count == 1
+
+def test_large_json_is_gzipped_and_pdfs_are_not(client):
+    response = client.get("/payroll/", params=MONTH)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"].endswith('-gzip"')
+    assert client.get("/payroll/", params=MONTH, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    identity = client.get("/payroll/", params=MONTH, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert len(identity.content) > int(response.headers["Content-Length"])
+
+    pdf = client.get("/boats/2/analysis/pdf", params=MONTH)
+    assert "Content-Encoding" not in pdf.headers
+
+@pytest.mark.parametrize("write", WRITES)
+def test_write_changes_the_tags_of_the_routes_reading_its_tables(client, write):
+    (method, url, body), stale = WRITES[write]
+    tags = current_tags(client)
+    client.request(method, url, json=body).raise_for_status()
+
+    for name, (route_url, params) in ROUTES.items():
+        response = client.get(route_url, params=params, headers={"If-None-Match": tags[name]})
+        assert response.status_code == (200 if name in stale else 304), f"{name} after {write}"
+
+# A write of another worker: no invalidate() in this process, only the versions in the base move
+def test_write_of_another_worker(fleet_engine, client):
+    tag = client.get("/boats/").headers["ETag"]
+    client.get("/boats/2/analysis", params=MONTH).raise_for_status() # Cached
+    with fleet_engine.begin() as connection:
+        connection.execute(text("UPDATE boats SET name = 'Renamed elsewhere' WHERE id = 2"))
+        connection.execute(text("UPDATE data_versions SET version = version + 1 WHERE table_name = 'boats'"))
+
+    assert client.get("/boats/2/analysis", params=MONTH).json()["boat_name"] == "Renamed elsewhere"
+    assert client.get("/boats/", headers={"If-None-Match": tag}).status_code == 200
@@ -0,0 +1,30 @@
+import re
+
+import pytest
+
+from app import metrics
+
+# -- Request metrics: the rows a route reads reach its counter in /metrics --
+
+def sql_rows(client, method, route):
+    body = client.get("/metrics").text
+    match = re.search(rf'^payroll_http_request_sql_rows_total\{{method="{method}",route="{re.escape(route)}"\}} (\d+)$', body, re.M)
+    return int(match.group(1))
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_rows_of_a_list_route(client):
+    metrics.reset()
+    employees = client.get("/employees/").json()
+    boats = client.get("/boats/").json()
+    expenses = client.get("/expenses/", params={"start": "2024-01-01", "end": "2024-01-31"}).json()["results"]
+
+    # The list itself, the data versions row and the count of the page
+    assert len(employees) <= sql_rows(client, "GET", "/employees/") <= len(employees) + 5
+    assert len(boats) <= sql_rows(client, "GET", "/boats/") <= len(boats) + 5
+    assert len(expenses) <= sql_rows(client, "GET", "/expenses/") <= len(expenses) + 5
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}], indirect=True)
+def test_rows_of_a_write(client):
+    metrics.reset()
+    client.post("/boats/", json={"name": "New boat"}).raise_for_status()
+    assert sql_rows(client, "POST", "/boats/") >= 1
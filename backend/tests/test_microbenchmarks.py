@@ -0,0 +1,85 @@
+import itertools
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import fleet
+from fleet import make_session
+from app import crud, pdf_utils, schemas
+
+# -- Microbenchmarks: the crud reports, the attendance save and the PDFs at several fleet sizes --
+# pytest-benchmark times every case, the fleet size is the benchmark group. pytest.ini stores every run
+# under .benchmarks/ and fails when a case is more than twice as slow as in the last stored run.
+# From the backend folder:
+#
+# python -m pytest tests/test_microbenchmarks.py --benchmark-compare-fail=min:25%
+#     a tighter threshold, on a quiet machine
+# python -m pytest --benchmark-skip
+#     the rest of the suite without the microbenchmarks
+#
+# PAYROLL_BENCH_SIZES   fleet sizes to run, default "small,medium" (see FLEET_SIZES)
+
+FLEET_SIZES = {
+    "small": {"employees": 50, "boats": 5, "days": 90},
+    "medium": {"employees": 300, "boats": 10, "days": 365},
+    "large": {"employees": 1000, "boats": 20, "days": 730},
+}
+MICRO_SIZES = os.getenv("PAYROLL_BENCH_SIZES", "small,medium").split(",")
+
+MONTH = (date(2024, 3, 1), date(2024, 3, 31))
+YEAR = (date(2024, 1, 1), date(2024, 12, 31))
+SAVE_DAYS = itertools.cycle(range(28))
+
+# One fleet per size for the whole module, the cases only read it (the attendance save rewrites the same days)
+@pytest.fixture(scope="module", params=MICRO_SIZES)
+def micro_db(request, tmp_path_factory):
+    engine, Session = make_session(str(tmp_path_factory.mktemp(request.param) / "micro.db"))
+    db = Session()
+    fleet.generate(db, **FLEET_SIZES[request.param])
+    yield request.param, db
+    db.close()
+    engine.dispose()
+
+# The reports the PDF cases render
+@pytest.fixture(scope="module")
+def month_reports(micro_db):
+    _, db = micro_db
+    return {
+        "payroll": crud.calculate_payroll.__wrapped__(db, *MONTH),
+        "analysis": crud.get_boat_analysis.__wrapped__(db, 1, *MONTH),
+        "short": crud.get_short_boat_analysis_data.__wrapped__(db, 1, *MONTH),
+    }
+
+def save_attendance(db):
+    crud.create_attendance(db, schemas.AttendanceCreate(
+        date=MONTH[0] + timedelta(days=next(SAVE_DAYS)), employee_id=1, boat_id=1, present=True, overtime_hours=1.0))
+
+# Reports go through __wrapped__, past the report cache, so every round computes
+CRUD_CASES = {
+    "calculate_payroll(month)": lambda db: crud.calculate_payroll.__wrapped__(db, *MONTH),
+    "calculate_payroll(year)": lambda db: crud.calculate_payroll.__wrapped__(db, *YEAR),
+    "get_expenses_report(month)": lambda db: crud.get_expenses_report.__wrapped__(db, *MONTH),
+    "get_boat_analysis(month)": lambda db: crud.get_boat_analysis.__wrapped__(db, 1, *MONTH),
+    "get_short_boat_analysis_data(month)": lambda db: crud.get_short_boat_analysis_data.__wrapped__(db, 1, *MONTH),
+    "create_attendance": save_attendance,
+}
+
+PDF_CASES = {
+    "generate_payroll_pdf(month)": (pdf_utils.generate_payroll_pdf, "payroll"),
+    "generate_boat_analysis_pdf(month)": (pdf_utils.generate_boat_analysis_pdf, "analysis"),
+    "generate_short_boat_analysis_pdf(month)": (pdf_utils.generate_short_boat_analysis_pdf, "short"),
+}
+
+@pytest.mark.parametrize("case", CRUD_CASES)
+def test_crud(benchmark, micro_db, case):
+    size, db = micro_db
+    benchmark.group = size
+    benchmark(CRUD_CASES[case], db)
+
+@pytest.mark.parametrize("case", PDF_CASES)
+def test_pdf(benchmark, micro_db, month_reports, case):
+    size, _ = micro_db
+    generate, report = PDF_CASES[case]
+    benchmark.group = size
+    benchmark(pdf_utils.render_bytes, generate, month_reports[report])
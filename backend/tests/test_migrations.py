@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from fleet import legacy_calculate_payroll, normalize_reasons
+from app import crud, migrations, schemas
+from app.database import make_engine
+
+# -- Migrations --
+
+def test_workers_upgrading_a_fresh_base_together(tmp_path):
+    path = tmp_path / "fresh.db"
+    engines = [make_engine(f"sqlite:///{path}") for _ in range(4)]
+    start = threading.Barrier(len(engines))
+    results, errors = [], []
+
+    def worker(engine):
+        start.wait()
+        try:
+            results.append(migrations.upgrade(engine))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for engine in engines:
+        engine.dispose()
+
+    assert not errors
+    assert results == [migrations.LATEST_VERSION] * len(engines)
+    with sqlite3.connect(path) as conn:
+        applied = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert applied == [number for number, _, _ in migrations.MIGRATIONS]
+
+def test_old_sqlite_is_refused(monkeypatch):
+    monkeypatch.setattr(migrations.sqlite3, "sqlite_version_info", (3, 34, 1))
+    with pytest.raises(migrations.MigrationError):
+        migrations.check_sqlite()
+
+# -- Step 9: the extras of the attendance rows become adjustments --
+# A base stopped before step 9 gets extras the old way, on attendance rows (the ones with only an
+# extra were dated at the end of the payroll period), then is upgraded to the latest version.
+
+LEGACY_ATTENDANCE = [
+    # id, date, employee_id, boat_id, overtime_boat_id, present, is_half_day, overtime_hours, extra_amount, extra_reason
+    (1, "2024-01-02", 1, 1, 2, 1, 0, 2.0, 0.0, None),
+    (2, "2024-01-31", 1, 1, None, 0, 0, 0.0, 50.0, "Bonus"),  # Only an extra, the row goes
+    (3, "2024-01-03", 2, 2, None, 1, 1, 0.0, 20.0, "Fuel"),
+    (4, "2024-01-04", 2, 2, 2, 1, 0, 1.0, -15.0, "Advance"),  # A deduction
+    (5, "2024-01-05", 2, 2, None, 0, 0, 0.0, 0.0, ""),
+]
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = tmp_path / "legacy.db"
+    engine = make_engine(f"sqlite:///{path}")
+    assert migrations.upgrade(engine, target=8) == 8
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO boats (id, name) VALUES (1, 'Boat 1'), (2, 'Boat 2')")
+        conn.execute(
+            "INSERT INTO employees (id, name, daily_wage, overtime_rate, bank_daily_amount)"
+            " VALUES (1, 'Employee 1', 80, 10, 30), (2, 'Employee 2', 60, 8, 0)"
+        )
+        conn.executemany(
+            "INSERT INTO attendance (id, date, employee_id, boat_id, overtime_boat_id, present, is_half_day,"
+            " overtime_hours, extra_amount, extra_reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            LEGACY_ATTENDANCE,
+        )
+    conn.close()
+
+    assert migrations.upgrade(engine) == migrations.LATEST_VERSION
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+def test_legacy_extras_become_adjustments(legacy_db):
+    adjustments = legacy_db.execute(text("SELECT employee_id, date, boat_id, amount, reason FROM adjustments ORDER BY id"))
+    assert [tuple(row) for row in adjustments] == [
+        (2, "2024-01-03", 2, 20.0, "Fuel"),
+        (2, "2024-01-04", 2, -15.0, "Advance"),
+        (1, "2024-01-31", 1, 50.0, "Bonus"),
+    ]
+    assert legacy_db.execute(text("SELECT id FROM attendance ORDER BY id")).scalars().all() == [1, 3, 4, 5]
+    columns = {row.name for row in legacy_db.execute(text("PRAGMA table_info(attendance)"))}
+    assert columns.isdisjoint({"extra_amount", "extra_reason"})
+
+def test_legacy_extras_keep_the_payroll(legacy_db):
+    start, end = date(2024, 1, 1), date(2024, 1, 31)
+    report = normalize_reasons(crud.calculate_payroll(legacy_db, start, end))
+
+    assert report == normalize_reasons(legacy_calculate_payroll(legacy_db, start, end))
+    # 80 + 2h x 10 + 50 (cash 120 rounded down to 100) | 0.5 + 1 days x 60 + 1h x 8 + 20, the deduction is no extra
+    assert [(p["employee_name"], p["days_worked"], p["grand_total"], p["bank_pay"], p["cash_pay"], p["extra_reasons"])
+            for p in report["payments"]] == [
+        ("Employee 1", 1.0, 150.0, 50.0, 100.0, "Bonus"),
+        ("Employee 2", 1.5, 118.0, 0.0, 118.0, "Fuel"),
+    ]
+
+def test_same_day_adjustments_are_summed(legacy_db):
+    crud.create_adjustment(legacy_db, schemas.AdjustmentCreate(
+        employee_id=2, date=date(2024, 1, 3), amount=10.0, reason="Ice", boat_id=2,
+    ))
+    start, end = date(2024, 1, 1), date(2024, 1, 31)
+
+    # One line per employee and day, the half day wage (30) and both adjustments (20 + 10)
+    analysis = crud.get_boat_analysis(legacy_db, 2, start, end)
+    assert [(item["date"], item["daily_cost"], item["overtime_cost"]) for item in analysis["analysis_data"]] == [
+        (date(2024, 1, 2), 0.0, 20.0), # The overtime of Employee 1 is on this boat
+        (date(2024, 1, 3), 60.0, 0.0),
+        (date(2024, 1, 4), 45.0, 8.0), # 60 - 15
+    ]
+    # The deprecated fields of the attendance row report the sum and the reasons of the day
+    row = next(row for row in crud.get_attendance_by_date(legacy_db, date(2024, 1, 3)) if row.employee_id == 2)
+    assert (row.extra_amount, row.extra_reason) == (30.0, "Fuel, Ice")
+    assert crud.calculate_payroll(legacy_db, start, end)["payments"][1]["total_extra"] == 30.0
@@ -0,0 +1,84 @@
+from datetime import date
+
+import pytest
+
+from fleet import legacy_calculate_payroll, make_session, normalize_reasons, to_cents
+from app import crud, schemas
+
+# -- Payroll parity: the grouped ledger query against the per-employee loop it replaced --
+# fleet.legacy_calculate_payroll reads the attendance and adjustments tables directly,
+# the reports read the daily cost ledger. Both must give the same lines to the cent.
+
+START, END = date(2024, 1, 1), date(2024, 1, 31)
+
+def test_payroll_matches_the_legacy_loop(db):
+    expected = normalize_reasons(legacy_calculate_payroll(db, START, END))
+
+    assert expected["payments"]
+    assert normalize_reasons(crud.calculate_payroll(db, START, END)) == expected
+    streamed = crud.stream_payroll(db, START, END)
+    assert normalize_reasons({**streamed, "payments": list(streamed["payments"])}) == expected
+
+def test_payroll_batch_matches_the_legacy_loop_per_period(db):
+    periods = crud.split_periods(START, END, "week")
+    batch = crud.calculate_payroll_batch(db, periods)
+
+    for (first, last), period in zip(periods, batch["periods"]):
+        expected = normalize_reasons(legacy_calculate_payroll(db, first, last))
+        assert to_cents(normalize_reasons(period)["payments"]) == to_cents(expected["payments"])
+
+# -- Edge cases of the 50€ split, half days and overtime --
+# name: (daily_wage, overtime_rate, bank_daily_amount), attendance [(day, present, is_half_day, overtime_hours)],
+# adjustments [(day, amount, reason)], expected (days_worked, grand_total, bank_pay, cash_pay) or None for no line
+
+EDGE_CASES = {
+    # 1 + 0.5 + 0.5 days, the overtime of the half day is paid, the one of the absent day is not.
+    # Cash 120 is rounded down to 100, the 20 go to the bank
+    "half days": ((75.0, 10.0, 40.0), [(1, True, False, 3.0), (2, True, True, 2.0), (3, False, True, 0.0), (4, False, False, 2.0)],
+                  [], (2.0, 200.0, 100.0, 100.0)),
+    "no bank amount": ((80.0, 10.0, 0.0), [(1, True, False, 0.0), (2, True, True, 0.0)], [], (1.5, 120.0, 0.0, 120.0)),
+    "bank above the total": ((60.0, 10.0, 100.0), [(1, True, False, 0.0), (2, True, False, 0.0)], [], (2.0, 120.0, 120.0, 0.0)),
+    "extras only": ((70.0, 10.0, 30.0), [], [(10, 70.0, "Bonus")], (0.0, 70.0, 0.0, 70.0)),
+    # The deduction is not an extra, the payroll only adds the positive adjustments
+    "extra and deduction": ((90.0, 12.0, 30.0), [(5, False, True, 0.0)], [(5, 20.0, "Fuel"), (6, -15.0, "Advance")],
+                            (0.5, 65.0, 15.0, 50.0)),
+    # The bank part (5) is below the 45 the rounding would move, the cash is left as it is
+    "bank below the remainder": ((100.0, 10.0, 10.0), [(7, True, True, 0.0)], [], (0.5, 50.0, 5.0, 45.0)),
+    "unpaid overtime only": ((75.0, 10.0, 40.0), [(8, False, False, 4.0)], [], None),
+}
+
+@pytest.fixture
+def edge_db(tmp_path):
+    engine, Session = make_session(str(tmp_path / "edge.db"))
+    db = Session()
+    boat = crud.create_boat(db, schemas.BoatCreate(name="Boat"))
+
+    for name, ((daily_wage, overtime_rate, bank_daily_amount), attendance, adjustments, _) in EDGE_CASES.items():
+        employee = crud.create_employee(db, schemas.EmployeeCreate(
+            name=name, daily_wage=daily_wage, overtime_rate=overtime_rate, bank_daily_amount=bank_daily_amount,
+        ))
+        if attendance:
+            crud.bulk_upsert_attendance(db, [
+                schemas.AttendanceCreate(
+                    date=date(2024, 1, day), employee_id=employee.id, boat_id=boat.id, overtime_boat_id=boat.id,
+                    present=present, is_half_day=is_half_day, overtime_hours=overtime_hours,
+                )
+                for day, present, is_half_day, overtime_hours in attendance
+            ])
+        for day, amount, reason in adjustments:
+            crud.create_adjustment(db, schemas.AdjustmentCreate(
+                employee_id=employee.id, date=date(2024, 1, day), amount=amount, reason=reason, boat_id=boat.id,
+            ))
+    yield db
+    db.close()
+    engine.dispose()
+
+def test_edge_cases_match_the_legacy_loop(edge_db):
+    report = normalize_reasons(crud.calculate_payroll(edge_db, START, END))
+
+    assert report == normalize_reasons(legacy_calculate_payroll(edge_db, START, END))
+    lines = {
+        p["employee_name"]: (p["days_worked"], p["grand_total"], p["bank_pay"], p["cash_pay"])
+        for p in report["payments"]
+    }
+    assert lines == {name: case[3] for name, case in EDGE_CASES.items() if case[3] is not None}
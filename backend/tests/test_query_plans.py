@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+
+# -- Query plans: every attendance / ledger lookup must go through an index --
+# Runs EXPLAIN QUERY PLAN on the SELECTs each crud function issues on a 200 employee fleet.
+
+FULL_SCANS = tuple(
+    f"SCAN {prefix}{table}" for table in ("attendance", "daily_cost_ledger") for prefix in ("", "TABLE ")
+)
+
+START, END = date(2024, 1, 1), date(2024, 1, 31)
+
+QUERIES = {
+    "calculate_payroll": lambda db: crud.calculate_payroll(db, START, END),
+    "calculate_payroll_batch": lambda db: crud.calculate_payroll_batch(db, crud.split_periods(START, END, "week")),
+    "get_boat_analysis": lambda db: crud.get_boat_analysis(db, 3, START, END),
+    "get_short_boat_analysis_data": lambda db: crud.get_short_boat_analysis_data(db, 3, START, END),
+    "get_expenses_report": lambda db: crud.get_expenses_report(db, START, END),
+    "get_expenses_report(boat)": lambda db: crud.get_expenses_report(db, START, END, boat_id=3),
+    "get_expenses_report(employee)": lambda db: crud.get_expenses_report(db, START, END, emp_id=5),
+    "get_attendance_by_date": lambda db: crud.get_attendance_by_date(db, START),
+    "get_attendance_matrix": lambda db: crud.get_attendance_matrix(db, START, END),
+    "create_attendance": lambda db: crud.create_attendance(db, schemas.AttendanceCreate(date=START, employee_id=3)),
+    "list_adjustments": lambda db: crud.list_adjustments(db, START, END, employee_id=5),
+    "create_adjustment": lambda db: crud.create_adjustment(
+        db, schemas.AdjustmentCreate(employee_id=5, date=END, amount=30.0, reason="Bonus")),
+    "get_boat_analysis_pack": lambda db: crud.get_boat_analysis_pack(db, START, END),
+    "get_short_boat_analysis_pack": lambda db: crud.get_short_boat_analysis_pack(db, START, END),
+    "get_boat_analytics": lambda db: crud.get_boat_analytics(db, date(2024, 1, 10), date(2024, 3, 20)),
+    "get_boat_analytics(employee)": lambda db: crud.get_boat_analytics(db, START, date(2024, 3, 20), employee_id=5),
+    "get_employee_analytics": lambda db: crud.get_employee_analytics(db, date(2024, 1, 10), date(2024, 3, 20), by_month=True),
+    "get_employee_analytics(boat)": lambda db: crud.get_employee_analytics(db, START, date(2024, 3, 20), boat_id=3),
+}
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 200}], indirect=True)
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_indexes(fleet_engine, db, name):
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(fleet_engine, "before_cursor_execute", capture)
+    try:
+        QUERIES[name](db)
+    finally:
+        event.remove(fleet_engine, "before_cursor_execute", capture)
+
+    assert statements, f"{name} ran no SELECT"
+    with fleet_engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+            assert not any(step.startswith(FULL_SCANS) for step in plan), f"full scan in {name}: {plan}"
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import text
+
+from app import report_cache
+
+# -- Statement counts: every endpoint runs a fixed number of statements, whatever the row count --
+# The GET routes with an ETag read the data versions first, one statement the report cache reuses.
+# The same requests run on a 20 and a 200 employee fleet and must both match the count below.
+
+EXPECTED_STATEMENTS = {
+    "GET /employees/": 3,                     # versions (ETag), count + page
+    "GET /boats/": 3,
+    "GET /attendance/{date}": 2,
+    "GET /attendance/matrix": 2,              # one range query on the date index
+    "GET /payroll/": 3,                       # closed period lookup + grouped ledger rows
+    "GET /payroll/pdf": 3,
+    "POST /payroll/batch": 2,                 # every week of the month in one grouped query + closed periods
+    "GET /expenses/": 2,
+    "GET /expenses/?boat_id": 2,
+    "GET /boats/{id}/analysis": 3,            # boat + grouped ledger rows
+    "GET /boats/{id}/analysis/pdf": 3,
+    "GET /boats/{id}/short-analysis/pdf": 3,
+    "GET /boats/analysis/pack": 3,            # boats + grouped ledger rows of every boat
+    "GET /analytics/boats": 2,                # rollup months + ledger edges in one union
+    "GET /analytics/employees?boat_id": 2,
+    "POST /payroll/periods": 6,               # versions (cache), versions, payroll, insert, overlap check, versions again
+    "GET /payroll/ (closed)": 2,              # the stored report
+    "GET /payroll/pdf (closed)": 2,
+    "POST /attendance/": 12,
+    "POST /attendance/bulk": 12,              # upsert, closed check, ledger delete + insert, 6 rollup refreshes, version, saved rows
+    "GET /adjustments/": 2,
+    "POST /adjustments/": 12,                 # insert, closed check, ledger delete + insert, 6 rollup refreshes, version, reload
+    "PUT /employees/{id}": 13,
+    "DELETE /employees/{id}": 14,             # the adjustments of the employee go too
+    "DELETE /boats/{id}": 6,
+}
+
+RANGE = {"start": "2024-01-01", "end": "2024-01-31"}
+
+# In this order, the writes at the end change the rows the reads above them count on
+REQUESTS = {
+    "GET /employees/": ("GET", "/employees/", None, None),
+    "GET /boats/": ("GET", "/boats/", None, None),
+    "GET /attendance/{date}": ("GET", "/attendance/2024-01-15", None, None),
+    "GET /attendance/matrix": ("GET", "/attendance/matrix", RANGE, None),
+    "GET /payroll/": ("GET", "/payroll/", RANGE, None),
+    "GET /payroll/pdf": ("GET", "/payroll/pdf", RANGE, None),
+    "POST /payroll/batch": ("POST", "/payroll/batch", None, {**RANGE, "period": "week"}),
+    "GET /expenses/": ("GET", "/expenses/", RANGE, None),
+    "GET /expenses/?boat_id": ("GET", "/expenses/", {**RANGE, "boat_id": 2}, None),
+    "GET /boats/{id}/analysis": ("GET", "/boats/2/analysis", RANGE, None),
+    "GET /boats/{id}/analysis/pdf": ("GET", "/boats/2/analysis/pdf", RANGE, None),
+    "GET /boats/{id}/short-analysis/pdf": ("GET", "/boats/2/short-analysis/pdf", RANGE, None),
+    "GET /boats/analysis/pack": ("GET", "/boats/analysis/pack", RANGE, None),
+    "GET /analytics/boats": ("GET", "/analytics/boats", {"start": "2024-01-10", "end": "2024-03-20"}, None),
+    "GET /analytics/employees?boat_id": ("GET", "/analytics/employees",
+                                         {"start": "2024-01-10", "end": "2024-03-20", "boat_id": 2, "by": "month"}, None),
+    "POST /payroll/periods": ("POST", "/payroll/periods", {"start": "2023-12-01", "end": "2023-12-31"}, None),
+    "GET /payroll/ (closed)": ("GET", "/payroll/", {"start": "2023-12-01", "end": "2023-12-31"}, None),
+    "GET /payroll/pdf (closed)": ("GET", "/payroll/pdf", {"start": "2023-12-01", "end": "2023-12-31"}, None),
+    "POST /attendance/": ("POST", "/attendance/", None, {"date": "2024-01-20", "employee_id": 1, "present": True}),
+    "GET /adjustments/": ("GET", "/adjustments/", RANGE, None),
+    "POST /adjustments/": ("POST", "/adjustments/", None,
+                           {"employee_id": 1, "date": "2024-01-31", "amount": 40.0, "reason": "Fuel"}),
+    "POST /attendance/bulk": ("POST", "/attendance/bulk", None, None), # A day of every employee, see below
+    "PUT /employees/{id}": ("PUT", "/employees/1", None, {
+        "name": "Employee 00000", "daily_wage": 75.0, "overtime_rate": 10.0, "bank_daily_amount": 30.0}),
+    "DELETE /employees/{id}": ("DELETE", "/employees/2", None, None),
+    "DELETE /boats/{id}": ("DELETE", "/boats/3", None, None),
+}
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 20}, {"employees": 200}], indirect=True, ids=["20", "200"])
+def test_statement_counts(fleet_engine, client, statement_counter):
+    with fleet_engine.connect() as conn:
+        employee_ids = conn.execute(text("SELECT id FROM employees ORDER BY id")).scalars().all()
+    day = [{"date": "2024-01-21", "employee_id": emp_id, "boat_id": 1, "present": True} for emp_id in employee_ids]
+
+    counts = {}
+    for name, (method, url, params, body) in REQUESTS.items():
+        report_cache.clear()
+        statement_counter.count = 0
+        client.request(method, url, params=params, json=day if name == "POST /attendance/bulk" else body).raise_for_status()
+        counts[name] = statement_counter.count
+
+    changed = {name: (count, EXPECTED_STATEMENTS[name]) for name, count in counts.items() if count != EXPECTED_STATEMENTS[name]}
+    assert not changed, f"statement count (ran, expected) changed: {changed}"
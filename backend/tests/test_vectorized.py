@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+
+from fleet import normalize_reasons
+from app import crud, report_cache, vectorized
+
+# -- Vectorized reports: PAYROLL_COMPUTE=numpy against the default SQL path --
+# Both run on the same generated fleet with the report cache off, so each call computes.
+# Setting vectorized.ENABLED is what PAYROLL_COMPUTE=numpy does at import. The results must be
+# equal, float for float (only the order of the extra reasons is free).
+
+pytestmark = pytest.mark.skipif(not vectorized.AVAILABLE, reason="numpy is not installed")
+
+START, END = date(2024, 1, 1), date(2024, 3, 31)
+
+REPORTS = {
+    "calculate_payroll": lambda db: normalize_reasons(crud.calculate_payroll(db, START, END)),
+    "calculate_payroll(month)": lambda db: normalize_reasons(crud.calculate_payroll(db, date(2024, 2, 1), date(2024, 2, 29))),
+    "calculate_payroll_batch": lambda db: [
+        normalize_reasons(period) for period in crud.calculate_payroll_batch(db, crud.split_periods(START, END, "week"))["periods"]
+    ],
+    "get_boat_analysis": lambda db: crud.get_boat_analysis(db, 3, START, END),
+    "get_boat_analysis(unknown boat)": lambda db: crud.get_boat_analysis(db, 999, START, END),
+    "get_boat_analysis_pack": lambda db: crud.get_boat_analysis_pack(db, START, END),
+    "get_expenses_report": lambda db: crud.get_expenses_report(db, START, END),
+    "get_expenses_report(boat)": lambda db: crud.get_expenses_report(db, START, END, boat_id=3),
+    "get_expenses_report(employee)": lambda db: crud.get_expenses_report(db, START, END, emp_id=5),
+}
+
+@pytest.mark.parametrize("fleet_engine", [{"employees": 100, "days": 91}], indirect=True)
+@pytest.mark.parametrize("name", REPORTS)
+def test_numpy_matches_sql(db, name, monkeypatch):
+    monkeypatch.setattr(report_cache, "MAX_BYTES", 0)
+
+    monkeypatch.setattr(vectorized, "ENABLED", False)
+    expected = REPORTS[name](db)
+    monkeypatch.setattr(vectorized, "ENABLED", True)
+    result = REPORTS[name](db)
+
+    assert result == expected
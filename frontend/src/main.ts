@@ -145,6 +145,7 @@ form.addEventListener('submit', async (event: Event)=>{
   }
 
   const rows = tableBody.querySelectorAll('tr');
+  const payloads = [];
 
   for (const row of rows) {
     const checkbox = row.querySelector('.presence-checkbox') as HTMLInputElement;
@@ -177,20 +178,26 @@ form.addEventListener('submit', async (event: Event)=>{
       overtime_boat_id: finalOtBoat, 
       present: isPresent,
       is_half_day: isHalf,
-      overtime_hours: otHours,
-      extra_amount: 0,
-      extra_reason: ""
+      overtime_hours: otHours
     }; 
+    payloads.push(payload);
+  }
 
-    try {
-        await fetch('http://127.0.0.1:8000/attendance/', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
-    } catch (err) {
-        console.error('Error saving row', err);
-    }
+  // The whole day is saved with one request and one transaction
+  try {
+      const res = await fetch('http://127.0.0.1:8000/attendance/bulk', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(payloads)
+      });
+      if (!res.ok) {
+          alert('Σφάλμα κατά την αποθήκευση.');
+          return;
+      }
+  } catch (err) {
+      console.error('Error saving day', err);
+      alert('Σφάλμα σύνδεσης.');
+      return;
   }
   alert('Η αποθήκευση ολοκληρώθηκε!');
 
@@ -876,18 +883,16 @@ if(extraForm) {
         const amount = parseFloat((document.getElementById('extra-amount') as HTMLInputElement).value);
         const reason = (document.getElementById('extra-reason') as HTMLInputElement).value;
 
+        // Extras are adjustments dated at the end of the payroll period
         const payload = {
             date: payEnd.value,
             employee_id: parseInt(empId),
-            boat_id: null,      
-            present: null,      
-            overtime_hours: null,
-            extra_amount: amount,
-            extra_reason: reason
+            amount: amount,
+            reason: reason
         };
 
         try {
-            const res = await fetch('http://127.0.0.1:8000/attendance/', {
+            const res = await fetch('http://127.0.0.1:8000/adjustments/', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
@@ -909,26 +914,18 @@ if(extraForm) {
 if (btnClearExtra) {
     btnClearExtra.addEventListener('click', async () => {
         const empId = (document.getElementById('extra-emp-id') as HTMLInputElement).value;
-        
-        const payload = {
-            date: payEnd.value,
-            employee_id: parseInt(empId),
-            boat_id: null,
-            present: null,
-            overtime_hours: null,
-            extra_amount: 0,    
-            extra_reason: ""    
-        };
+        const params = new URLSearchParams({ start: payStart.value, end: payEnd.value, employee_id: empId });
 
         if (confirm("Θέλετε να διαγράψετε το Extra ποσό;")) {
             try {
-                const res = await fetch('http://127.0.0.1:8000/attendance/', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(payload)
-                });
-
-                if (res.ok) {
+                // Every adjustment of the employee in the period
+                const listRes = await fetch(`http://127.0.0.1:8000/adjustments/?${params}`);
+                const adjustments: { id: number }[] = listRes.ok ? await listRes.json() : [];
+                const results = await Promise.all(adjustments.map(adjustment =>
+                    fetch(`http://127.0.0.1:8000/adjustments/${adjustment.id}`, { method: 'DELETE' })
+                ));
+
+                if (listRes.ok && results.every(res => res.ok)) {
                     if(modalExtra) modalExtra.classList.add('hidden');
                     btnCalcPayroll.click(); 
                     alert("Το Extra διαγράφηκε!");